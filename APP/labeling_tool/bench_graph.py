@@ -0,0 +1,105 @@
+"""
+Redraw benchmark for GraphWidget (no window is shown: Qt offscreen platform).
+
+For a synthetic session and an increasing number of label markers it times
+- toggling "Show Magnitude" (_update_plots)
+- plot_all() (refresh every curve)
+- a zoom + pan step (LOD update)
+each as the update itself (the call plus pending events) and the repaint that follows
+(a full render of the widget).
+
+With persistent curve items and the batched marker layer (ui/marker_layer.py) neither the
+update nor the repaint cost should grow with the number of markers.
+
+Usage:
+    python bench_graph.py
+    python bench_graph.py --hours 4 --markers 0 100 1000 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PySide6.QtWidgets import QApplication
+
+from core.session_store import SessionStore
+from ui.graph_widget import GraphWidget
+
+
+def synthetic_session(hours, seed=0):
+    """In-memory SessionStore with noise plus a swing-like spike every few seconds."""
+    rng = np.random.default_rng(seed)
+    n = int(hours * 3600 * 50)
+    columns = rng.normal(0, 1, (8, n)).astype(np.float32)
+    columns[3:6] *= 300
+    spikes = rng.choice(n, size=max(n // 250, 1), replace=False)
+    columns[:6, spikes] *= 8
+    columns[6] = np.sqrt((columns[0:3] ** 2).sum(axis=0))
+    columns[7] = np.sqrt((columns[3:6] ** 2).sum(axis=0))
+    t_ms = np.arange(n, dtype=np.int64) * 20
+    return SessionStore.commit(None, list(columns), t_ms, {"start_ms": 0, "dt_ms": 20})
+
+
+def timed(app, widget, fn, repeat):
+    """Best of `repeat` runs: (fn + processing events, full repaint) in ms."""
+    best_update = best_paint = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        app.processEvents()
+        t1 = time.perf_counter()
+        widget.grab()
+        t2 = time.perf_counter()
+        best_update = min(best_update, (t1 - t0) * 1000)
+        best_paint = min(best_paint, (t2 - t1) * 1000)
+    return best_update, best_paint
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GraphWidget redraw cost vs. marker count")
+    parser.add_argument("--hours", type=float, default=2.0)
+    parser.add_argument("--markers", type=int, nargs="+", default=[0, 100, 1000, 3000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    data = synthetic_session(args.hours)
+    duration_ms = float(data['t_ms'][-1])
+    print(f"Session: {args.hours:g} h, {len(data)} samples per channel\n")
+    print(f"{'':>8}{'toggle magnitude':>20}{'plot_all':>20}{'zoom + pan':>20}")
+    print(f"{'markers':>8}" + f"{'update ms':>11}{'paint ms':>9}" * 3)
+
+    for count in args.markers:
+        widget = GraphWidget()
+        widget.resize(1600, 600)
+        widget.set_data(data)
+        for t_ms in np.linspace(2000, duration_ms - 2000, count):
+            widget.add_marker(float(t_ms), 1, window_ms=(600, 180))
+        app.processEvents()
+        widget.grab()
+
+        def toggle():
+            widget._cb_magnitude.setChecked(not widget._cb_magnitude.isChecked())
+
+        state = {"x": duration_ms / 2}
+
+        def zoom_pan():
+            # 20 s window moving by 5 s per step
+            state["x"] = (state["x"] + 5000) % (duration_ms - 20000)
+            widget._plot_acc.setXRange(state["x"], state["x"] + 20000, padding=0)
+
+        row = f"{count:>8}"
+        for fn in (toggle, widget.plot_all, zoom_pan):
+            update_ms, paint_ms = timed(app, widget, fn, args.repeat)
+            row += f"{update_ms:>11.1f}{paint_ms:>9.1f}"
+        print(row)
+        widget.deleteLater()
+        app.processEvents()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
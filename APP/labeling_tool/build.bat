@@ -10,8 +10,9 @@ if exist "dist" rmdir /s /q "dist"
 :: --windowed: No console window (GUI only)
 :: --noconfirm: Do not ask for confirmation to overwrite
 :: --clean: Clean cache
+:: --hidden-import cv2: OpenCV is imported optionally (core/auto_sync.py), make sure it is bundled
 echo Running PyInstaller...
-python -m PyInstaller --noconfirm --onedir --windowed --clean --name "SmartRacketLabeler" main.py
+python -m PyInstaller --noconfirm --onedir --windowed --clean --hidden-import cv2 --name "SmartRacketLabeler" main.py
 
 if %errorlevel% neq 0 (
     echo Build Failed!
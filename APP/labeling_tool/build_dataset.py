@@ -0,0 +1,170 @@
+"""
+Headless training-set build from many labeled sessions (no Qt needed).
+
+A session is a folder of CSV files recorded by the APP; its labels are the JSONL file the
+labeling tool wrote for it (labels/<session_id>.jsonl, session_id derived from the CSV start
+time exactly like LabelManager does; a <session_id>.jsonl inside the session folder also works).
+
+Every session is loaded with CSVReader (50Hz resampling, cached in .labeling_cache/), its label
+windows are sliced with the same rule as LabelManager.save_label (PRE / POST samples around each
+label) and cached per session, keyed on the CSVs, the label file and the window settings, so a
+rerun only rebuilds sessions that changed. Sessions run in parallel worker processes; the result
+is one shuffled dataset (see core/tensor_export.py for the file layout) with a `session` array
+telling which session every window comes from.
+
+Usage:
+    python build_dataset.py IMU_Data -o dataset.npz
+    python build_dataset.py IMU_Data --labels labels --pre 30 --post 9 --workers 4 -o dataset.h5
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from core.csv_cache import CSVCache
+from core.csv_reader import CSVReader
+from core.label_manager import LabelManager
+from core.sync_manager import SyncManager
+from core.tensor_export import extract_windows, write_tensors
+
+
+def find_sessions(root):
+    """Folders under root (root included) that contain CSV files, sorted."""
+    sessions = []
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        if any(f.lower().endswith(".csv") for f in files):
+            sessions.append(folder)
+    return sorted(sessions)
+
+
+def read_sync_params(label_path):
+    """SyncManager params stored with the labels (first record), as get_params() returns them."""
+    sync = SyncManager()
+    with open(label_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                params = json.loads(line).get("sync_params") or {}
+                sync.set_params(params.get("offset_ms", 0.0), params.get("scale_factor", 1.0))
+                break
+    return sync.get_params()
+
+
+def build_session(folder, labels_dir, pre, post, use_cache=True):
+    """
+    Label windows of one session (runs in a worker process).
+    Returns a dict with status 'built' / 'cached' / 'no labels' / 'failed' and, when there
+    are windows, the arrays X, y, t_ms plus session info.
+    """
+    result = {"folder": folder, "status": "failed"}
+    try:
+        paths = sorted(glob.glob(os.path.join(folder, "*.csv")))
+        # One worker per session already: parse this session's files serially
+        reader = CSVReader(use_cache=use_cache, max_workers=1)
+        if not reader.load_files(paths):
+            return result
+
+        label_manager = LabelManager(output_dir=labels_dir)
+        label_manager.set_context(reader, None)
+        session_id = os.path.splitext(os.path.basename(label_manager.get_output_path()))[0]
+        result["session_id"] = session_id
+
+        candidates = [os.path.join(folder, f"{session_id}.jsonl"), label_manager.get_output_path()]
+        label_path = next((p for p in candidates if os.path.exists(p)), None)
+        if label_path is None:
+            result["status"] = "no labels"
+            return result
+        result["label_file"] = os.path.abspath(label_path)
+
+        cache = CSVCache() if use_cache else None
+        params = {"pre": pre, "post": post}
+        cached = cache.load_windows(paths, label_path, params) if cache is not None else None
+        if cached is not None:
+            result.update(cached, status="cached", info=json.loads(str(cached["info"])))
+            return result
+
+        labels = label_manager.load_labels(label_path)
+        X, y, t_ms, skipped = extract_windows(reader.get_data(), [t for t, _ in labels],
+                                              [l for _, l in labels], pre, post)
+        info = {"session_id": session_id, "folder": os.path.abspath(folder),
+                "label_file": os.path.abspath(label_path), "sync_params": read_sync_params(label_path),
+                "start_ms": reader.get_data().meta.get("start_ms"), "skipped": skipped}
+        arrays = {"X": X, "y": y, "t_ms": t_ms, "info": np.array(json.dumps(info))}
+        if cache is not None:
+            cache.save_windows(paths, label_path, params, arrays)
+        result.update(arrays, status="built", info=info)
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build one shuffled training set from labeled sessions")
+    parser.add_argument("root", help="folder with one sub-folder of CSV files per session")
+    parser.add_argument("-o", "--output", default="dataset.npz", help=".npz, or .h5 / .hdf5 (needs h5py)")
+    parser.add_argument("--labels", default="labels", help="folder with the labeling tool's JSONL files")
+    parser.add_argument("--pre", type=int, default=LabelManager.PRE_WINDOW, help="samples before the label")
+    parser.add_argument("--post", type=int, default=LabelManager.POST_WINDOW, help="samples after the label")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0, help="shuffle seed")
+    parser.add_argument("--no-cache", action="store_true", help="rebuild every session")
+    args = parser.parse_args()
+
+    sessions = find_sessions(args.root)
+    if not sessions:
+        print(f"No CSV files found under {args.root}")
+        return 1
+    if not os.path.isdir(args.labels):
+        print(f"Label folder not found: {args.labels}")
+        return 1
+
+    t0 = time.perf_counter()
+    workers = min(len(sessions), args.workers or os.cpu_count() or 1)
+    jobs = [(s, args.labels, args.pre, args.post, not args.no_cache) for s in sessions]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(build_session, *zip(*jobs)))
+    else:
+        results = [build_session(*job) for job in jobs]
+
+    parts, infos = [], []
+    for r in results:
+        name = os.path.relpath(r["folder"], args.root)
+        if r["status"] in ("built", "cached"):
+            print(f"  {name}: {len(r['X'])} windows ({r['status']}, {r['info']['skipped']} out of bounds)")
+            if len(r["X"]):
+                parts.append(r)
+                infos.append(dict(r["info"], windows=len(r["X"])))
+        else:
+            detail = r.get("error") or r.get("session_id", "")
+            print(f"  {name}: {r['status']}" + (f" ({detail})" if detail else ""))
+
+    if not parts:
+        print("No labeled windows found.")
+        return 1
+
+    X = np.concatenate([r["X"] for r in parts])
+    y = np.concatenate([r["y"] for r in parts])
+    t_ms = np.concatenate([r["t_ms"] for r in parts])
+    session = np.concatenate([np.full(len(r["X"]), i, dtype=np.int32) for i, r in enumerate(parts)])
+
+    order = np.random.default_rng(args.seed).permutation(len(X))
+    meta = {"pre_window": args.pre, "post_window": args.post, "dt_ms": CSVReader.TARGET_dt_MS,
+            "seed": args.seed, "sessions": infos}
+    write_tensors(args.output, X[order], y[order], t_ms[order], meta, extra={"session": session[order]})
+
+    counts = np.bincount(y, minlength=6)[1:]
+    print(f"{len(X)} windows from {len(parts)} sessions -> {args.output} "
+          f"(per label 1..5: {counts.tolist()}, {time.perf_counter() - t0:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
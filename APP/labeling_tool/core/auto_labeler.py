@@ -0,0 +1,131 @@
+import os
+import sys
+import importlib.util
+import numpy as np
+from core.constants import LabelType
+
+# The production classifier lives in the server package (server/main.py, SwingClassifier)
+SERVER_DIR = os.environ.get(
+    "SMARTRACKET_SERVER_DIR",
+    os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "server")))
+
+# SwingClassifier class names -> LabelType (anything below its confidence threshold is "Other")
+CLASS_TO_LABEL = {
+    "Smash": LabelType.SMASH,
+    "Drive": LabelType.DRIVE,
+    "Toss": LabelType.TOSS,
+    "Drop": LabelType.DROP,
+}
+
+_classifier = None
+
+def load_classifier(server_dir=SERVER_DIR):
+    """
+    Load the server's SwingClassifier once (TensorFlow is only imported here).
+    server/main.py loads its models on import; model paths are resolved inside
+    server_dir and the swing archive is disabled so nothing is written next to the tool.
+    Raises RuntimeError if the server code, TensorFlow or the model is not available.
+    """
+    global _classifier
+    if _classifier is not None:
+        return _classifier
+
+    main_path = os.path.join(server_dir, "main.py")
+    if not os.path.exists(main_path):
+        raise RuntimeError(f"Server code not found: {main_path} (set SMARTRACKET_SERVER_DIR)")
+    for var, name in (("CLASSIFIER_MODEL", "badminton_model_v4.h5"), ("SPEED_MODEL", "model_speed_cnn_att.keras")):
+        os.environ.setdefault(var, os.path.join(server_dir, name))
+    os.environ.setdefault("SWING_ARCHIVE_DIR", "")
+
+    if server_dir not in sys.path:
+        sys.path.append(server_dir) # server/main.py imports its sibling modules
+    try:
+        # Own module name: the labeling tool has a main.py of its own
+        spec = importlib.util.spec_from_file_location("smartracket_server_main", main_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    except Exception as e:
+        raise RuntimeError(f"Could not load the server classifier: {e}") from e
+
+    if module.classifier.model is None:
+        raise RuntimeError(f"Classifier model could not be loaded from {os.environ['CLASSIFIER_MODEL']}")
+    _classifier = module.classifier
+    return _classifier
+
+def peak_windows(data, peak_idx, pre, post):
+    """
+    Label windows around each peak, sliced exactly like LabelManager.save_label:
+    samples [idx - pre, idx + post] of the sensor columns.
+    Returns (kept peak indices, (N, pre + post + 1, 6) float32); peaks too close to
+    either end of the session are dropped, as save_label would refuse them.
+    """
+    peak_idx = np.asarray(peak_idx, dtype=np.int64)
+    peak_idx = peak_idx[(peak_idx - pre >= 0) & (peak_idx + post + 1 <= len(data))]
+    return peak_idx, data.windows(peak_idx, pre, post)
+
+def classify_windows(classifier, windows, progress=None, cancelled=None, batch_size=256):
+    """
+    One batched inference pass over (N, W, 6) windows.
+    progress(done, total) is called after every batch; cancelled() -> True stops early
+    (returns None). Returns (label ids (N,) int, confidences (N,) float32).
+    """
+    window_len = classifier.input_shape[0]
+    if windows.shape[1] != window_len:
+        raise ValueError(f"Classifier expects {window_len}-sample windows, got {windows.shape[1]} "
+                         f"(set the label window to {window_len} samples)")
+
+    total = len(windows)
+    probs = np.zeros((total, len(classifier.classes)), dtype=np.float32)
+    for i in range(0, total, batch_size):
+        if cancelled is not None and cancelled():
+            return None
+        probs[i:i + batch_size] = classifier.predict_batch(windows[i:i + batch_size], batch_size=batch_size)
+        if progress is not None:
+            progress(min(i + batch_size, total), total)
+
+    confidence = probs.max(axis=1) if total else np.zeros(0, dtype=np.float32)
+    class_labels = np.array([CLASS_TO_LABEL.get(name, LabelType.OTHER) for name in classifier.classes])
+    labels = class_labels[probs.argmax(axis=1)] if total else np.zeros(0, dtype=np.int64)
+    labels = np.where(confidence < classifier.confidence_threshold, int(LabelType.OTHER), labels)
+    return labels.astype(np.int64), confidence.astype(np.float32)
+
+class PreLabels:
+    """
+    Classifier suggestions waiting for review, sorted by time. The annotator accepts or
+    corrects each one (it then becomes a normal label) or rejects it; lookups around the
+    cursor are binary searches.
+    """
+
+    def __init__(self, t_ms, labels, confidence):
+        order = np.argsort(t_ms, kind='stable')
+        self.t_ms = np.asarray(t_ms, dtype=np.float64)[order]
+        self.labels = np.asarray(labels, dtype=np.int64)[order]
+        self.confidence = np.asarray(confidence, dtype=np.float32)[order]
+        self.pending = np.ones(len(self.t_ms), dtype=bool)
+
+    def __len__(self):
+        return len(self.t_ms)
+
+    def pending_count(self):
+        return int(self.pending.sum())
+
+    def pending_at(self, t_ms, tolerance_ms=10.0):
+        """Index of the pending pre-label within tolerance_ms of t_ms, or None."""
+        i0 = int(np.searchsorted(self.t_ms, t_ms - tolerance_ms, side='left'))
+        i1 = int(np.searchsorted(self.t_ms, t_ms + tolerance_ms, side='right'))
+        hits = i0 + np.flatnonzero(self.pending[i0:i1])
+        if hits.size == 0:
+            return None
+        return int(hits[np.argmin(np.abs(self.t_ms[hits] - t_ms))])
+
+    def next_pending(self, t_ms):
+        """Index of the first pending pre-label after t_ms (wrapping to the start), or None."""
+        i = int(np.searchsorted(self.t_ms, t_ms, side='right'))
+        after = np.flatnonzero(self.pending[i:])
+        if after.size:
+            return i + int(after[0])
+        before = np.flatnonzero(self.pending[:i])
+        return int(before[0]) if before.size else None
+
+    def resolve(self, i):
+        self.pending[i] = False
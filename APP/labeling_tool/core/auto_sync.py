@@ -0,0 +1,129 @@
+import time
+import numpy as np
+from scipy.signal import fftconvolve
+
+try:
+    import cv2
+except ImportError:  # in requirements.txt; only motion_energy() needs it, estimate_sync() does not
+    cv2 = None
+
+def motion_energy(video_path, width=64, progress=None, cancelled=None):
+    """
+    Motion-energy signal of a video: mean absolute difference of consecutive grayscale
+    frames, downscaled to `width` pixels wide (INTER_AREA) so decoding dominates the cost.
+    progress(done, total) is called every 100 frames; cancelled() -> True stops early (returns None).
+    Returns (t_video_ms (n,) float64, energy (n,) float32), t from the decoder timestamps.
+    """
+    if cv2 is None:
+        raise RuntimeError("Reading video frames needs OpenCV (pip install opencv-python-headless)")
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {video_path}")
+
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    times, energy = [], []
+    prev = None
+    size = None
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            t = cap.get(cv2.CAP_PROP_POS_MSEC)
+            if size is None:
+                h, w = frame.shape[:2]
+                size = (width, max(int(round(h * width / w)), 1))
+            gray = cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            gray = gray.astype(np.float32)
+            if prev is not None:
+                times.append(t if t > 0 else len(times) * 1000.0 / fps)
+                energy.append(float(np.abs(gray - prev).mean()))
+            prev = gray
+            if len(times) % 100 == 0:
+                if cancelled is not None and cancelled():
+                    return None
+                if progress is not None:
+                    progress(len(times), total)
+    finally:
+        cap.release()
+    return np.asarray(times, dtype=np.float64), np.asarray(energy, dtype=np.float32)
+
+def _activity(values, dt_ms, smooth_ms=200):
+    """Zero-mean, unit-variance activity envelope: |x - 1 s moving mean|, smoothed."""
+    values = np.asarray(values, dtype=np.float64)
+    base = max(int(1000 / dt_ms), 1)
+    detrended = np.abs(values - np.convolve(values, np.ones(base) / base, mode='same'))
+    k = max(int(smooth_ms / dt_ms), 1)
+    env = np.convolve(detrended, np.ones(k) / k, mode='same')
+    std = env.std()
+    return (env - env.mean()) / std if std > 0 else env * 0
+
+def _resample(t_ms, values, dt_ms):
+    """Signal on a uniform grid starting at 0 (linear interpolation)."""
+    grid = np.arange(0, t_ms[-1], dt_ms)
+    return np.interp(grid, t_ms, values)
+
+def _best_lag(imu, video):
+    """(lag in samples, peak score) of the cross-correlation; video[i] lines up with imu[i + lag]."""
+    corr = fftconvolve(imu, video[::-1], mode='full')
+    # Normalize by the overlap so partial overlaps at the ends are not favoured / penalized
+    n_i, n_v = len(imu), len(video)
+    lags = np.arange(-(n_v - 1), n_i)
+    overlap = np.minimum(n_i, lags + n_v) - np.maximum(0, lags)
+    valid = overlap >= min(n_i, n_v) // 4 # need a decent common stretch
+    corr = np.where(valid, corr / np.maximum(overlap, 1), -np.inf)
+    k = int(np.argmax(corr))
+    # Sub-sample refinement (parabola through the peak)
+    frac = 0.0
+    if 0 < k < len(corr) - 1 and np.isfinite(corr[k - 1]) and np.isfinite(corr[k + 1]):
+        denom = corr[k - 1] - 2 * corr[k] + corr[k + 1]
+        if denom < 0:
+            frac = 0.5 * (corr[k - 1] - corr[k + 1]) / denom
+    return lags[k] + frac, float(corr[k])
+
+def _search(imu_t, imu_values, vid_t, vid_values, scales, dt_ms):
+    imu = _activity(_resample(imu_t - imu_t[0], imu_values, dt_ms), dt_ms)
+    best = None
+    for scale in scales:
+        # Video on the CSV time axis for this scale: t_csv = t_video * scale + offset
+        video = _activity(_resample(vid_t * scale, vid_values, dt_ms), dt_ms)
+        lag, score = _best_lag(imu, video)
+        if best is None or score > best[2]:
+            best = (float(scale), lag * dt_ms + imu_t[0], score)
+    return best
+
+def estimate_sync(imu_t_ms, acc_mag, video_t_ms, video_energy, max_drift=0.003, progress=None):
+    """
+    Offset / scale that map video time to CSV time (t_csv = t_video * scale + offset, as in
+    SyncManager) by FFT cross-correlation of the IMU acceleration-magnitude activity with the
+    video motion energy, over candidate scale factors within 1 +- max_drift.
+
+    Coarse-to-fine: a 10 Hz pass over scale steps that keep the drift across the video below
+    one sample, then a 50 Hz pass around the best scale. Each pass is one FFT correlation per
+    candidate, so an hour of data takes seconds.
+    Returns dict(offset_ms, scale_factor, score, elapsed_s); score is the correlation at the
+    peak (about 0.1 is weak, above 0.3 is a clear match).
+    """
+    t0 = time.perf_counter()
+    imu_t_ms = np.asarray(imu_t_ms, dtype=np.float64)
+    video_t_ms = np.asarray(video_t_ms, dtype=np.float64)
+    duration = max(video_t_ms[-1] - video_t_ms[0], 1.0)
+
+    # Pass 1: 100 ms grid
+    coarse_dt = 100.0
+    step = coarse_dt / duration
+    scales = 1.0 + np.arange(-max_drift, max_drift + step / 2, step)
+    scale, _, _ = _search(imu_t_ms, acc_mag, video_t_ms, video_energy, scales, coarse_dt)
+    if progress is not None:
+        progress(1, 2)
+
+    # Pass 2: 20 ms grid around the coarse scale
+    fine_dt = 20.0
+    fine_step = fine_dt / duration
+    scales = scale + np.arange(-step, step + fine_step / 2, fine_step)
+    scale, offset, score = _search(imu_t_ms, acc_mag, video_t_ms, video_energy, scales, fine_dt)
+    if progress is not None:
+        progress(2, 2)
+    return {"offset_ms": float(offset), "scale_factor": float(scale), "score": float(score),
+            "elapsed_s": time.perf_counter() - t0}
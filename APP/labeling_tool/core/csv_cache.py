@@ -0,0 +1,126 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+
+class CSVCache:
+    """
+    On-disk cache for parsed IMU CSV files and resampled sessions.
+    Lives in `.labeling_cache/` next to the CSV files (or `cache_dir`).
+
+    Parsed file:  <name>.<path hash>.npz  -> t_ms (int64, unix ms), data (N, 6) float32
+    Session:      session_<key hash>/     -> resampled 50Hz SessionStore (memory-mapped)
+    Windows:      windows_<paths hash>.npz -> label windows of a session (build_dataset.py)
+
+    Every entry stores the key it was built from (absolute path, size, mtime_ns of each CSV),
+    so a changed / replaced CSV simply misses the cache. A session that grows in place
+    (CSVReader.append_files) is moved to the directory of its new key.
+    """
+
+    CACHE_DIR_NAME = ".labeling_cache"
+    VERSION = 1
+
+    def __init__(self, cache_dir=None):
+        self._cache_dir = cache_dir
+
+    def _dir_for(self, path):
+        root = self._cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), self.CACHE_DIR_NAME)
+        os.makedirs(root, exist_ok=True)
+        return root
+
+    @staticmethod
+    def file_key(path) -> dict:
+        st = os.stat(path)
+        return {"path": os.path.abspath(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    @staticmethod
+    def _hash(obj) -> str:
+        return hashlib.sha1(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def _parsed_path(self, path):
+        name = os.path.basename(path)
+        return os.path.join(self._dir_for(path), f"{name}.{self._hash(os.path.abspath(path))}.npz")
+
+    def _read(self, cache_path, key):
+        """Arrays of a cache entry, or None if it is missing / stale / unreadable."""
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path, allow_pickle=False) as z:
+                meta = json.loads(str(z["meta"]))
+                if meta.get("version") != self.VERSION or meta.get("key") != key:
+                    return None
+                return {name: z[name] for name in z.files if name != "meta"}
+        except Exception as e:
+            print(f"Ignoring broken cache {cache_path}: {e}")
+            return None
+
+    def _write(self, cache_path, key, arrays):
+        # Write to a temp file first so a crash never leaves half an entry behind
+        tmp = cache_path + ".tmp.npz"
+        try:
+            np.savez(tmp, meta=np.array(json.dumps({"version": self.VERSION, "key": key})), **arrays)
+            os.replace(tmp, cache_path)
+        except OSError as e:
+            print(f"Could not write cache {cache_path}: {e}")
+
+    # --- Parsed single files ---
+    def load_parsed(self, path):
+        """(t_ms, data) of a parsed CSV, or None."""
+        entry = self._read(self._parsed_path(path), self.file_key(path))
+        if entry is None:
+            return None
+        return entry["t_ms"], entry["data"]
+
+    def save_parsed(self, path, t_ms, data):
+        self._write(self._parsed_path(path), self.file_key(path), {"t_ms": t_ms, "data": data})
+
+    # --- Resampled sessions (a set of CSV files) ---
+    def session_dir(self, paths):
+        """(SessionStore directory, source key) for a set of CSV files."""
+        keys = [self.file_key(p) for p in sorted(paths)]
+        return os.path.join(self._dir_for(paths[0]), f"session_{self._hash(keys)}"), keys
+
+    def collect_sessions(self, paths, busy=None):
+        """
+        Session stores next to `paths` whose key no longer matches their directory name (grown by
+        CSVReader.append_files while the rename was refused) are moved to the directory of their
+        key, or deleted if that one already exists. `busy`: a store directory that is open, left alone.
+        """
+        root = self._dir_for(paths[0])
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if not name.startswith("session_") or (busy and os.path.abspath(path) == os.path.abspath(busy)):
+                continue
+            try:
+                with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+                    key = json.load(f)["key"]
+            except (OSError, ValueError, KeyError, TypeError):
+                continue  # not a store, or one being written
+            target = os.path.join(root, f"session_{self._hash(key)}")
+            if target == path:
+                continue
+            try:
+                if os.path.exists(target):
+                    shutil.rmtree(path)
+                else:
+                    os.replace(path, target)
+            except OSError as e:
+                print(f"Could not tidy cached session {path}: {e}")
+
+    # --- Label windows of a session (build_dataset.py) ---
+    def _windows_key(self, paths, label_path, params):
+        return {"files": [self.file_key(p) for p in sorted(paths)],
+                "labels": self.file_key(label_path), "params": params}
+
+    def _windows_path(self, paths):
+        return os.path.join(self._dir_for(paths[0]),
+                            f"windows_{self._hash(sorted(os.path.abspath(p) for p in paths))}.npz")
+
+    def load_windows(self, paths, label_path, params):
+        """Arrays saved by save_windows, or None if the CSVs, the label file or params changed."""
+        return self._read(self._windows_path(paths), self._windows_key(paths, label_path, params))
+
+    def save_windows(self, paths, label_path, params, arrays):
+        self._write(self._windows_path(paths), self._windows_key(paths, label_path, params), arrays)
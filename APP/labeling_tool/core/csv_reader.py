@@ -1,26 +1,129 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
 import glob
 import os
 
+from core.csv_cache import CSVCache
+from core.session_store import SessionStore, SENSOR_COLUMNS
+
+TIMESTAMP_FORMAT = '%Y/%m/%d %H:%M:%S.%f'  # yyyy/MM/dd HH:mm:ss.SSS
+
+
+def parse_csv_file(fpath):
+    """
+    Read and parse one CSV from the Android APP.
+    Module level so it can run in a worker process.
+    Returns (t_ms int64 unix ms, data (N, 6) float32) or None if the file is not usable.
+    """
+    try:
+        # Format: timestamp,receivedAt,accelX,accelY,accelZ,gyroX,gyroY,gyroZ
+        # timestamp example: 2025/12/05 22:20:06.510
+        df = pd.read_csv(fpath, usecols=lambda c: c in CSVReader.REQUIRED_COLUMNS,
+                         dtype={c: np.float32 for c in SENSOR_COLUMNS})
+        if not all(col in df.columns for col in CSVReader.REQUIRED_COLUMNS):
+            print(f"Skipping {fpath}: Missing required columns")
+            return None
+        t = pd.to_datetime(df['timestamp'], format=TIMESTAMP_FORMAT)
+        t_ms = t.values.astype('datetime64[ms]').astype(np.int64)
+        data = np.ascontiguousarray(df[SENSOR_COLUMNS].to_numpy(dtype=np.float32))
+        return t_ms, data
+    except Exception as e:
+        print(f"Error parsing {fpath}: {e}")
+        return None
+
+
+def resample_uniform(t_ms, data, dt_ms=20, out=None, grid_start=None, chunk=1 << 20):
+    """
+    Linear interpolation of raw samples onto a fixed grid (grid_start, + dt_ms, ... <= end).
+    t_ms: (N,) int64, sorted and unique; data: (N, 6) float32.
+    grid_start defaults to the first sample; appends pass the next point of the existing grid.
+    All six channels are interpolated together (one searchsorted + one weight per grid point),
+    chunked into 8 preallocated float32 columns (`out`: an (8, M) array or a list of columns,
+    e.g. SessionStore memmaps) so long sessions never build large temporaries.
+    Columns of out: SENSOR_COLUMNS + acc_mag, gyro_mag. Returns (grid_ms (M,) int64, out).
+    """
+    start = int(t_ms[0]) if grid_start is None else int(grid_start)
+    n = resample_length(start, t_ms[-1], dt_ms)
+    grid = start + np.arange(n, dtype=np.int64) * dt_ms
+    if out is None:
+        out = np.empty((8, n), dtype=np.float32)
+    
+    for a in range(0, n, chunk):
+        g = grid[a:a + chunk]
+        b = a + len(g)
+        if len(t_ms) == 1:
+            vals = np.broadcast_to(data[0], (len(g), 6))
+        else:
+            # Right neighbour = first raw sample at or after the grid point
+            i1 = np.clip(np.searchsorted(t_ms, g, side='left'), 1, len(t_ms) - 1)
+            i0 = i1 - 1
+            t0 = t_ms[i0]
+            w = ((g - t0) / (t_ms[i1] - t0)).astype(np.float32)[:, None]
+            d0 = data[i0]
+            vals = d0 + (data[i1] - d0) * w
+        for k in range(6):
+            out[k][a:b] = vals[:, k]
+        
+        # Magnitudes
+        np.sqrt(np.einsum('ij,ij->i', vals[:, 0:3], vals[:, 0:3]), out=out[6][a:b])
+        np.sqrt(np.einsum('ij,ij->i', vals[:, 3:6], vals[:, 3:6]), out=out[7][a:b])
+    return grid, out
+
+
+def resample_length(start_ms, end_ms, dt_ms=20):
+    """Number of grid points resample_uniform produces for [start_ms, end_ms]."""
+    return max((int(end_ms) - int(start_ms)) // dt_ms + 1, 0)
+
+
+def merge_raw(t_ms, data):
+    """
+    Sort raw samples by time and drop duplicated timestamps and incomplete rows.
+    Stable sort: on duplicated timestamps the earlier file wins.
+    """
+    order = np.argsort(t_ms, kind='stable')
+    t_ms = t_ms[order]
+    data = data[order]
+    
+    keep = np.ones(len(t_ms), dtype=bool)
+    keep[1:] = t_ms[1:] != t_ms[:-1]
+    keep &= ~np.isnan(data).any(axis=1)
+    return t_ms[keep], data[keep]
+
+
 class CSVReader:
     """
     Handles loading, merging, and resampling of IMU CSV data.
     Target: 50Hz fixed grid (20ms)
+
+    Files are parsed in parallel worker processes and both the parsed files and the
+    resampled session are cached on disk (see CSVCache), keyed on path, size and mtime.
+    The resampled session is a memory-mapped SessionStore; raw samples are dropped
+    once it is built.
     """
     
     # Expected columns from Android APP
-    REQUIRED_COLUMNS = ['timestamp', 'accelX', 'accelY', 'accelZ', 'gyroX', 'gyroY', 'gyroZ']
+    REQUIRED_COLUMNS = ['timestamp'] + SENSOR_COLUMNS
     
     # Target Sampling Rate
     TARGET_FREQ_HZ = 50
     TARGET_dt_MS = 20  # 1000ms / 50Hz = 20ms
     
-    def __init__(self):
-        self._df_raw = None      # Combined raw dataframe
-        self._df_resampled = None # Resampled 50Hz dataframe
+    def __init__(self, use_cache=True, cache_dir=None, max_workers=None):
+        self._raw_t_ms = None    # Combined raw samples: (N,) int64 unix ms
+        self._raw_data = None    #                       (N, 6) float32
+        self._store = None       # Resampled 50Hz SessionStore
         self._is_loaded = False
+        self._start_ms = None    # Unix ms of the first sample (naive local time)
+        self._raw_count = 0
+        self._expected_count = 0
+        
+        self._cache = CSVCache(cache_dir) if use_cache else None
+        self._session_path = None
+        self._session_key = None
+        self._file_keys = {}     # path -> (size, mtime_ns) of every loaded CSV
+        self._max_workers = max_workers
         
     def load_files(self, file_paths: list[str]) -> bool:
         """
@@ -28,36 +131,47 @@ class CSVReader:
         Returns True if successful.
         """
         try:
-            df_list = []
-            
+            paths = []
             for fpath in file_paths:
                 if not os.path.exists(fpath):
                     print(f"File not found: {fpath}")
                     continue
+                paths.append(fpath)
                 
-                # Read CSV
-                # Format: timestamp,receivedAt,accelX,accelY,accelZ,gyroX,gyroY,gyroZ
-                # timestamp example: 2025/12/05 22:20:06.510
-                df = pd.read_csv(fpath)
-                
-                # Check columns
-                if not all(col in df.columns for col in self.REQUIRED_COLUMNS):
-                    print(f"Skipping {fpath}: Missing required columns")
-                    continue
-                    
-                df_list.append(df)
+            if not paths:
+                print("No valid CSV files loaded.")
+                return False
+            self._file_keys = {p: self._file_key(p) for p in paths}
                 
-            if not df_list:
+            # Same files, unchanged -> reuse the resampled session
+            if self._cache is not None:
+                self._cache.collect_sessions(paths, busy=self._store.path if self._store is not None else None)
+            self._session_path, self._session_key = (self._cache.session_dir(paths)
+                                                     if self._cache is not None else (None, None))
+            if self._session_path is not None:
+                store = SessionStore.open(self._session_path, self._session_key)
+                if store is not None:
+                    self._set_store(store)
+                    self._is_loaded = True
+                    return True
+            
+            parsed = [r for r in self._parse_files(paths) if r is not None and len(r[0])]
+            if not parsed:
                 print("No valid CSV files loaded.")
                 return False
                 
             # Merge
-            self._df_raw = pd.concat(df_list, ignore_index=True)
+            t_ms = np.concatenate([r[0] for r in parsed])
+            data = np.concatenate([r[1] for r in parsed])
             
             # Processing
-            self._process_raw_data()
+            self._process_raw_data(t_ms, data)
             self._resample_data()
             
+            # The store holds everything the UI needs from here on
+            self._raw_t_ms = None
+            self._raw_data = None
+            
             self._is_loaded = True
             return True
             
@@ -65,81 +179,170 @@ class CSVReader:
             print(f"Error loading CSVs: {e}")
             return False
 
-    def _process_raw_data(self):
+    @staticmethod
+    def _file_key(path):
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime_ns)
+
+    def find_new_files(self) -> list[str]:
         """
-        Parse timestamps and sort raw data.
+        CSVs in the folders of the loaded session that are new or have grown since loading
+        (the APP starts a new file every 5 minutes and keeps writing the current one).
         """
-        # Parse 'timestamp' column to datetime objects
-        # Format is 'yyyy/MM/dd HH:mm:ss.SSS'
-        # pandas to_datetime is smart, but specifying format is safer/faster if consistent
-        self._df_raw['datetime'] = pd.to_datetime(self._df_raw['timestamp'], format='%Y/%m/%d %H:%M:%S.%f')
-        
-        # Sort by time
-        self._df_raw = self._df_raw.sort_values('datetime')
-        
-        # Drop duplicates (based on timestamp)
-        self._df_raw = self._df_raw.drop_duplicates(subset=['datetime'])
-        
-        # Reset index
-        self._df_raw = self._df_raw.reset_index(drop=True)
+        folders = {os.path.dirname(os.path.abspath(p)) for p in self._file_keys}
+        found = []
+        for folder in sorted(folders):
+            for p in sorted(glob.glob(os.path.join(folder, "*.csv"))):
+                known = next((k for k in self._file_keys if os.path.abspath(k) == os.path.abspath(p)), None)
+                if known is None or self._file_keys[known] != self._file_key(p):
+                    found.append(known or p)
+        return found
+
+    def append_files(self, file_paths: list[str]) -> int:
+        """
+        Add new CSV segments (new files, or loaded files that have grown) to the loaded session
+        without reprocessing it. Only samples after the current end are merged and resampled
+        (starting from the last raw sample, so the boundary is interpolated exactly like a
+        full reload would) and appended to the session store.
+        If a new file overlaps the loaded time range, falls back to a full load_files().
+        Returns the number of new 50Hz samples, or -1 on failure.
+        """
+        if self._store is None:
+            return len(self._store) if self.load_files(file_paths) else -1
+        try:
+            paths = [p for p in file_paths if os.path.exists(p)
+                     and self._file_keys.get(p) != self._file_key(p)]
+            if not paths:
+                return 0
+            
+            last_raw_ms = int(self._store.meta["last_raw_ms"])
+            t_parts, d_parts = [], []
+            for p, r in zip(paths, self._parse_files(paths)):
+                if r is None or not len(r[0]):
+                    continue
+                t, d = r
+                if p not in self._file_keys and t.min() <= last_raw_ms:
+                    # Earlier / overlapping segment: the merge is not a pure append
+                    print(f"{os.path.basename(p)} overlaps the loaded data, reloading the session")
+                    n_before = len(self._store)
+                    if not self.load_files(list(dict.fromkeys(list(self._file_keys) + paths))):
+                        return -1
+                    return len(self._store) - n_before
+                # Loaded files that grew: the rows up to the old end are already in the session
+                new = t > last_raw_ms
+                t_parts.append(t[new])
+                d_parts.append(d[new])
+            
+            for p in paths:
+                self._file_keys[p] = self._file_key(p)
+            key = [CSVCache.file_key(p) for p in sorted(self._file_keys)]
+            if not t_parts or not sum(len(t) for t in t_parts):
+                self._store.update_meta(key=key)
+                self._move_session()
+                return 0
+            t_new, d_new = merge_raw(np.concatenate(t_parts), np.concatenate(d_parts))
+            
+            # Resample [last old raw sample, new samples] onto the continuation of the grid
+            meta = self._store.meta
+            t_ext = np.concatenate([[last_raw_ms], t_new])
+            d_ext = np.vstack([np.asarray(meta["last_raw"], dtype=np.float32), d_new])
+            grid_start = self._start_ms + len(self._store) * self.TARGET_dt_MS
+            grid_ms, block = resample_uniform(t_ext, d_ext, self.TARGET_dt_MS, grid_start=grid_start)
+            
+            self._raw_count += len(t_new)
+            self._expected_count = int((t_new[-1] - self._start_ms) / 1000.0 * self.TARGET_FREQ_HZ) + 1
+            updates = {
+                "key": key,
+                "raw_count": self._raw_count,
+                "expected_count": self._expected_count,
+                "last_raw_ms": int(t_new[-1]),
+                "last_raw": d_new[-1].tolist(),
+            }
+            if len(grid_ms):
+                self._store.append(grid_ms - self._start_ms, block, updates)
+            else:
+                self._store.update_meta(**updates)
+            self._move_session()
+            return len(grid_ms)
+            
+        except Exception as e:
+            print(f"Error appending CSVs: {e}")
+            return -1
+
+    def _move_session(self):
+        """The store now belongs to the grown file list: file it under that list's session dir."""
+        if self._cache is None:
+            return
+        path, key = self._cache.session_dir(list(self._file_keys))
+        if self._store.move(path):
+            self._session_path, self._session_key = path, key
+
+    def _parse_files(self, paths):
+        """Parse every file (cached ones from disk, the rest across a process pool), in input order."""
+        results = {}
+        todo = []
+        for p in paths:
+            cached = self._cache.load_parsed(p) if self._cache is not None else None
+            if cached is not None:
+                results[p] = cached
+            else:
+                todo.append(p)
         
-        # Convert timestamp to milliseconds (relative to start of the day or just keep as datetime)
-        # For simplicity in labeling, we often use relative milliseconds from start
-        # But here let's keep datetime as index for resampling advantage
-        self._df_raw.set_index('datetime', inplace=True)
+        workers = min(len(todo), self._max_workers or os.cpu_count() or 1)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = list(pool.map(parse_csv_file, todo))
+        else:
+            parsed = [parse_csv_file(p) for p in todo]
+            
+        for p, r in zip(todo, parsed):
+            results[p] = r
+            if r is not None and self._cache is not None:
+                self._cache.save_parsed(p, *r)
+        return [results[p] for p in paths]
+
+    def _process_raw_data(self, t_ms, data):
+        """
+        Sort raw samples by time and drop duplicated timestamps and incomplete rows.
+        """
+        self._raw_t_ms, self._raw_data = merge_raw(t_ms, data)
+        self._start_ms = int(self._raw_t_ms[0])
 
     def _resample_data(self):
         """
-        Resample data to fixed 50Hz grid.
-        Interpolate missing values.
+        Resample data to fixed 50Hz grid (linear interpolation, see resample_uniform).
         """
-        if self._df_raw is None or self._df_raw.empty:
+        if self._raw_t_ms is None or len(self._raw_t_ms) == 0:
             return
-
-        # 1. Create target time grid
-        start_time = self._df_raw.index[0]
-        end_time = self._df_raw.index[-1]
         
         # Stats Calculation
-        self._raw_count = len(self._df_raw)
-        total_seconds = (end_time - start_time).total_seconds()
+        self._raw_count = len(self._raw_t_ms)
+        total_seconds = (self._raw_t_ms[-1] - self._raw_t_ms[0]) / 1000.0
         self._expected_count = int(total_seconds * self.TARGET_FREQ_HZ) + 1
         
-        # Create DatetimeIndex with 20ms freq
-        target_index = pd.date_range(start=start_time, end=end_time, freq=f'{self.TARGET_dt_MS}ms')
-        
-        # 2. Reindex raw data to this new grid
-        combined_index = self._df_raw.index.union(target_index).sort_values()
-        df_combined = self._df_raw.reindex(combined_index)
-        
-        # 3. Interpolate (Time-based linear interpolation)
-        numeric_cols = ['accelX', 'accelY', 'accelZ', 'gyroX', 'gyroY', 'gyroZ']
-        df_combined[numeric_cols] = df_combined[numeric_cols].interpolate(method='time')
-        
-        # 4. Select only the target grid points
-        self._df_resampled = df_combined.reindex(target_index)
+        n = resample_length(self._raw_t_ms[0], self._raw_t_ms[-1], self.TARGET_dt_MS)
+        columns = SessionStore.allocate(self._session_path, n)
+        grid_ms, columns = resample_uniform(self._raw_t_ms, self._raw_data, self.TARGET_dt_MS, out=columns)
         
-        # 5. Handle any remaining NaNs
-        self._df_resampled[numeric_cols] = self._df_resampled[numeric_cols].ffill().bfill()
-        
-        # 6. Add convenience columns
-        self._df_resampled['t_ms'] = (self._df_resampled.index - start_time).total_seconds() * 1000
-        
-        # Calculate Magnitude
-        self._df_resampled['acc_mag'] = np.sqrt(
-            self._df_resampled['accelX']**2 + 
-            self._df_resampled['accelY']**2 + 
-            self._df_resampled['accelZ']**2
-        )
-        self._df_resampled['gyro_mag'] = np.sqrt(
-            self._df_resampled['gyroX']**2 + 
-            self._df_resampled['gyroY']**2 + 
-            self._df_resampled['gyroZ']**2
-        )
+        self._set_store(SessionStore.commit(self._session_path, columns, grid_ms - grid_ms[0], {
+            "key": self._session_key,
+            "start_ms": self._start_ms,
+            "dt_ms": self.TARGET_dt_MS,
+            "raw_count": self._raw_count,
+            "expected_count": self._expected_count,
+            "last_raw_ms": int(self._raw_t_ms[-1]),
+            "last_raw": self._raw_data[-1].tolist(),
+        }))
+
+    def _set_store(self, store):
+        self._store = store
+        self._start_ms = int(store.meta["start_ms"])
+        self._raw_count = int(store.meta["raw_count"])
+        self._expected_count = int(store.meta["expected_count"])
 
     def get_stats(self) -> dict:
         """Returns statistics aboutloaded data"""
-        if self._df_resampled is None:
+        if self._store is None:
             return {}
             
         duration_sec = self.get_duration_ms() / 1000.0
@@ -153,39 +356,40 @@ class CSVReader:
         
         return {
             "duration_str": str(pd.Timedelta(seconds=duration_sec)).split('.')[0], # HH:MM:SS
-            "total_samples": len(self._df_resampled),
+            "total_samples": len(self._store),
             "expected_samples": self._expected_count,
             "raw_samples": self._raw_count,
             "missing_ratio": missing_ratio
         }
 
-    def get_data(self) -> pd.DataFrame:
+    def get_data(self) -> SessionStore:
         """
-        Returns the processed, 50Hz resampled dataframe.
+        Returns the processed, 50Hz resampled session.
+        Columns (t_ms, accelX/Y/Z, gyroX/Y/Z, acc_mag, gyro_mag) are memory-mapped views.
         """
-        return self._df_resampled
+        return self._store
 
     def get_duration_ms(self) -> float:
-        if self._df_resampled is not None:
-            return self._df_resampled['t_ms'].iloc[-1]
+        if self._store is not None and not self._store.empty:
+            return float(self._store['t_ms'][-1])
         return 0.0
 
     def get_start_timestamp_str(self) -> str:
-        if self._df_raw is not None and not self._df_raw.empty:
+        if self._start_ms is not None:
             # Use original raw start time
-            return self._df_raw.index[0].strftime('%Y/%m/%d %H:%M:%S.%f')[:-3]
+            return self.get_start_datetime().strftime('%Y/%m/%d %H:%M:%S.%f')[:-3]
         return ""
         
     def get_start_timestamp_unix(self) -> float:
         """Returns start unix timestamp in milliseconds"""
-        if self._df_raw is not None and not self._df_raw.empty:
-            return self._df_raw.index[0].timestamp() * 1000
+        if self._start_ms is not None:
+            return float(self._start_ms)
         return 0.0
 
     def get_start_datetime(self) -> datetime:
         """Returns start datetime object (Naive)"""
-        if self._df_raw is not None and not self._df_raw.empty:
-            return self._df_raw.index[0].to_pydatetime()
+        if self._start_ms is not None:
+            return datetime(1970, 1, 1) + timedelta(milliseconds=self._start_ms)
         return datetime.min
 
 if __name__ == "__main__":
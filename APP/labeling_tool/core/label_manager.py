@@ -4,6 +4,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 from core.constants import LabelType
+from core.label_store import LabelLog
 
 class LabelManager:
     """
@@ -23,6 +24,7 @@ class LabelManager:
         self._current_session_id = "default_session"
         self._csv_reader = None # Ref to CSV reader for data
         self._sync_manager = None # Ref for full sync details
+        self._log = None # LabelLog of the current output file
         
     def set_window_size(self, pre, post):
         self.PRE_WINDOW = pre
@@ -46,6 +48,12 @@ class LabelManager:
     def get_output_path(self):
         return os.path.join(self.output_dir, f"{self._current_session_id}.jsonl")
         
+    def _get_log(self):
+        path = self.get_output_path()
+        if self._log is None or self._log.path != path:
+            self._log = LabelLog(path)
+        return self._log
+        
     def save_label(self, label_type: int, t_csv_ms: float) -> bool:
         """
         Slice data at t_csv_ms and append to JSONL.
@@ -54,22 +62,21 @@ class LabelManager:
             print("Error: No CSV loaded")
             return False
             
-        df = self._csv_reader.get_data()
-        if df is None or df.empty:
+        data = self._csv_reader.get_data()
+        if data is None or data.empty:
             return False
             
         # 1. Find nearest index
         # t_csv_ms is current cursor time
-        # df is indexed by datetime, but has 't_ms' column
-        # Find row closest to t_csv_ms
+        # data is the resampled SessionStore, 't_ms' is a memory-mapped int64 column
         # Faster way: t_ms is regular grid? Yes, 20ms.
         # So index = t_csv_ms / 20. But better to use searchsorted for robustness.
         
         # Using searchsorted on t_ms column
-        idx = df['t_ms'].searchsorted(t_csv_ms)
+        idx = int(np.searchsorted(data['t_ms'], t_csv_ms))
         
-        if idx >= len(df):
-            idx = len(df) - 1
+        if idx >= len(data):
+            idx = len(data) - 1
             
         # Check if t_ms at idx is close enough? (Validation)
         # Assuming grid is dense, just perform windowing around idx
@@ -77,16 +84,16 @@ class LabelManager:
         start_idx = idx - self.PRE_WINDOW
         end_idx = idx + self.POST_WINDOW + 1 # Slice is exclusive at end
         
-        if start_idx < 0 or end_idx > len(df):
+        if start_idx < 0 or end_idx > len(data):
             print(f"Error: Window out of bounds. Idx={idx}, Range=[{start_idx}, {end_idx}]")
             return False
             
         # 2. Extract Data
-        # Shape: (80, 6) -> accelX,Y,Z, gyroX,Y,Z
-        cols = ['accelX', 'accelY', 'accelZ', 'gyroX', 'gyroY', 'gyroZ']
-        window_df = df.iloc[start_idx:end_idx][cols]
+        # Shape: (40, 6) -> accelX,Y,Z, gyroX,Y,Z
+        window = data.window(start_idx, end_idx)
         
-        data_matrix = window_df.values.tolist()
+        # Columns are float32: round so the JSON keeps the sensor precision, not float32 noise
+        data_matrix = window.astype(np.float64).round(6).tolist()
         
         if len(data_matrix) != self.WINDOW_SIZE:
              print(f"Error: Slice length {len(data_matrix)} != {self.WINDOW_SIZE}")
@@ -105,8 +112,7 @@ class LabelManager:
         
         # 4. Append to file
         try:
-            with open(self.get_output_path(), 'a', encoding='utf-8') as f:
-                f.write(json.dumps(record) + "\n")
+            self._get_log().append(record)
             print(f"Label saved: {LabelType.to_str(label_type)} at {t_csv_ms:.0f}ms")
             return True
         except Exception as e:
@@ -114,28 +120,10 @@ class LabelManager:
             return False
 
     def undo_last_label(self):
-        """Remove last line from JSONL file"""
-        path = self.get_output_path()
-        if not os.path.exists(path):
-            return
-            
+        """Remove the last label (truncates the JSONL at its start offset, see LabelLog)"""
         try:
-            # Read all lines
-            with open(path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            if not lines:
-                return
-                
-            # Remove last
-            lines = lines[:-1]
-            
-            # Write back
-            with open(path, 'w', encoding='utf-8') as f:
-                f.writelines(lines)
-                
-            print(f"Undo successful.")
-            
+            if self._get_log().undo():
+                print(f"Undo successful.")
         except Exception as e:
             print(f"Error undoing: {e}")
 
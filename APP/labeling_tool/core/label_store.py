@@ -0,0 +1,79 @@
+import os
+import json
+import mmap
+import numpy as np
+
+class LabelLog:
+    """
+    Append-only JSONL label file with an in-memory byte-offset index of its records.
+
+    - append() writes one record (one line) at the end of the file and remembers where it starts.
+    - undo() truncates the file at the start offset of the last record: O(1), the earlier
+      records are never rewritten, and an interrupted undo leaves either the old or the
+      new file, never a half-written one.
+    - The index is built once per file by scanning for newlines (no JSON parsing). A last
+      line that is not a complete record (the tool was killed in the middle of a write) is
+      cut off, so the file always ends with a complete record.
+
+    The file format is unchanged (one label record per line), so server/swing_datasets.py
+    and other JSONL readers work as before.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._offsets = None  # start offset of every record, in file order
+        self._end = 0         # file size the index describes
+
+    def __len__(self):
+        self._ensure_index()
+        return len(self._offsets)
+
+    def _ensure_index(self):
+        # Rescan if the file was changed behind our back (e.g. deleted or edited by hand)
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if self._offsets is None or size != self._end:
+            self._scan(size)
+
+    def _scan(self, size):
+        self._offsets = []
+        self._end = 0
+        if size == 0:
+            return
+        with open(self.path, "r+b") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                newlines = np.flatnonzero(np.frombuffer(mm, dtype=np.uint8) == ord("\n"))
+            end = int(newlines[-1]) + 1 if newlines.size else 0
+            if end < size:
+                f.seek(end)
+                tail = f.read()
+                try:
+                    json.loads(tail) # complete record, only the newline is missing
+                    f.write(b"\n")
+                    newlines = np.append(newlines, size)
+                    end = size + 1
+                except ValueError:
+                    print(f"Removing incomplete last record of {self.path} ({size - end} bytes)")
+                    f.truncate(end)
+        starts = np.concatenate([[0], newlines[:-1] + 1]) if newlines.size else np.zeros(0, dtype=np.int64)
+        self._offsets = starts[newlines > starts].tolist() # skip blank lines
+        self._end = end
+
+    def append(self, record):
+        """Append one record (dict) as a JSON line."""
+        self._ensure_index()
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(line)
+        self._offsets.append(self._end)
+        self._end += len(line)
+
+    def undo(self):
+        """Remove the last record. Returns False if the file has none."""
+        self._ensure_index()
+        if not self._offsets:
+            return False
+        offset = self._offsets.pop()
+        with open(self.path, "r+b") as f:
+            f.truncate(offset)
+        self._end = offset
+        return True
@@ -0,0 +1,92 @@
+import numpy as np
+
+class MinMaxPyramid:
+    """
+    Multi-resolution min/max envelope of one channel, for drawing long sessions at
+    screen resolution without losing peaks.
+
+    Level k (k >= 1) holds the min and max of every block of FACTOR**k samples, built from
+    level k - 1, so the whole pyramid costs about 2/3 of the channel in extra memory
+    (FACTOR = 4). envelope() picks the coarsest level that still gives at least one bucket
+    per pixel and returns at most ~2 points per pixel, whatever the session length.
+    """
+
+    FACTOR = 4
+
+    def __init__(self, values):
+        self._values = values      # level 0 (e.g. a SessionStore memmap view)
+        self._mins = []            # _mins[k - 1] / _maxs[k - 1] = level k
+        self._maxs = []
+        self._build(0)
+
+    def __len__(self):
+        return len(self._values)
+
+    def _reduce(self, lo, hi, start):
+        """Buckets of FACTOR consecutive entries of (lo, hi) beginning at entry `start` (last one may be partial)."""
+        lo = np.asarray(lo[start:])
+        hi = np.asarray(hi[start:])
+        full = len(lo) // self.FACTOR * self.FACTOR
+        mins = lo[:full].reshape(-1, self.FACTOR).min(axis=1)
+        maxs = hi[:full].reshape(-1, self.FACTOR).max(axis=1)
+        if full < len(lo):
+            mins = np.append(mins, lo[full:].min())
+            maxs = np.append(maxs, hi[full:].max())
+        return mins.astype(np.float32), maxs.astype(np.float32)
+
+    def _build(self, start):
+        """(Re)build every level from level-0 sample `start` onwards; earlier complete buckets are kept."""
+        lo = hi = self._values
+        level = 0
+        while len(lo) > 1:
+            # First bucket of this level that contains samples at or after `start`
+            b0 = start // self.FACTOR
+            mins, maxs = self._reduce(lo, hi, b0 * self.FACTOR)
+            if level < len(self._mins):
+                mins = np.concatenate([self._mins[level][:b0], mins])
+                maxs = np.concatenate([self._maxs[level][:b0], maxs])
+                self._mins[level], self._maxs[level] = mins, maxs
+            else:
+                self._mins.append(mins)
+                self._maxs.append(maxs)
+            lo, hi = mins, maxs
+            start = b0
+            level += 1
+        del self._mins[level:], self._maxs[level:]
+
+    def extend(self, values):
+        """Channel grew (appended samples): only the trailing buckets of each level are recomputed."""
+        old = len(self._values)
+        self._values = values
+        self._build(old)
+
+    def level_for(self, n_samples, max_buckets):
+        """Coarsest level needed so that n_samples fit in at most max_buckets buckets (0 = raw samples)."""
+        level = 0
+        while n_samples > max_buckets and level < len(self._mins):
+            n_samples = -(-n_samples // self.FACTOR)
+            level += 1
+        return level
+
+    def envelope(self, i0, i1, level):
+        """
+        Points for samples [i0, i1) at `level`: (x, y) with x in (fractional) sample indices.
+        Level 0 returns the samples; higher levels return min and max of each bucket at
+        the bucket centre, so every peak in the range is drawn.
+        """
+        i0 = max(int(i0), 0)
+        i1 = min(int(i1), len(self._values))
+        if i1 <= i0:
+            return np.zeros(0), np.zeros(0, dtype=np.float32)
+        if level == 0:
+            return np.arange(i0, i1, dtype=np.float64), np.asarray(self._values[i0:i1])
+
+        size = self.FACTOR ** level
+        b0 = i0 // size
+        b1 = -(-i1 // size)
+        centers = (np.arange(b0, b1, dtype=np.float64) + 0.5) * size
+        x = np.repeat(centers, 2)
+        y = np.empty(2 * (b1 - b0), dtype=np.float32)
+        y[0::2] = self._mins[level - 1][b0:b1]
+        y[1::2] = self._maxs[level - 1][b0:b1]
+        return x, y
@@ -0,0 +1,38 @@
+import numpy as np
+from scipy.signal import find_peaks
+
+class PeakIndex:
+    """
+    Swing candidates of a session: local maxima of the acceleration magnitude above a
+    threshold, at least MIN_DISTANCE_MS apart (scipy.signal.find_peaks). Built once per
+    load / threshold; next/previous navigation is a binary search on the sorted peak times.
+    """
+
+    MIN_DISTANCE_MS = 500
+
+    def __init__(self, idx, t_ms, values, threshold):
+        self.idx = idx            # (k,) sample indices, ascending
+        self.t_ms = t_ms          # (k,) peak times (relative ms)
+        self.values = values      # (k,) magnitude at each peak
+        self.threshold = threshold
+
+    @classmethod
+    def build(cls, t_ms, mag, threshold, dt_ms=20):
+        """Detect peaks of `mag` (e.g. SessionStore['acc_mag']) above `threshold`."""
+        distance = max(int(round(cls.MIN_DISTANCE_MS / dt_ms)), 1)
+        idx, _ = find_peaks(np.asarray(mag), height=threshold, distance=distance)
+        idx = idx.astype(np.int64)
+        return cls(idx, np.asarray(t_ms)[idx].astype(np.float64), np.asarray(mag)[idx], threshold)
+
+    def __len__(self):
+        return len(self.idx)
+
+    def next_after(self, t_ms, min_gap_ms=1.0):
+        """Position in the index of the first peak later than t_ms + min_gap_ms, or None."""
+        i = int(np.searchsorted(self.t_ms, t_ms + min_gap_ms, side='right'))
+        return i if i < len(self.t_ms) else None
+
+    def prev_before(self, t_ms, min_gap_ms=1.0):
+        """Position in the index of the last peak earlier than t_ms - min_gap_ms, or None."""
+        i = int(np.searchsorted(self.t_ms, t_ms - min_gap_ms, side='left')) - 1
+        return i if i >= 0 else None
@@ -0,0 +1,178 @@
+import os
+import json
+import shutil
+import numpy as np
+
+SENSOR_COLUMNS = ['accelX', 'accelY', 'accelZ', 'gyroX', 'gyroY', 'gyroZ']
+
+class SessionStore:
+    """
+    Resampled 50Hz session stored as memory-mapped columns, so a day of recordings
+    does not have to fit in RAM. Directory layout:
+
+        meta.json     version, source key, n, start_ms, dt_ms, raw / expected sample counts,
+                      last raw sample (for incremental appends)
+        t_ms.i64      (n,) int64   relative ms on the 20ms grid
+        accelX.f32 .. gyroZ.f32, acc_mag.f32, gyro_mag.f32
+                      (n,) float32 each, raw little-endian
+
+    One flat file per column, so new samples are appended to the end of every file
+    (append()) without rewriting what is already there; meta.json is always written last
+    and its `n` decides how much of each file is valid.
+
+    Read access looks like the old resampled DataFrame: store['accelX'] returns a read-only
+    view (no copy), len(store) / store.empty work as before, store.window(a, b) returns
+    the (b - a, 6) sensor slice used for labels and store.windows() many of them at once.
+    """
+
+    VERSION = 2
+    COLUMNS = SENSOR_COLUMNS + ['acc_mag', 'gyro_mag']
+
+    def __init__(self, t_ms, columns, meta, path=None):
+        self._t_ms = t_ms
+        self._columns = columns   # list of 8 (n,) float32 arrays, in COLUMNS order
+        self.meta = meta
+        self.path = path
+        self._col_idx = {name: i for i, name in enumerate(self.COLUMNS)}
+
+    @classmethod
+    def _file(cls, path, name):
+        return os.path.join(path, name + (".i64" if name == 't_ms' else ".f32"))
+
+    # --- Creation ---
+    @classmethod
+    def allocate(cls, path, n):
+        """
+        Writable float32 columns (list of 8 (n,) arrays) for a new store at `path`.
+        Filled in place (e.g. by resample_uniform) and then published with commit().
+        path=None keeps the columns in memory (no cache).
+        """
+        if path is None:
+            return list(np.empty((len(cls.COLUMNS), n), dtype=np.float32))
+        os.makedirs(path, exist_ok=True)
+        # meta.json is written last and marks the store complete, so drop it first
+        if os.path.exists(os.path.join(path, "meta.json")):
+            os.remove(os.path.join(path, "meta.json"))
+        return [np.memmap(cls._file(path, name), dtype=np.float32, mode="w+", shape=(n,))
+                for name in cls.COLUMNS]
+
+    @classmethod
+    def commit(cls, path, columns, t_ms, meta):
+        """Write t_ms + meta next to the allocated columns; returns the store opened read-only."""
+        meta = dict(meta, version=cls.VERSION, n=int(len(t_ms)))
+        if path is None:
+            return cls(np.asarray(t_ms, dtype=np.int64), columns, meta)
+
+        for col in columns:
+            col.flush()
+        np.asarray(t_ms, dtype='<i8').tofile(cls._file(path, 't_ms'))
+        cls._write_meta(path, meta)
+        return cls.open(path)
+
+    @staticmethod
+    def _write_meta(path, meta):
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def open(cls, path, key=None):
+        """Memory-map an existing store. None if missing, broken or built from a different source key."""
+        try:
+            with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != cls.VERSION or (key is not None and meta.get("key") != key):
+                return None
+            n = meta["n"]
+            t_ms = np.memmap(cls._file(path, 't_ms'), dtype='<i8', mode="r", shape=(n,))
+            columns = [np.memmap(cls._file(path, name), dtype='<f4', mode="r", shape=(n,))
+                       for name in cls.COLUMNS]
+            return cls(t_ms, columns, meta, path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    # --- Incremental growth ---
+    def append(self, t_ms, block, meta_updates):
+        """
+        Append samples: t_ms (m,) relative ms, block (8, m) float32 in COLUMNS order.
+        Previously returned views stay valid (they keep their old length); read the
+        columns again to see the new samples.
+        """
+        meta = dict(self.meta, **meta_updates)
+        m = len(t_ms)
+        if self.path is None:
+            self._t_ms = np.concatenate([self._t_ms, np.asarray(t_ms, dtype=np.int64)])
+            self._columns = [np.concatenate([col, block[i]]) for i, col in enumerate(self._columns)]
+            self.meta = dict(meta, n=len(self._t_ms))
+            return
+
+        n = self.meta["n"]
+        arrays = [('t_ms', np.asarray(t_ms, dtype='<i8'))] + \
+                 [(name, np.asarray(block[i], dtype='<f4')) for i, name in enumerate(self.COLUMNS)]
+        for name, arr in arrays:
+            # Write at the valid end (not the file end): leftovers of an interrupted append are overwritten
+            with open(self._file(self.path, name), "r+b") as f:
+                f.seek(n * arr.itemsize)
+                f.write(arr.tobytes())
+        meta["n"] = n + m
+        self._write_meta(self.path, meta)
+
+        reopened = SessionStore.open(self.path)
+        self._t_ms, self._columns, self.meta = reopened._t_ms, reopened._columns, reopened.meta
+
+    def move(self, path):
+        """
+        Rename the store directory to `path` (replacing a store already there) and reopen it.
+        Returns False and stays where it is if the OS refuses, e.g. Windows while views are mapped.
+        """
+        if self.path is None or os.path.abspath(path) == os.path.abspath(self.path):
+            return True
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            os.replace(self.path, path)
+        except OSError as e:
+            print(f"Could not move session store {self.path}: {e}")
+            return False
+        self.path = path
+        reopened = SessionStore.open(path)
+        self._t_ms, self._columns, self.meta = reopened._t_ms, reopened._columns, reopened.meta
+        return True
+
+    def update_meta(self, **updates):
+        self.meta = dict(self.meta, **updates)
+        if self.path is not None:
+            self._write_meta(self.path, self.meta)
+
+    # --- DataFrame-like read access ---
+    def __len__(self):
+        return len(self._t_ms)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def __getitem__(self, name):
+        if name == 't_ms':
+            return self._t_ms
+        return self._columns[self._col_idx[name]]
+
+    def window(self, start_idx, end_idx):
+        """(end - start, 6) float32 copy of the sensor columns (small: one label window)."""
+        return np.stack([col[start_idx:end_idx] for col in self._columns[:6]], axis=1)
+
+    def windows(self, centers, pre, post):
+        """
+        (N, pre + post + 1, 6) float32 windows [c - pre, c + post] around each center index,
+        i.e. window(c - pre, c + post + 1) for every c at once: a sliding-window view of each
+        column indexed by the window starts, so only the N windows are copied.
+        Every window must lie inside the store.
+        """
+        starts = np.asarray(centers, dtype=np.int64) - pre
+        out = np.empty((len(starts), pre + post + 1, 6), dtype=np.float32)
+        if len(starts) == 0:
+            return out
+        for c, col in enumerate(self._columns[:6]):
+            out[:, :, c] = np.lib.stride_tricks.sliding_window_view(col, pre + post + 1)[starts]
+        return out
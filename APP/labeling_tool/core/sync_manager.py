@@ -8,6 +8,10 @@ class SyncManager:
     """
     
     def __init__(self):
+        self.reset()
+        
+    def reset(self):
+        """Back to offset 0 / scale 1.0 without anchors (in place: LabelManager keeps a reference)."""
         self._offset_ms = 0.0
         self._scale_factor = 1.0
         
@@ -40,7 +44,7 @@ class SyncManager:
     def _recalculate(self):
         """
         Recalculate Offset and Scale based on anchors.
-        If only A is set -> simple offset update.
+        If only A is set -> simple offset update (scale kept: 1.0, or the auto-sync estimate).
         If A and B are set -> two-point scaling.
         """
         if self._anchor_a is not None and self._anchor_b is not None:
@@ -55,10 +59,9 @@ class SyncManager:
             self._offset_ms = t_c1 - (t_v1 * self._scale_factor)
             
         elif self._anchor_a is not None:
-            # Single anchor (Start) -> Just offset, keep scale=1.0
+            # Single anchor (Start) -> Just offset, keep the current scale
             t_v1, t_c1 = self._anchor_a
-            self._scale_factor = 1.0
-            self._offset_ms = t_c1 - t_v1
+            self._offset_ms = t_c1 - (t_v1 * self._scale_factor)
             
     def get_params(self):
         return {
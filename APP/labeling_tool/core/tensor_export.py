@@ -0,0 +1,73 @@
+import os
+import json
+import numpy as np
+from core.constants import LabelType
+from core.session_store import SENSOR_COLUMNS
+
+try:
+    import h5py
+except ImportError:  # optional, only needed for .h5 / .hdf5 output
+    h5py = None
+
+def label_indices(t_ms, label_times):
+    """Sample index of each label time, as LabelManager.save_label finds it (searchsorted, clipped to the end)."""
+    idx = np.searchsorted(t_ms, np.asarray(label_times, dtype=np.float64))
+    return np.minimum(idx, len(t_ms) - 1).astype(np.int64)
+
+def extract_windows(data, label_times, label_ids, pre, post):
+    """
+    All label windows of a session at once.
+    data: SessionStore; label_times: (N,) relative ms; label_ids: (N,) LabelType values.
+    Returns (X (M, pre + post + 1, 6) float32, y (M,) int8, t_ms (M,) float64, n_skipped):
+    labels whose window would leave the session are skipped, like save_label refuses them.
+    """
+    label_times = np.asarray(label_times, dtype=np.float64)
+    label_ids = np.asarray(label_ids, dtype=np.int8)
+    idx = label_indices(data['t_ms'], label_times)
+    keep = (idx - pre >= 0) & (idx + post + 1 <= len(data))
+    X = data.windows(idx[keep], pre, post)
+    return X, label_ids[keep], label_times[keep], int((~keep).sum())
+
+def write_tensors(out_path, X, y, t_ms, meta, extra=None):
+    """
+    Write one dataset: X (N, W, 6) float32, y (N,) label ids, t_ms (N,) label times and
+    the metadata (dict of str / numbers, stored as JSON). `extra` adds more (N,) arrays
+    (e.g. the session of every window in a combined dataset).
+    .npz -> numpy archive (np.load(path)['X']); .h5 / .hdf5 -> HDF5 datasets X, y, t_ms
+    with the metadata as attributes (needs h5py).
+    """
+    label_names = np.array([LabelType.to_str(l) for l in LabelType])
+    label_ids = np.array([int(l) for l in LabelType], dtype=np.int8)
+    meta = dict(meta, columns=SENSOR_COLUMNS, window=int(X.shape[1]) if X.ndim == 3 else 0)
+    extra = extra or {}
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    if out_path.lower().endswith((".h5", ".hdf5")):
+        if h5py is None:
+            raise RuntimeError("HDF5 export needs the h5py package (pip install h5py), or save as .npz")
+        with h5py.File(out_path, "w") as f:
+            f.create_dataset("X", data=X, chunks=True if len(X) else None)
+            f.create_dataset("y", data=y)
+            f.create_dataset("t_ms", data=t_ms)
+            for name, arr in extra.items():
+                f.create_dataset(name, data=arr)
+            f.create_dataset("label_ids", data=label_ids)
+            f.create_dataset("label_names", data=label_names.astype("S"))
+            f.attrs["meta"] = json.dumps(meta)
+    else:
+        np.savez(out_path, X=X, y=y, t_ms=t_ms, label_ids=label_ids, label_names=label_names,
+                 meta=np.array(json.dumps(meta)), **extra)
+    return out_path
+
+def export_session(data, labels, out_path, pre, post, session_id="", extra_meta=None):
+    """
+    Export the labels of one session (list of (t_ms, label_id) as LabelManager.load_labels
+    returns) as training tensors. Returns (number exported, number skipped).
+    """
+    times = [t for t, _ in labels]
+    ids = [l for _, l in labels]
+    X, y, t_ms, skipped = extract_windows(data, times, ids, pre, post)
+    meta = dict(extra_meta or {}, session_id=session_id, pre_window=int(pre), post_window=int(post),
+                dt_ms=int(data.meta.get("dt_ms", 20)), start_ms=data.meta.get("start_ms"))
+    write_tensors(out_path, X, y, t_ms, meta)
+    return len(X), skipped
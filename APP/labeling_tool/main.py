@@ -1,5 +1,8 @@
 import sys
 import os
+import threading
+import multiprocessing
+import numpy as np
 
 # Ensure High DPI support
 os.environ["QT_AUTO_SCREEN_SCALE_FACTOR"] = "1"
@@ -7,14 +10,30 @@ os.environ["QT_AUTO_SCREEN_SCALE_FACTOR"] = "1"
 from PySide6.QtWidgets import (QApplication, QMainWindow, QLabel, QVBoxLayout, 
                                QWidget, QFileDialog, QMenuBar, QMenu, QSplitter)
 from PySide6.QtGui import QAction
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QObject, Signal
 from ui.graph_widget import GraphWidget
 from ui.video_player import VideoPlayer
 from ui.sync_widget import SyncWidget
 from ui.label_widget import LabelWidget
+from ui.sync_scheduler import SyncScheduler
 from core.csv_reader import CSVReader
 from core.sync_manager import SyncManager
 from core.label_manager import LabelManager
+from core.constants import LabelType
+from core import auto_labeler
+from core import auto_sync
+
+class _AutoLabelSignals(QObject):
+    """Progress / result of the auto-label worker thread, delivered to the GUI thread."""
+    progress = Signal(int, int) # (done, total); total = 0 while the model loads
+    done = Signal(object)       # PreLabels, or None if cancelled
+    failed = Signal(str)
+
+class _AutoSyncSignals(QObject):
+    """Progress / result of the auto-sync worker thread, delivered to the GUI thread."""
+    progress = Signal(str, int, int) # (stage, done, total); total = 0 -> busy indicator
+    done = Signal(object)            # (video path, (t_ms, energy), estimate dict), or None if cancelled
+    failed = Signal(str)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -26,10 +45,16 @@ class MainWindow(QMainWindow):
         self.csv_reader = CSVReader()
         self.sync_manager = SyncManager()
         self.label_manager = LabelManager()
+        # Video <-> Graph cursor updates, at most one per display refresh
+        self.sync_scheduler = SyncScheduler(self)
         
         # State
         self.is_sync_locked = True
         self.current_t_csv = 0.0
+        self._prelabels = None # auto_labeler.PreLabels under review
+        self._auto_label_cancel = None
+        self._auto_sync_cancel = None
+        self._motion_energy = {} # video path -> (t_ms, energy), decoding an hour of video takes a while
         
         # Central Widget & Main Layout
         central_widget = QWidget()
@@ -66,11 +91,14 @@ class MainWindow(QMainWindow):
         self._connect_signals()
         
     def _connect_signals(self):
-        # Video -> Graph
+        # Video -> Graph (position reports are paced and interpolated by the scheduler)
         self.video_player.position_changed.connect(self._on_video_position_changed)
+        self.video_player.playback_changed.connect(self._on_playback_changed)
+        self.sync_scheduler.cursor_due.connect(self._on_cursor_due)
         
         # Graph -> Video
         self.graph_widget.cursor_changed.connect(self._on_graph_cursor_changed)
+        self.sync_scheduler.seek_due.connect(self._on_seek_due)
         
         # Sync Widget Signals
         self.sync_widget.set_anchor_a.connect(self._on_set_anchor_a)
@@ -107,6 +135,9 @@ class MainWindow(QMainWindow):
             
             # 2. Flash status or log
             print(f"Labeled: {label_type} at {t_csv}")
+            
+            # 3. Labeling on a pre-label (accept or correct) resolves it and moves on
+            self._resolve_prelabel(t_csv)
         else:
             # Show error (e.g. out of bounds)
             from PySide6.QtWidgets import QMessageBox
@@ -126,10 +157,28 @@ class MainWindow(QMainWindow):
             self._on_label_triggered(label_type)
         elif key == Qt.Key_Z:
             self._on_undo_triggered()
+        elif key in (Qt.Key_Return, Qt.Key_Enter):
+            self._accept_prelabel()
+        elif key == Qt.Key_X:
+            self._reject_prelabel()
         else:
             super().keyPressEvent(event)
             
     def _on_video_position_changed(self, t_vid):
+        if not self.is_sync_locked:
+            return
+        self.sync_scheduler.report_video(t_vid)
+        
+    def _on_playback_changed(self, playing, rate):
+        self.sync_scheduler.set_playing(playing, rate)
+        if not playing:
+            s = self.sync_scheduler.stats()
+            print(f"Sync: {s['frames']} frames ({s['interpolated']} interpolated), "
+                  f"{s['reports']} video reports + {s['seeks']} seeks, "
+                  f"{s['merged']} merged, {s['dropped']} dropped frames")
+            self.sync_scheduler.reset_stats()
+        
+    def _on_cursor_due(self, t_vid):
         if not self.is_sync_locked:
             return
             
@@ -146,7 +195,10 @@ class MainWindow(QMainWindow):
         # Update only if video is paused to avoid fighting
         if not self.video_player.is_playing():
             t_vid = self.sync_manager.csv_to_video(t_csv)
-            self.video_player.set_position(int(t_vid))
+            self.sync_scheduler.request_seek(t_vid)
+            
+    def _on_seek_due(self, t_vid):
+        self.video_player.set_position(int(t_vid))
 
     def _on_lock_toggled(self, locked):
         self.is_sync_locked = locked
@@ -177,7 +229,7 @@ class MainWindow(QMainWindow):
         self._update_sync_status()
         
     def _on_reset_sync(self):
-        self.sync_manager = SyncManager() # Reset
+        self.sync_manager.reset()
         self.sync_widget.clear_anchors()
         self._update_sync_status()
         
@@ -204,6 +256,12 @@ class MainWindow(QMainWindow):
         load_csv_action.triggered.connect(self._load_csv_files)
         file_menu.addAction(load_csv_action)
         
+        # Append new 5-minute segments while the session is still being recorded
+        append_csv_action = QAction("Append New CSV Segments", self)
+        append_csv_action.setShortcut("Ctrl+R")
+        append_csv_action.triggered.connect(self._append_csv_files)
+        file_menu.addAction(append_csv_action)
+        
         file_menu.addSeparator()
         
         # Load Labels Action
@@ -211,6 +269,24 @@ class MainWindow(QMainWindow):
         load_labels_action.triggered.connect(self._load_labels)
         file_menu.addAction(load_labels_action)
         
+        # Label windows as (N, W, 6) float32 tensors for training
+        export_action = QAction("Export Training Tensors...", self)
+        export_action.triggered.connect(self._export_tensors)
+        file_menu.addAction(export_action)
+        
+        tools_menu = menubar.addMenu("Tools")
+        
+        # Classify every detected peak with the server model -> pre-labels to review
+        auto_label_action = QAction("Auto-Label Peaks...", self)
+        auto_label_action.setShortcut("Ctrl+L")
+        auto_label_action.triggered.connect(self._start_auto_label)
+        tools_menu.addAction(auto_label_action)
+        
+        # Offset / scale from video motion vs. acc_mag; anchors A / B then refine it
+        auto_sync_action = QAction("Auto Sync from Video...", self)
+        auto_sync_action.triggered.connect(self._start_auto_sync)
+        tools_menu.addAction(auto_sync_action)
+        
     def _load_video(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self, "Open Video File", "", "Video Files (*.mp4 *.avi *.mov)"
@@ -230,14 +306,13 @@ class MainWindow(QMainWindow):
         labels = self.label_manager.load_labels(file_path)
         
         if labels:
-            count = 0
             # Get current config for visualization
             pre_ms = self.label_manager.PRE_WINDOW * 20
             post_ms = self.label_manager.POST_WINDOW * 20
             
-            for t_ms, l_type in labels:
-                self.graph_widget.add_marker(t_ms, l_type, window_ms=(pre_ms, post_ms))
-                count += 1
+            t_list, type_list = zip(*labels)
+            self.graph_widget.add_markers(t_list, type_list, window_ms=(pre_ms, post_ms))
+            count = len(labels)
             print(f"Resorted {count} markers.")
             
             from PySide6.QtWidgets import QMessageBox
@@ -245,6 +320,35 @@ class MainWindow(QMainWindow):
         else:
              print("No labels found or error.")
         
+    def _export_tensors(self):
+        from PySide6.QtWidgets import QMessageBox
+        from core.tensor_export import export_session
+        data = self.csv_reader.get_data()
+        label_path = self.label_manager.get_output_path()
+        if data is None or data.empty or not os.path.exists(label_path):
+            QMessageBox.warning(self, "Export", "Load the CSV files of a labeled session first.")
+            return
+            
+        session_id = os.path.splitext(os.path.basename(label_path))[0]
+        out_path, _ = QFileDialog.getSaveFileName(
+            self, "Export Training Tensors", os.path.join("labels", f"{session_id}.npz"),
+            "NumPy archive (*.npz);;HDF5 (*.h5 *.hdf5)"
+        )
+        if not out_path:
+            return
+            
+        labels = self.label_manager.load_labels(label_path)
+        try:
+            count, skipped = export_session(
+                data, labels, out_path, self.label_manager.PRE_WINDOW, self.label_manager.POST_WINDOW,
+                session_id=session_id, extra_meta={"sync_params": self.sync_manager.get_params()})
+        except Exception as e:
+            QMessageBox.warning(self, "Export Failed", str(e))
+            return
+        print(f"Exported {count} windows to {out_path} ({skipped} out of bounds)")
+        QMessageBox.information(self, "Export", f"Exported {count} windows to\n{out_path}"
+                                + (f"\n({skipped} labels skipped: window out of bounds)" if skipped else ""))
+        
     def _load_csv_files(self):
         file_paths, _ = QFileDialog.getOpenFileNames(
             self, "Open CSV Files", "", "CSV Files (*.csv)"
@@ -255,10 +359,10 @@ class MainWindow(QMainWindow):
             success = self.csv_reader.load_files(file_paths)
             if success:
                 print("Load successful. Plotting...")
-                df = self.csv_reader.get_data()
+                data = self.csv_reader.get_data()
                 # Get start datetime (Naive)
                 start_dt = self.csv_reader.get_start_datetime() 
-                self.graph_widget.set_data(df, start_dt)
+                self.graph_widget.set_data(data, start_dt)
                 
                 # Show Stats
                 stats = self.csv_reader.get_stats()
@@ -266,6 +370,10 @@ class MainWindow(QMainWindow):
                 # Init Label Manager
                 self.label_manager.set_context(self.csv_reader, self.sync_manager)
                 
+                # Pre-labels belonged to the previous session
+                self._prelabels = None
+                self.graph_widget.set_prelabels([], [])
+                
                 from PySide6.QtWidgets import QMessageBox
                 msg = (f"Loaded successfully!\n\n"
                        f"Duration: {stats.get('duration_str', '?')}\n"
@@ -276,6 +384,238 @@ class MainWindow(QMainWindow):
             else:
                 print("Load failed.")
 
+    def _append_csv_files(self):
+        """Merge CSVs that appeared (or grew) in the loaded folder since the last load."""
+        from PySide6.QtWidgets import QMessageBox
+        if self.csv_reader.get_data() is None:
+            self._load_csv_files()
+            return
+            
+        new_files = self.csv_reader.find_new_files()
+        if not new_files:
+            print("No new CSV segments.")
+            return
+            
+        print(f"Appending {len(new_files)} files...")
+        start_before = self.csv_reader.get_start_datetime()
+        added = self.csv_reader.append_files(new_files)
+        if added < 0:
+            QMessageBox.warning(self, "Append Failed", "Could not append the new CSV segments.")
+            return
+            
+        start_dt = self.csv_reader.get_start_datetime()
+        if start_dt != start_before:
+            # An earlier segment was merged (full reload): time axis moved
+            self.graph_widget.set_data(self.csv_reader.get_data(), start_dt)
+        else:
+            self.graph_widget.extend_data(self.csv_reader.get_data())
+        stats = self.csv_reader.get_stats()
+        print(f"Appended {added} samples, duration now {stats.get('duration_str', '?')}")
+
+    # --- Auto-labeling (pre-labels from the server classifier) ---
+    def _start_auto_label(self):
+        from PySide6.QtWidgets import QMessageBox, QProgressDialog
+        data = self.csv_reader.get_data()
+        peaks = self.graph_widget.peak_index()
+        if data is None or data.empty:
+            QMessageBox.warning(self, "Auto-Label", "Load CSV files first.")
+            return
+        if peaks is None or len(peaks) == 0:
+            QMessageBox.warning(self, "Auto-Label", "No peaks detected (yet). Check the peak threshold.")
+            return
+        if self._auto_label_cancel is not None:
+            return # already running
+            
+        # Same slicing as LabelManager.save_label
+        pre, post = self.label_manager.PRE_WINDOW, self.label_manager.POST_WINDOW
+        peak_idx, windows = auto_labeler.peak_windows(data, peaks.idx, pre, post)
+        t_ms = data['t_ms'][peak_idx].astype(float)
+        
+        self._auto_label_cancel = cancel = threading.Event()
+        self._auto_label_progress = dialog = QProgressDialog("Loading classifier...", "Cancel", 0, 0, self)
+        dialog.setWindowTitle("Auto-Label")
+        dialog.setMinimumDuration(0)
+        dialog.canceled.connect(cancel.set)
+        
+        signals = _AutoLabelSignals(self)
+        signals.progress.connect(self._on_auto_label_progress)
+        signals.done.connect(self._on_auto_label_done)
+        signals.failed.connect(self._on_auto_label_failed)
+        
+        def run():
+            try:
+                signals.progress.emit(0, 0)
+                classifier = auto_labeler.load_classifier()
+                result = auto_labeler.classify_windows(
+                    classifier, windows,
+                    progress=lambda done, total: signals.progress.emit(done, total),
+                    cancelled=cancel.is_set)
+                signals.done.emit(None if result is None else auto_labeler.PreLabels(t_ms, *result))
+            except Exception as e:
+                signals.failed.emit(str(e))
+                
+        print(f"Auto-labeling {len(windows)} peaks...")
+        threading.Thread(target=run, name="auto-label", daemon=True).start()
+        
+    def _on_auto_label_progress(self, done, total):
+        dialog = self._auto_label_progress
+        if total > 0:
+            dialog.setLabelText(f"Classifying peaks... {done}/{total}")
+            dialog.setMaximum(total)
+            dialog.setValue(done)
+            
+    def _finish_auto_label(self):
+        self._auto_label_cancel = None
+        self._auto_label_progress.reset()
+        
+    def _on_auto_label_failed(self, message):
+        from PySide6.QtWidgets import QMessageBox
+        self._finish_auto_label()
+        print(f"Auto-label failed: {message}")
+        QMessageBox.warning(self, "Auto-Label Failed", message)
+        
+    def _on_auto_label_done(self, prelabels):
+        self._finish_auto_label()
+        if prelabels is None:
+            print("Auto-label cancelled.")
+            return
+        self._prelabels = prelabels
+        self.graph_widget.set_prelabels(prelabels.t_ms, prelabels.labels)
+        counts = {LabelType.to_str(l): int((prelabels.labels == l).sum()) for l in LabelType}
+        print(f"Auto-label: {len(prelabels)} pre-labels {counts}")
+        print("Review: (Enter) accept, (1-5) correct, (X) reject")
+        self._goto_next_prelabel()
+        
+    def _current_prelabel(self):
+        if self._prelabels is None:
+            return None
+        return self._prelabels.pending_at(self.graph_widget.get_cursor_position())
+        
+    def _goto_next_prelabel(self):
+        if self._prelabels is None:
+            return
+        i = self._prelabels.next_pending(self.graph_widget.get_cursor_position())
+        if i is None:
+            print("All pre-labels reviewed.")
+            return
+        t = float(self._prelabels.t_ms[i])
+        self.graph_widget.set_cursor_position(t)
+        self._on_graph_cursor_changed(t)
+        print(f"Pre-label {LabelType.to_str(self._prelabels.labels[i])} "
+              f"({self._prelabels.confidence[i]:.0%}) at {t:.0f}ms, "
+              f"{self._prelabels.pending_count()} left")
+        
+    def _resolve_prelabel(self, t_csv):
+        if self._prelabels is None:
+            return
+        i = self._prelabels.pending_at(t_csv)
+        if i is None:
+            return
+        self._prelabels.resolve(i)
+        self.graph_widget.remove_prelabel(self._prelabels.t_ms[i])
+        self._goto_next_prelabel()
+        
+    def _accept_prelabel(self):
+        """Enter: save the suggested label at the cursor (or go to the next suggestion)."""
+        i = self._current_prelabel()
+        if i is None:
+            self._goto_next_prelabel()
+            return
+        self._on_label_triggered(int(self._prelabels.labels[i]))
+        
+    def _reject_prelabel(self):
+        """X: not a swing, drop the suggestion without saving."""
+        i = self._current_prelabel()
+        if i is not None:
+            self._resolve_prelabel(self._prelabels.t_ms[i])
+
+    # --- Auto-sync (video motion energy <-> acc_mag cross-correlation) ---
+    def _start_auto_sync(self):
+        from PySide6.QtWidgets import QMessageBox, QProgressDialog
+        data = self.csv_reader.get_data()
+        video_path = self.video_player.video_path()
+        if data is None or data.empty or not video_path:
+            QMessageBox.warning(self, "Auto Sync", "Load a video and its CSV files first.")
+            return
+        if self._auto_sync_cancel is not None:
+            return # already running
+            
+        imu_t = np.array(data['t_ms'], dtype=np.float64)
+        acc_mag = np.array(data['acc_mag'], dtype=np.float64)
+        energy = self._motion_energy.get(video_path)
+        
+        self._auto_sync_cancel = cancel = threading.Event()
+        self._auto_sync_progress = dialog = QProgressDialog("Reading video...", "Cancel", 0, 0, self)
+        dialog.setWindowTitle("Auto Sync")
+        dialog.setMinimumDuration(0)
+        dialog.canceled.connect(cancel.set)
+        
+        signals = _AutoSyncSignals(self)
+        signals.progress.connect(self._on_auto_sync_progress)
+        signals.done.connect(self._on_auto_sync_done)
+        signals.failed.connect(self._on_auto_sync_failed)
+        
+        def run():
+            try:
+                video = energy
+                if video is None:
+                    video = auto_sync.motion_energy(
+                        video_path,
+                        progress=lambda done, total: signals.progress.emit("Reading video frames", done, total),
+                        cancelled=cancel.is_set)
+                    if video is None:
+                        signals.done.emit(None)
+                        return
+                signals.progress.emit("Cross-correlating", 0, 0)
+                estimate = auto_sync.estimate_sync(imu_t, acc_mag, *video)
+                signals.done.emit(None if cancel.is_set() else (video_path, video, estimate))
+            except Exception as e:
+                signals.failed.emit(str(e))
+                
+        print(f"Auto-sync: {video_path}")
+        threading.Thread(target=run, name="auto-sync", daemon=True).start()
+        
+    def _on_auto_sync_progress(self, stage, done, total):
+        dialog = self._auto_sync_progress
+        dialog.setLabelText(f"{stage}... {done}/{total}" if total > 0 else f"{stage}...")
+        dialog.setMaximum(total)
+        dialog.setValue(done)
+        
+    def _finish_auto_sync(self):
+        self._auto_sync_cancel = None
+        self._auto_sync_progress.reset()
+        
+    def _on_auto_sync_failed(self, message):
+        from PySide6.QtWidgets import QMessageBox
+        self._finish_auto_sync()
+        print(f"Auto-sync failed: {message}")
+        QMessageBox.warning(self, "Auto Sync Failed", message)
+        
+    def _on_auto_sync_done(self, result):
+        from PySide6.QtWidgets import QMessageBox
+        self._finish_auto_sync()
+        if result is None:
+            print("Auto-sync cancelled.")
+            return
+        video_path, video, estimate = result
+        self._motion_energy[video_path] = video
+        offset, scale, score = estimate['offset_ms'], estimate['scale_factor'], estimate['score']
+        print(f"Auto-sync: offset={offset:.0f}ms scale={scale:.6f} score={score:.2f} ({estimate['elapsed_s']:.1f}s)")
+        
+        quality = "clear match" if score >= 0.3 else "weak match, check it" if score >= 0.1 else "no clear match"
+        answer = QMessageBox.question(
+            self, "Auto Sync",
+            f"Proposed sync ({quality}, score {score:.2f}):\n"
+            f"  Offset: {offset / 1000:.3f} s\n  Scale: {scale:.6f}\n\n"
+            "Apply it? Anchors A / B can refine it afterwards.")
+        if answer != QMessageBox.Yes:
+            return
+        # Start from the estimate: anchor A alone then shifts the offset and keeps this scale
+        self.sync_manager.reset()
+        self.sync_manager.set_params(offset, scale)
+        self.sync_widget.clear_anchors()
+        self._update_sync_status()
+
 def main():
     app = QApplication(sys.argv)
     window = MainWindow()
@@ -283,4 +623,6 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # CSV parsing uses a process pool; needed for the PyInstaller EXE on Windows
+    multiprocessing.freeze_support()
     main()
@@ -1,6 +1,10 @@
+import threading
 import pyqtgraph as pg
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QCheckBox, QHBoxLayout, QPushButton, QDoubleSpinBox, QLabel
-from PySide6.QtCore import Signal, Slot, Qt
+from PySide6.QtCore import QObject, Signal, Slot, Qt, QTimer
+from core.lod_pyramid import MinMaxPyramid
+from core.peak_index import PeakIndex
+from ui.marker_layer import MarkerSet, MarkerLayer
 from datetime import datetime, timedelta
 
 class TimeAxisItem(pg.AxisItem):
@@ -29,6 +33,10 @@ class TimeAxisItem(pg.AxisItem):
                 
         return ret
 
+class _PeakSignals(QObject):
+    """Delivers the result of a peak detection thread to the GUI thread (queued signal)."""
+    ready = Signal(int, object) # (generation, PeakIndex)
+
 class GraphWidget(QWidget):
     """
     Widget to display 6-axis IMU data + Magnitude.
@@ -38,6 +46,10 @@ class GraphWidget(QWidget):
     # Cursor position changed signal (time in ms)
     cursor_changed = Signal(float)
     
+    # Level of detail: curves only hold the visible range (+ this many view widths on each
+    # side, so small pans reuse what is drawn) at about one min/max bucket per pixel
+    LOD_MARGIN = 1.0
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         
@@ -68,6 +80,10 @@ class GraphWidget(QWidget):
         self._spin_thresh.setSingleStep(0.5)
         self._controls_layout.addWidget(self._spin_thresh)
         
+        self._btn_prev_peak = QPushButton("(<<) Prev Peak")
+        self._btn_prev_peak.clicked.connect(self._find_prev_peak)
+        self._controls_layout.addWidget(self._btn_prev_peak)
+        
         self._btn_next_peak = QPushButton("Next Peak (>>)")
         self._btn_next_peak.clicked.connect(self._find_next_peak)
         self._controls_layout.addWidget(self._btn_next_peak)
@@ -109,9 +125,28 @@ class GraphWidget(QWidget):
         self._cursor_acc = pg.InfiniteLine(angle=90, movable=True, pen=pg.mkPen('y', width=2))
         self._cursor_gyro = pg.InfiniteLine(angle=90, movable=True, pen=pg.mkPen('y', width=2))
         
+        self._cursor_acc.setZValue(10) # above the marker layer
+        self._cursor_gyro.setZValue(10)
         self._plot_acc.addItem(self._cursor_acc)
         self._plot_gyro.addItem(self._cursor_gyro)
         
+        # Label markers: all lines + windows of a plot are drawn by one item (see ui/marker_layer.py)
+        self._markers = MarkerSet()
+        self._marker_layer_acc = MarkerLayer(self._markers)
+        self._marker_layer_gyro = MarkerLayer(self._markers)
+        self._plot_acc.addItem(self._marker_layer_acc)
+        self._plot_gyro.addItem(self._marker_layer_gyro)
+        
+        # Classifier pre-labels waiting for review (dashed, no window)
+        self._prelabels = MarkerSet()
+        self._prelabel_layers = (MarkerLayer(self._prelabels, dashed=True), MarkerLayer(self._prelabels, dashed=True))
+        self._plot_acc.addItem(self._prelabel_layers[0])
+        self._plot_gyro.addItem(self._prelabel_layers[1])
+        
+        # Curves references (created once, updated in place)
+        self._curves_acc = self._make_curves(self._plot_acc)
+        self._curves_gyro = self._make_curves(self._plot_gyro)
+        
         # Connect cursor signals
         self._cursor_acc.sigPositionChanged.connect(self._on_cursor_dragged)
         self._cursor_gyro.sigPositionChanged.connect(self._on_cursor_dragged)
@@ -122,183 +157,228 @@ class GraphWidget(QWidget):
         self._acc = None # [ax, ay, az, amag]
         self._gyro = None # [gx, gy, gz, gmag]
         
-        # Curves references
-        self._curves_acc = {}
-        self._curves_gyro = {}
-        
-    def set_data(self, df, start_dt=None):
+        # Level of detail (min/max pyramid per channel, see core/lod_pyramid.py)
+        self._pyramids_acc = {}
+        self._pyramids_gyro = {}
+        self._lod_span = None # (i0, i1, level) currently held by the curves
+        self._lod_timer = QTimer(self)
+        self._lod_timer.setSingleShot(True)
+        self._lod_timer.setInterval(0) # coalesce all range changes of one event loop pass
+        self._lod_timer.timeout.connect(self._update_lod)
+        self._plot_acc.sigXRangeChanged.connect(self._lod_timer.start)
+        self._plot_acc.vb.sigResized.connect(self._lod_timer.start)
+        
+        # Peak index (core/peak_index.py), rebuilt in a background thread per load / threshold
+        self._peaks = None
+        self._peak_generation = 0 # results of older detections are dropped
+        self._peak_signals = _PeakSignals(self)
+        self._peak_signals.ready.connect(self._on_peaks_ready)
+        self._peak_timer = QTimer(self)
+        self._peak_timer.setSingleShot(True)
+        self._peak_timer.setInterval(300) # wait until the threshold stops changing
+        self._peak_timer.timeout.connect(self._detect_peaks)
+        self._spin_thresh.valueChanged.connect(self._peak_timer.start)
+        
+        # Candidate peaks: one scatter item on the accel plot
+        self._peak_overlay = pg.ScatterPlotItem(size=8, symbol='t1', pen=None, brush=pg.mkBrush(0, 255, 255, 140))
+        self._peak_overlay.setZValue(6) # above markers, below the cursor
+        self._plot_acc.addItem(self._peak_overlay)
+        
+    def set_data(self, data, start_dt=None):
         """
-        Set DataFrame from CSVReader.
+        Set the resampled session from CSVReader (SessionStore).
         Expected columns: t_ms, accelX/Y/Z, gyroX/Y/Z, acc_mag, gyro_mag
+        Columns are memory-mapped views; nothing is copied here.
         """
-        if df is None or df.empty:
+        if data is None or data.empty:
             return
             
-        self._t = df['t_ms'].values
-        self._start_timestamp = 0 # kept for compatibility if needed, but we rely on axis now
+        self._set_arrays(data)
+        self._pyramids_acc = {k: MinMaxPyramid(v) for k, v in self._acc.items()}
+        self._pyramids_gyro = {k: MinMaxPyramid(v) for k, v in self._gyro.items()}
         
         # Update Axis with offset
         if start_dt:
             self._plot_gyro.getAxis('bottom').set_start_datetime(start_dt)
         
+        self.plot_all()
+        self._detect_peaks()
+        
+    def _set_arrays(self, data):
+        self._t = data['t_ms']
+        self._start_timestamp = 0 # kept for compatibility if needed, but we rely on axis now
+        
         self._acc = {
-            'x': df['accelX'].values,
-            'y': df['accelY'].values,
-            'z': df['accelZ'].values,
-            'm': df['acc_mag'].values
+            'x': data['accelX'],
+            'y': data['accelY'],
+            'z': data['accelZ'],
+            'm': data['acc_mag']
         }
         
         self._gyro = {
-            'x': df['gyroX'].values,
-            'y': df['gyroY'].values,
-            'z': df['gyroZ'].values,
-            'm': df['gyro_mag'].values
+            'x': data['gyroX'],
+            'y': data['gyroY'],
+            'z': data['gyroZ'],
+            'm': data['gyro_mag']
         }
         
-        self.plot_all()
-        
-    def plot_all(self):
-        """Re-draw all curves."""
-        self._plot_acc.clear()
-        self._plot_gyro.clear()
+    def extend_data(self, data):
+        """
+        Session grew (CSVReader.append_files): extend the LOD pyramids (only their tail is
+        recomputed) and refresh the drawn range with setData on the existing curves.
+        Markers, cursors and the current view range are left alone.
+        """
+        if self._t is None or not self._pyramids_acc:
+            self.set_data(data)
+            return
+        if data is None or data.empty:
+            return
+            
+        self._set_arrays(data)
+        for key, pyramid in self._pyramids_acc.items():
+            pyramid.extend(self._acc[key])
+        for key, pyramid in self._pyramids_gyro.items():
+            pyramid.extend(self._gyro[key])
         
-        # Re-add cursors
-        self._plot_acc.addItem(self._cursor_acc)
-        self._plot_gyro.addItem(self._cursor_gyro)
+        # Redraw the current range from the extended pyramids
+        self._lod_span = None
+        self._update_lod()
+        self._detect_peaks()
         
     def add_marker(self, t_ms, label_type, window_ms=None):
         """
         Add a vertical line and optional range region.
         window_ms: tuple (pre_ms, post_ms)
         """
-        # Get color
-        from core.constants import LabelType
-        color = LabelType.get_color(label_type)
-        
-        # 1. Range Region (Background) - Draw FIRST so it's behind line
-        region_items = []
-        if window_ms:
-            pre_ms, post_ms = window_ms
-            # Faint gray brush: (R, G, B, Alpha) -> (100, 100, 100, 30)
-            brush = pg.mkBrush(150, 150, 150, 40)
-            
-            # Create regions for both plots
-            # movable=False to prevent user dragging
-            reg_acc = pg.LinearRegionItem(values=[t_ms - pre_ms, t_ms + post_ms], brush=brush, movable=False)
-            for l in reg_acc.lines: l.setPen(pg.mkPen(None)) # No border lines
-            
-            reg_gyro = pg.LinearRegionItem(values=[t_ms - pre_ms, t_ms + post_ms], brush=brush, movable=False)
-            for l in reg_gyro.lines: l.setPen(pg.mkPen(None))
-            
-            self._plot_acc.addItem(reg_acc)
-            self._plot_gyro.addItem(reg_gyro)
-            region_items = [reg_acc, reg_gyro]
-        
-        # 2. Key/Center Line
-        # Use SolidLine and Width=3 for better visibility
-        line_acc = pg.InfiniteLine(pos=t_ms, angle=90, pen=pg.mkPen(color, width=3, style=Qt.SolidLine))
-        line_gyro = pg.InfiniteLine(pos=t_ms, angle=90, pen=pg.mkPen(color, width=3, style=Qt.SolidLine))
+        pre_ms, post_ms = window_ms if window_ms else (0, 0)
+        self._markers.add(t_ms, label_type, pre_ms, post_ms)
+        self._refresh_markers()
         
-        self._plot_acc.addItem(line_acc)
-        self._plot_gyro.addItem(line_gyro)
-        
-        # Store for Undo as a tuple (flat list of items to remove)
-        if not hasattr(self, '_markers'):
-            self._markers = []
-            
-        # marker_entry = ((lines), (regions))
-        self._markers.append(((line_acc, line_gyro), tuple(region_items)))
+    def add_markers(self, t_ms, label_types, window_ms=None):
+        """Batch version of add_marker (e.g. loading a label file): one sort, one repaint."""
+        pre_ms, post_ms = window_ms if window_ms else (0, 0)
+        self._markers.extend(t_ms, label_types, pre_ms, post_ms)
+        self._refresh_markers()
         
     def remove_last_marker(self):
-        if hasattr(self, '_markers') and self._markers:
-            # Pop entry
-            (lines, regions) = self._markers.pop()
+        if self._markers.pop_last() is not None:
+            self._refresh_markers()
+            
+    def _refresh_markers(self):
+        self._marker_layer_acc.refresh()
+        self._marker_layer_gyro.refresh()
+        
+    def set_prelabels(self, t_ms, label_types):
+        """Show classifier suggestions (replaces the previous ones)."""
+        self._prelabels.clear()
+        self._prelabels.extend(t_ms, label_types)
+        for layer in self._prelabel_layers:
+            layer.refresh()
             
-            # Remove lines
-            for l in lines:
-                if l in self._plot_acc.items: self._plot_acc.removeItem(l)
-                if l in self._plot_gyro.items: self._plot_gyro.removeItem(l)
+    def remove_prelabel(self, t_ms):
+        """Suggestion at t_ms was accepted, corrected or rejected."""
+        i = self._prelabels.nearest(t_ms, max_dist_ms=0.5)
+        if i is not None:
+            self._prelabels.remove(i)
+            for layer in self._prelabel_layers:
+                layer.refresh()
                 
-            # Remove regions
-            for r in regions:
-                if r in self._plot_acc.items: self._plot_acc.removeItem(r)
-                if r in self._plot_gyro.items: self._plot_gyro.removeItem(r)
+    def peak_index(self):
+        """Current PeakIndex (None while detection is running / no data)."""
+        return self._peaks
 
     def plot_all(self):
-        """Re-draw all curves."""
-        self._plot_acc.clear()
-        self._plot_gyro.clear()
+        """
+        Re-draw all curves from the current data.
+        Curve items, cursors and markers are persistent: this only calls setData on the
+        curves, so its cost does not depend on the number of markers.
+        """
+        if self._t is None:
+            return
+            
+        # Whole session at screen resolution first, so autoRange sees the full extent;
+        # _update_lod then keeps the curves at the visible range.
+        self._lod_span = None
+        for key, curve in self._curves_acc.items():
+            curve.setData(*self._lod_points(self._pyramids_acc[key]))
+        for key, curve in self._curves_gyro.items():
+            curve.setData(*self._lod_points(self._pyramids_gyro[key]))
+        self._set_magnitude_visible(self._cb_magnitude.isChecked())
+            
+        # Set Auto Range (once: afterwards the curves only hold the visible range, so
+        # x must not follow their bounds). Only the curves are measured, not every marker.
+        self._plot_acc.autoRange(items=list(self._curves_acc.values()))
+        self._plot_gyro.autoRange(items=list(self._curves_gyro.values()))
+        self._plot_acc.enableAutoRange(x=False)
+        self._plot_gyro.enableAutoRange(x=False)
+        self._lod_timer.start()
+        
+    @staticmethod
+    def _make_curves(plot):
+        """Persistent curve items of one plot. X: Red, Y: Green, Z: Blue, Magnitude: white thick line."""
+        return {
+            'x': plot.plot(pen='r', name='X'),
+            'y': plot.plot(pen='g', name='Y'),
+            'z': plot.plot(pen='b', name='Z'),
+            'm': plot.plot(pen=pg.mkPen('w', width=2), name='Mag'),
+        }
         
-        # Re-add cursors
-        self._plot_acc.addItem(self._cursor_acc)
-        self._plot_gyro.addItem(self._cursor_gyro)
+    def _set_magnitude_visible(self, visible):
+        self._curves_acc['m'].setVisible(visible)
+        self._curves_gyro['m'].setVisible(visible)
         
-        # Re-add Markers
-        if hasattr(self, '_markers'):
-            try:
-                for entry in self._markers:
-                    # Determine format
-                    lines = []
-                    regions = []
-                    
-                    # New Format: tuple of 2 tuples -> ((l1,l2), (r1,r2))
-                    # Old Format: tuple of 2 lines -> (l1,l2)
-                    
-                    if len(entry) == 2 and isinstance(entry[0], tuple):
-                         # New Format
-                         lines = entry[0]
-                         regions = entry[1]
-                    else:
-                         # Old Format (assume just lines)
-                         lines = entry
-                         regions = []
+    def _view_pixels(self):
+        return max(int(self._plot_acc.vb.width()), 100)
 
-                    # Add Regions
-                    if regions:
-                        if len(regions) >= 2:
-                            if regions[0] and regions[0] not in self._plot_acc.items: 
-                                self._plot_acc.addItem(regions[0])
-                            if regions[1] and regions[1] not in self._plot_gyro.items: 
-                                self._plot_gyro.addItem(regions[1])
+    def _lod_points(self, pyramid, i0=0, i1=None, level=None):
+        """Curve data (t_ms, values) of samples [i0, i1) from a channel pyramid."""
+        if i1 is None:
+            i1 = len(pyramid)
+        if level is None:
+            level = pyramid.level_for(i1 - i0, self._view_pixels())
+        x, y = pyramid.envelope(i0, i1, level)
+        dt = self._t[1] - self._t[0] if len(self._t) > 1 else 1
+        return self._t[0] + x * dt, y
 
-                    # Add Lines
-                    if lines:
-                        if len(lines) >= 2:
-                             if lines[0] and lines[0] not in self._plot_acc.items: 
-                                self._plot_acc.addItem(lines[0])
-                             if lines[1] and lines[1] not in self._plot_gyro.items: 
-                                self._plot_gyro.addItem(lines[1])
-                                
-            except Exception as e:
-                print(f"Error restoring markers in plot_all: {e}")
-        
-        if self._t is None:
+    def _update_lod(self):
+        """Re-fill the curves for the visible time range (at most ~2 points per pixel)."""
+        if self._t is None or not self._pyramids_acc or len(self._t) < 2:
             return
             
-        # Draw Accel
-        # X: Red, Y: Green, Z: Blue
-        self._plot_acc.plot(self._t, self._acc['x'], pen='r', name='X')
-        self._plot_acc.plot(self._t, self._acc['y'], pen='g', name='Y')
-        self._plot_acc.plot(self._t, self._acc['z'], pen='b', name='Z')
-        
-        # Draw Gyro
-        self._plot_gyro.plot(self._t, self._gyro['x'], pen='r', name='X')
-        self._plot_gyro.plot(self._t, self._gyro['y'], pen='g', name='Y')
-        self._plot_gyro.plot(self._t, self._gyro['z'], pen='b', name='Z')
-        
-        # Draw Magnitude if checked
-        if self._cb_magnitude.isChecked():
-            # White thick line for magnitude
-            self._plot_acc.plot(self._t, self._acc['m'], pen=pg.mkPen('w', width=2), name='Mag')
-            self._plot_gyro.plot(self._t, self._gyro['m'], pen=pg.mkPen('w', width=2), name='Mag')
-            
-        # Set Auto Range
-        self._plot_acc.autoRange()
-        self._plot_gyro.autoRange()
+        n = len(self._t)
+        dt = float(self._t[1] - self._t[0])
+        x0, x1 = self._plot_acc.viewRange()[0]
+        i0 = max(int((x0 - self._t[0]) / dt), 0)
+        i1 = min(int((x1 - self._t[0]) / dt) + 2, n)
+        if i1 <= i0:
+            return
+        level = self._pyramids_acc['x'].level_for(i1 - i0, self._view_pixels())
+        
+        # Still covered by what is drawn at the same resolution -> nothing to do
+        if self._lod_span is not None:
+            d0, d1, d_level = self._lod_span
+            if d_level == level and d0 <= i0 and i1 <= d1:
+                return
+        
+        margin = int((i1 - i0) * self.LOD_MARGIN)
+        r0, r1 = max(i0 - margin, 0), min(i1 + margin, n)
+        self._lod_span = (r0, r1, level)
+        for key, curve in self._curves_acc.items():
+            if curve.isVisible():
+                curve.setData(*self._lod_points(self._pyramids_acc[key], r0, r1, level))
+        for key, curve in self._curves_gyro.items():
+            if curve.isVisible():
+                curve.setData(*self._lod_points(self._pyramids_gyro[key], r0, r1, level))
         
     def _update_plots(self):
-        """Refresh plots (e.g. when checkbox changes)."""
-        self.plot_all()
+        """Magnitude checkbox changed: toggle the two magnitude curves only."""
+        visible = self._cb_magnitude.isChecked()
+        if visible and self._t is not None and self._lod_span is not None:
+            # Hidden curves are not kept up to date by _update_lod; fill them for the drawn range
+            r0, r1, level = self._lod_span
+            self._curves_acc['m'].setData(*self._lod_points(self._pyramids_acc['m'], r0, r1, level))
+            self._curves_gyro['m'].setData(*self._lod_points(self._pyramids_gyro['m'], r0, r1, level))
+        self._set_magnitude_visible(visible)
 
     def _on_cursor_dragged(self, line):
         """Sync cursors and emit signal."""
@@ -353,36 +433,49 @@ class GraphWidget(QWidget):
         """Return current cursor position (t_ms)"""
         return self._cursor_acc.value()
             
-    def _find_next_peak(self):
-        """Find next time point where Acc Mag > Threshold"""
-        if self._t is None or self._acc is None:
+    def _detect_peaks(self):
+        """(Re)build the peak index for the current data and threshold without blocking the UI."""
+        if self._t is None or len(self._t) < 2:
             return
+        self._peak_generation += 1
+        generation = self._peak_generation
+        t, mag, threshold = self._t, self._acc['m'], self._spin_thresh.value()
+        dt = float(self._t[1] - self._t[0])
+        signals = self._peak_signals
+        
+        def run():
+            peaks = PeakIndex.build(t, mag, threshold, dt)
+            try:
+                signals.ready.emit(generation, peaks)
+            except RuntimeError:
+                pass # widget closed meanwhile
             
-        threshold = self._spin_thresh.value()
-        current_t = self._cursor_acc.value()
-        
-        # BUFFER: Search starting 0.5s (500ms) after current cursor
-        # to avoid finding the same peak we are currently standing on.
-        start_search_t = current_t + 500
+        threading.Thread(target=run, name="peak-detection", daemon=True).start()
         
-        # Helper: Find index of start_search_t
-        import numpy as np
+    def _on_peaks_ready(self, generation, peaks):
+        if generation != self._peak_generation:
+            return # a newer detection (threshold / data changed) is running
+        self._peaks = peaks
+        self._peak_overlay.setData(peaks.t_ms, peaks.values)
+        print(f"Peak index: {len(peaks)} peaks above {peaks.threshold:g}g")
         
-        # Filter indices where t > start_search_t AND mag > threshold
-        mask = (self._t > start_search_t) & (self._acc['m'] > threshold)
+    def _find_next_peak(self):
+        """Jump to the next swing peak after the cursor."""
+        if self._peaks is not None:
+            self._jump_to_peak(self._peaks.next_after(self._cursor_acc.value()))
         
-        # Get indices usually returns a tuple of arrays
-        indices = np.where(mask)[0]
+    def _find_prev_peak(self):
+        """Jump to the previous swing peak before the cursor."""
+        if self._peaks is not None:
+            self._jump_to_peak(self._peaks.prev_before(self._cursor_acc.value()))
         
-        if indices.size > 0:
-            next_idx = indices[0]
-            next_t = self._t[next_idx]
-            
-            # Move cursor
-            self.set_cursor_position(next_t)
-            self.cursor_changed.emit(next_t)
-            print(f"Jumped to Peak at {next_t:.0f}ms (Mag={self._acc['m'][next_idx]:.2f}g)")
-        else:
+    def _jump_to_peak(self, i):
+        if i is None:
             print("No more peaks found.")
-
-
+            return
+        t = float(self._peaks.t_ms[i])
+        
+        # Move cursor
+        self.set_cursor_position(t)
+        self.cursor_changed.emit(t)
+        print(f"Jumped to Peak at {t:.0f}ms (Mag={self._peaks.values[i]:.2f}g)")
@@ -20,7 +20,7 @@ class LabelWidget(QWidget):
         layout = QHBoxLayout(self)
         
         # Instructions
-        lbl_hint = QLabel("Hotkeys: (1)Smash (2)Drive (3)Toss (4)Drop (5)Other (Z)Undo")
+        lbl_hint = QLabel("Hotkeys: (1)Smash (2)Drive (3)Toss (4)Drop (5)Other (Z)Undo | Pre-label: (Enter)Accept (X)Reject")
         lbl_hint.setStyleSheet("color: gray;")
         layout.addWidget(lbl_hint)
         layout.addStretch()
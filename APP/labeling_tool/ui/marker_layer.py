@@ -0,0 +1,178 @@
+import numpy as np
+import pyqtgraph as pg
+from PySide6.QtCore import Qt, QRectF, QLineF
+from PySide6.QtGui import QPen, QColor
+from core.constants import LabelType
+
+
+class MarkerSet:
+    """
+    All label markers of a session as sorted numpy arrays (time, label type, window).
+    Range queries, nearest-marker lookups and undo are binary searches on the sorted times;
+    an insertion-order stack remembers which marker was added last.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.t_ms = np.zeros(0, dtype=np.float64)   # sorted
+        self.types = np.zeros(0, dtype=np.int8)
+        self.pre_ms = np.zeros(0, dtype=np.float32)
+        self.post_ms = np.zeros(0, dtype=np.float32)
+        self._seq = np.zeros(0, dtype=np.int64)     # insertion number of each marker
+        self._stack = []                            # (t_ms, seq) in insertion order
+        self._next_seq = 0
+        self.max_pre_ms = 0.0
+        self.max_post_ms = 0.0
+
+    def __len__(self):
+        return len(self.t_ms)
+
+    def add(self, t_ms, label_type, pre_ms=0.0, post_ms=0.0):
+        self.extend([t_ms], [label_type], pre_ms, post_ms)
+
+    def extend(self, t_ms, label_types, pre_ms=0.0, post_ms=0.0):
+        """Add many markers at once (e.g. a loaded label file): one sort instead of n inserts."""
+        t_ms = np.asarray(t_ms, dtype=np.float64)
+        n = len(t_ms)
+        if n == 0:
+            return
+        seq = np.arange(self._next_seq, self._next_seq + n)
+        self._next_seq += n
+        self._stack.extend(zip(t_ms.tolist(), seq.tolist()))
+
+        t_all = np.concatenate([self.t_ms, t_ms])
+        order = np.argsort(t_all, kind='stable')
+        self.t_ms = t_all[order]
+        self.types = np.concatenate([self.types, np.asarray(label_types, dtype=np.int8)])[order]
+        self.pre_ms = np.concatenate([self.pre_ms, np.full(n, pre_ms, dtype=np.float32)])[order]
+        self.post_ms = np.concatenate([self.post_ms, np.full(n, post_ms, dtype=np.float32)])[order]
+        self._seq = np.concatenate([self._seq, seq])[order]
+        self.max_pre_ms = max(self.max_pre_ms, float(pre_ms))
+        self.max_post_ms = max(self.max_post_ms, float(post_ms))
+
+    def _index_of(self, t_ms, seq):
+        """Array position of marker (t_ms, seq): binary search, then the few markers at the same time."""
+        i = int(np.searchsorted(self.t_ms, t_ms, side='left'))
+        j = int(np.searchsorted(self.t_ms, t_ms, side='right'))
+        hits = np.flatnonzero(self._seq[i:j] == seq)
+        return i + int(hits[0]) if hits.size else None
+
+    def pop_last(self):
+        """Remove the most recently added marker. Returns (t_ms, label_type) or None."""
+        while self._stack:
+            t_ms, seq = self._stack.pop()
+            i = self._index_of(t_ms, seq)
+            if i is None:
+                continue
+            label_type = int(self.types[i])
+            self.remove(i)
+            return t_ms, label_type
+        return None
+
+    def remove(self, i):
+        """Remove the marker at array position i (e.g. from nearest())."""
+        self.t_ms = np.delete(self.t_ms, i)
+        self.types = np.delete(self.types, i)
+        self.pre_ms = np.delete(self.pre_ms, i)
+        self.post_ms = np.delete(self.post_ms, i)
+        self._seq = np.delete(self._seq, i)
+
+    def visible(self, x0, x1):
+        """Index range [i0, i1) of markers whose line or window can intersect [x0, x1]."""
+        i0 = int(np.searchsorted(self.t_ms, x0 - self.max_post_ms, side='left'))
+        i1 = int(np.searchsorted(self.t_ms, x1 + self.max_pre_ms, side='right'))
+        return i0, i1
+
+    def nearest(self, t_ms, max_dist_ms=None):
+        """Index of the marker closest to t_ms (hit-testing), or None."""
+        if len(self.t_ms) == 0:
+            return None
+        i = int(np.searchsorted(self.t_ms, t_ms))
+        candidates = [k for k in (i - 1, i) if 0 <= k < len(self.t_ms)]
+        best = min(candidates, key=lambda k: abs(self.t_ms[k] - t_ms))
+        if max_dist_ms is not None and abs(self.t_ms[best] - t_ms) > max_dist_ms:
+            return None
+        return best
+
+
+class MarkerLayer(pg.GraphicsObject):
+    """
+    Draws every marker of a MarkerSet (label windows + coloured center lines) as one
+    graphics item. Only the markers inside the visible x range are painted, found by
+    binary search, so thousands of labels cost one scene item per plot.
+    """
+
+    REGION_COLOR = QColor(150, 150, 150, 40)
+    LINE_WIDTH = 3
+
+    def __init__(self, markers: MarkerSet, dashed=False):
+        super().__init__()
+        self._markers = markers
+        self._dashed = dashed # e.g. classifier pre-labels waiting for review
+        self._pens = {}
+        self.setZValue(5) # above the curves, below the cursor
+
+    def _pen(self, label_type):
+        if label_type not in self._pens:
+            pen = QPen(QColor(LabelType.get_color(label_type)))
+            pen.setWidth(2 if self._dashed else self.LINE_WIDTH)
+            pen.setCosmetic(True)
+            if self._dashed:
+                pen.setStyle(Qt.DashLine)
+            self._pens[label_type] = pen
+        return self._pens[label_type]
+
+    def refresh(self):
+        """Markers changed: repaint."""
+        self.update()
+
+    # The layer always covers the visible area, but never takes part in auto-range
+    def dataBounds(self, axis, frac=1.0, orthoRange=None):
+        return None
+
+    def boundingRect(self):
+        rect = self.viewRect()
+        return QRectF() if rect is None else rect
+
+    def viewTransformChanged(self):
+        super().viewTransformChanged()
+        self.prepareGeometryChange()
+
+    def paint(self, p, *args):
+        rect = self.viewRect()
+        m = self._markers
+        if rect is None or len(m) == 0:
+            return
+        i0, i1 = m.visible(rect.left(), rect.right())
+        if i1 <= i0:
+            return
+        top, bottom = rect.top(), rect.bottom()
+        t = m.t_ms[i0:i1]
+        types = m.types[i0:i1]
+
+        # Zoomed out, many markers fall on the same pixel column: draw each (pixel, colour) once
+        px_ms = self.pixelWidth() or 1.0
+        px = np.floor((t - rect.left()) / px_ms).astype(np.int64)
+
+        # 1. Windows (behind the lines)
+        pre = m.pre_ms[i0:i1]
+        post = m.post_ms[i0:i1]
+        has_window = (pre > 0) | (post > 0)
+        if has_window.any():
+            x0 = (t - pre)[has_window]
+            x1 = (t + post)[has_window]
+            spans = np.floor((np.stack([x0, x1], axis=1) - rect.left()) / px_ms).astype(np.int64)
+            _, keep = np.unique(spans, axis=0, return_index=True)
+            p.setPen(pg.mkPen(None))
+            p.setBrush(self.REGION_COLOR)
+            p.drawRects([QRectF(a, top, b - a, bottom - top)
+                         for a, b in zip(x0[keep].tolist(), x1[keep].tolist())])
+
+        # 2. Center lines, one drawLines call per label colour
+        for label_type in np.unique(types).tolist():
+            sel = types == label_type
+            _, keep = np.unique(px[sel], return_index=True)
+            p.setPen(self._pen(label_type))
+            p.drawLines([QLineF(x, top, x, bottom) for x in t[sel][keep].tolist()])
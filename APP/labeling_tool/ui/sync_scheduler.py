@@ -0,0 +1,144 @@
+import time
+from PySide6.QtCore import QObject, QTimer, Signal
+from PySide6.QtGui import QGuiApplication
+
+
+class SyncScheduler(QObject):
+    """
+    Paces cursor synchronization between the video and the graph to the display refresh.
+
+    Video -> Graph: position reports of the player are only stored; once per frame the
+    cursor is moved to the position interpolated from the last report (report + elapsed
+    wall time * playback rate), so it moves smoothly even though QMediaPlayer reports
+    irregularly, and never more often than the screen can show.
+    Graph -> Video: dragging the cursor stores a seek request; only the newest request
+    of a frame is sent to the player.
+
+    Instrumentation (stats()):
+        reports / seeks    updates received from the video / the graph
+        merged             updates replaced by a newer one before they were applied
+        frames             frames in which the cursor or the video was updated
+        interpolated       frames drawn from an interpolated (not reported) position
+        dropped            frames missed because the event loop was busy (late timer)
+    """
+
+    cursor_due = Signal(float)  # video ms at which to draw the graph cursor
+    seek_due = Signal(float)    # video ms to seek the player to
+
+    # Reports further than this from the interpolated position are jumps (seek, stall): snap to them
+    SNAP_MS = 250
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._timer = QTimer(self)
+        self._timer.setInterval(round(self.frame_ms()))
+        self._timer.timeout.connect(self._on_frame)
+
+        self._playing = False
+        self._rate = 1.0
+        self._report = None       # (video ms, perf_counter s) of the newest unapplied report
+        self._anchor = None       # (video ms, perf_counter s) interpolation is based on
+        self._shown_ms = None     # last position emitted with cursor_due
+        self._seek_ms = None      # pending seek request
+        self._last_frame = None
+        self.reset_stats()
+
+    @staticmethod
+    def frame_ms():
+        screen = QGuiApplication.primaryScreen()
+        rate = screen.refreshRate() if screen is not None else 0
+        return 1000.0 / (rate if rate > 0 else 60.0)
+
+    def reset_stats(self):
+        self._stats = dict(reports=0, seeks=0, merged=0, frames=0, interpolated=0, dropped=0)
+
+    def stats(self):
+        return dict(self._stats)
+
+    # --- Inputs ---
+    def report_video(self, t_vid_ms):
+        """Position report of the player (QMediaPlayer.positionChanged)."""
+        self._stats["reports"] += 1
+        if self._report is not None:
+            self._stats["merged"] += 1
+        self._report = (float(t_vid_ms), time.perf_counter())
+        self._wake()
+
+    def request_seek(self, t_vid_ms):
+        """Cursor dragged on the graph: seek the video (at most once per frame)."""
+        self._stats["seeks"] += 1
+        if self._seek_ms is not None:
+            self._stats["merged"] += 1
+        self._seek_ms = float(t_vid_ms)
+        # The seek target is also where playback interpolation must continue from
+        self._report = None
+        self._anchor = (self._seek_ms, time.perf_counter())
+        self._shown_ms = self._seek_ms
+        self._wake()
+
+    def set_playing(self, playing, rate=1.0):
+        self._playing = bool(playing)
+        self._rate = float(rate)
+        if self._anchor is not None:
+            # Restart interpolation from where the cursor is now
+            self._anchor = (self._shown_ms if self._shown_ms is not None else self._anchor[0],
+                            time.perf_counter())
+        self._wake()
+
+    def _wake(self):
+        if not self._timer.isActive():
+            self._last_frame = time.perf_counter()
+            self._timer.start()
+
+    # --- Frame tick ---
+    def _on_frame(self):
+        now = time.perf_counter()
+        frame_s = self._timer.interval() / 1000.0
+        if self._last_frame is not None and frame_s > 0:
+            late = (now - self._last_frame) / frame_s - 1.0
+            if late >= 1.0:
+                self._stats["dropped"] += int(late)
+        self._last_frame = now
+
+        updated = False
+        if self._seek_ms is not None:
+            self.seek_due.emit(self._seek_ms)
+            self._seek_ms = None
+            updated = True
+
+        position = self._position(now)
+        if position is not None and position != self._shown_ms:
+            self._shown_ms = position
+            self.cursor_due.emit(position)
+            updated = True
+
+        if updated:
+            self._stats["frames"] += 1
+        elif not self._playing:
+            self._timer.stop() # idle: nothing to draw until the next report or seek
+
+    def _position(self, now):
+        """Video ms to show at `now`, or None if nothing is known yet."""
+        if self._report is not None:
+            t_rep, t_wall = self._report
+            self._report = None
+            predicted = self._predict(now)
+            self._anchor = (t_rep, t_wall)
+            if not self._playing:
+                return t_rep
+            current = self._predict(now)
+            if predicted is None or self._shown_ms is None or abs(current - predicted) > self.SNAP_MS:
+                return current # seek / stall: jump to the report
+            # Small correction: follow the report, but never move the cursor backwards
+            return max(current, self._shown_ms)
+
+        if not self._playing or self._anchor is None:
+            return None
+        self._stats["interpolated"] += 1
+        return self._predict(now)
+
+    def _predict(self, now):
+        if self._anchor is None:
+            return None
+        t_ms, t_wall = self._anchor
+        return t_ms + (now - t_wall) * 1000.0 * self._rate
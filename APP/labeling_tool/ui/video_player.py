@@ -15,6 +15,8 @@ class VideoPlayer(QWidget):
     
     # Signal emitted when video position changes (ms)
     position_changed = Signal(int)
+    # Signal emitted when playback starts/stops or the speed changes (playing, rate)
+    playback_changed = Signal(bool, float)
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -70,6 +72,8 @@ class VideoPlayer(QWidget):
         self._player.positionChanged.connect(self._on_position_changed)
         self._player.durationChanged.connect(self._on_duration_changed)
         self._player.mediaStatusChanged.connect(self._on_media_status_changed)
+        self._player.playbackStateChanged.connect(self._emit_playback_changed)
+        self._player.playbackRateChanged.connect(self._emit_playback_changed)
         
         self._is_seeking = False
         
@@ -79,6 +83,10 @@ class VideoPlayer(QWidget):
         # Reset speed
         self._combo_speed.setCurrentIndex(2)
         
+    def video_path(self):
+        """Local file path of the loaded video, or '' if none."""
+        return self._player.source().toLocalFile()
+        
     def _toggle_play(self):
         if self._player.playbackState() == QMediaPlayer.PlayingState:
             self._player.pause()
@@ -92,6 +100,9 @@ class VideoPlayer(QWidget):
         speed = float(text.replace("x", ""))
         self._player.setPlaybackRate(speed)
         
+    def _emit_playback_changed(self, *args):
+        self.playback_changed.emit(self.is_playing(), self._player.playbackRate())
+        
     def _on_position_changed(self, position):
         if not self._is_seeking:
             self._slider.setValue(position)
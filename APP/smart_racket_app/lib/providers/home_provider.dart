@@ -602,6 +602,13 @@ class HomeProvider extends ChangeNotifier {
             return;
           }
 
+          // busy：伺服器暖機/滿載/重啟中（會附 retry_after 秒數），只顯示訊息，不計入球路統計
+          if (t == 'busy') {
+            _setLastResult(message: obj['message']?.toString());
+            _markDirty();
+            return;
+          }
+
           // 欄位相容：允許不同後端回傳 key 命名
           type = (obj['shot'] ??
               obj['type_shot'] ??
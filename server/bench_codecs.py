@@ -0,0 +1,109 @@
+"""
+Serialization cost of the /ws/predict codecs (wire_codecs.py), measured without a server.
+
+For every codec: bytes on the wire and microseconds per message for
+  decode  - server parsing one 40-frame window request into (client_id, ts, (N, 6) array)
+  encode  - server serializing one result
+"legacy" is the previous path: json.loads + IMUFrame objects + frames_to_array + json.dumps.
+
+Usage:
+    python bench_codecs.py
+    python bench_codecs.py --dataset 20260101_171025.csv --repeat 2000
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("SWING_ARCHIVE_DIR", "")  # offline tool: do not create an archive on import
+
+from wire_codecs import CODECS, BinaryCodec, orjson, msgpack
+
+SAMPLE_RESPONSE = {
+    "timestamp": 1767258625.48, "type": "Smash", "confidence": 0.97,
+    "speed": 182.4, "display": True, "message": "Smash! 182.4 km/h",
+}
+
+
+def sample_windows(dataset=None, n=64, seed=0):
+    if dataset:
+        from dataset_cache import load_windows_cached as load_windows
+        return load_windows(dataset)[:n]
+    from swing_datasets import SwingWindow, FRAME_DT_S
+    rng = np.random.default_rng(seed)
+    scale = np.array([2, 2, 3, 300, 500, 330], dtype=np.float32)
+    return [SwingWindow(data=rng.normal(size=(40, 6)).astype(np.float32) * scale,
+                        end_s=1767258600.0 + i * 40 * FRAME_DT_S) for i in range(n)]
+
+
+def encode_requests(codec_name, windows):
+    """Client side: what each codec puts on the wire for these windows."""
+    messages = []
+    for w in windows:
+        if codec_name == "binary":
+            frames = w.to_frames()
+            messages.append(BinaryCodec.encode_request("bench", [f["ts"] for f in frames], w.data))
+            continue
+        payload = {"type": "window", "client_id": "bench", "data": w.to_frames()}
+        messages.append(msgpack.packb(payload) if codec_name == "msgpack" else json.dumps(payload))
+    return messages
+
+
+def _time_per_call(fn, items, repeat):
+    t0 = time.perf_counter()
+    for i in range(repeat):
+        fn(items[i % len(items)])
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def legacy_decode(message):
+    from main import IMUFrame, frames_to_array
+    payload = json.loads(message)
+    frames = [IMUFrame(ts=f["ts"], acc=f["acc"], gyro=f["gyro"]) for f in payload["data"]]
+    return frames_to_array(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /ws/predict wire codecs")
+    parser.add_argument("--dataset", help="session file to take windows from (default: random windows)")
+    parser.add_argument("--repeat", type=int, default=5000)
+    parser.add_argument("--legacy", action="store_true",
+                        help="also time the old IMUFrame path (imports main.py, loads the models)")
+    args = parser.parse_args()
+
+    windows = sample_windows(args.dataset)
+    print(f"{len(windows)} windows, {args.repeat} calls each | orjson: {'yes' if orjson else 'no'}, "
+          f"msgpack: {'yes' if msgpack else 'no'}\n")
+    print(f"{'codec':<10}{'request B':>11}{'response B':>12}{'decode us':>11}{'encode us':>11}")
+
+    rows = []
+    for name, codec in CODECS.items():
+        requests = encode_requests(name, windows)
+        response = codec.encode(SAMPLE_RESPONSE)
+        rows.append((
+            name,
+            np.mean([len(m) for m in requests]),
+            len(response),
+            _time_per_call(codec.decode, requests, args.repeat),
+            _time_per_call(codec.encode, [SAMPLE_RESPONSE], args.repeat),
+        ))
+
+    if args.legacy:
+        import main  # noqa: F401  (load models before timing)
+        requests = encode_requests("json", windows)
+        rows.append((
+            "legacy",
+            np.mean([len(m) for m in requests]),
+            len(json.dumps(SAMPLE_RESPONSE)),
+            _time_per_call(legacy_decode, requests, args.repeat),
+            _time_per_call(json.dumps, [SAMPLE_RESPONSE], args.repeat),
+        ))
+
+    for name, req_b, resp_b, dec_us, enc_us in rows:
+        print(f"{name:<10}{req_b:>11.0f}{resp_b:>12d}{dec_us:>11.1f}{enc_us:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
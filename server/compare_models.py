@@ -0,0 +1,286 @@
+"""
+Compare every model artifact against every labeled dataset in one table.
+
+Each model is evaluated in its own worker process (ProcessPoolExecutor, one task per model and
+a fresh process per task), so TensorFlow graphs, thread pools and memory of different models
+never share a process. Per model x dataset combination the table shows:
+
+    classifier  accuracy at the server threshold, single-window latency, batched throughput
+    speed       mean / max predicted km/h on the Smash windows (with the model's calibration), latency, throughput
+    both        load time and resident memory added by the model
+
+Results are cached in .swing_cache/compare_results.json, keyed on the sha256 of the model file,
+its speed calibration artifact (if any), its class order and preprocessing, the dataset, the
+evaluation options and RESULTS_VERSION; cached combinations are not re-run.
+
+Usage:
+    python compare_models.py                                        # all *.h5 / *.keras here x 20260101_171025.csv
+    python compare_models.py badminton_model_v3.h5 badminton_model_v4.h5 --datasets labels/*.jsonl
+    python compare_models.py --force --json compare.json
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import dataset_cache
+from evaluate_model import DEFAULT_DATASET, decide, pad_windows
+from speed_calibration import calibration_path
+
+# Classifier artifacts that were trained on raw (un-normalized) windows
+RAW_INPUT_MODELS = {"badminton_model_v3.h5"}
+
+RESULTS_FILE = "compare_results.json"
+# Part of every cached result's key: bump it whenever scoring or the result fields change
+RESULTS_VERSION = 2
+
+
+def _rss_mb() -> float:
+    """Current resident set size of this process (Linux /proc, falls back to peak RSS)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker_init(threads):
+    os.environ.setdefault("SWING_ARCHIVE_DIR", "")
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    import tensorflow as tf
+    # Workers run side by side: split the cores instead of every TF runtime grabbing all of them
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def _preprocess_kind(model_path):
+    if model_path.endswith(".lean.keras"):
+        return "in_graph"
+    if os.path.basename(model_path) in RAW_INPUT_MODELS:
+        return "raw"
+    return "zscore"
+
+
+def _batched(model, x, batch_size):
+    return np.concatenate([np.asarray(model.predict_on_batch(x[i:i + batch_size]))
+                           for i in range(0, len(x), batch_size)])
+
+
+def measure_latency(model, x, batch_size, runs):
+    """p50 / p95 of single-window calls and windows/s of batched inference."""
+    one = x[:1]
+    for _ in range(3):
+        model.predict_on_batch(one)
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        model.predict_on_batch(one)
+        samples.append((time.perf_counter() - t0) * 1000)
+
+    _batched(model, x, batch_size)  # trace the batch shapes once
+    t0 = time.perf_counter()
+    _batched(model, x, batch_size)
+    wall = time.perf_counter() - t0
+    return {
+        "latency_p50_ms": float(np.percentile(samples, 50)),
+        "latency_p95_ms": float(np.percentile(samples, 95)),
+        "throughput_wps": len(x) / wall if wall > 0 else 0.0,
+    }
+
+
+def run_model(model_path, datasets, threshold, batch_size, latency_runs):
+    """
+    Worker: load one model, evaluate it on every dataset.
+    Returns {dataset: result dict}.
+    """
+    import keras
+    from models import SwingClassifier, SpeedRegressor, model_classes
+    from regression_helpers import sum_over_time, physics_transform
+    from speed_calibration import load_calibration
+
+    rss_before = _rss_mb()
+    t0 = time.perf_counter()
+    model = keras.models.load_model(model_path, compile=False, custom_objects={
+        "sum_over_time": sum_over_time, "physics_transform": physics_transform,
+    })
+    load_ms = (time.perf_counter() - t0) * 1000
+    kind = "speed" if model.output_shape[-1] == 1 else "classifier"
+    preprocess = _preprocess_kind(model_path) if kind == "classifier" else "raw"
+    input_shape = tuple(model.input_shape[1:])
+    classes = model_classes(model_path)
+
+    results = {}
+    for path in datasets:
+        ds = dataset_cache.load(path)
+        if kind == "classifier":
+            known = np.isin(ds.labels, classes)
+        else:
+            known = ds.labels == "Smash"
+            if not known.any():
+                known = np.ones(len(ds), dtype=bool)
+
+        pad_value = SwingClassifier.mean if preprocess == "in_graph" else 0.0
+        x = pad_windows(ds.windows[known], ds.lengths[known], pad_value=pad_value)
+        if preprocess == "zscore":
+            x = (x - SwingClassifier.mean.astype(np.float32)) / SwingClassifier.std.astype(np.float32)
+        x = x.reshape(-1, *input_shape)
+
+        result = {"kind": kind, "preprocess": preprocess, "windows": int(len(x)), "load_ms": load_ms}
+        if len(x):
+            out = _batched(model, x, batch_size)
+            if kind == "classifier":
+                y_true = np.array([classes.index(name) for name in ds.labels[known]])
+                y_pred = decide(out, threshold)
+                result["accuracy"] = float(np.mean(y_pred == y_true))
+            else:
+                speed = load_calibration(model_path, default_scale=SpeedRegressor.scale).apply(out[:, 0])
+                result["speed_mean"] = float(speed.mean())
+                result["speed_max"] = float(speed.max())
+            result.update(measure_latency(model, x, batch_size, latency_runs))
+        result["model_mb"] = _rss_mb() - rss_before
+        results[path] = result
+    return results
+
+
+def find_models(folder="."):
+    paths = sorted(glob.glob(os.path.join(folder, "*.h5")) + glob.glob(os.path.join(folder, "*.keras")))
+    return [os.path.relpath(p) for p in paths]
+
+
+def _results_path():
+    root = os.environ.get("SWING_CACHE_DIR") or dataset_cache.CACHE_DIR_NAME
+    os.makedirs(root, exist_ok=True)
+    return os.path.join(root, RESULTS_FILE)
+
+
+def _load_results():
+    try:
+        with open(_results_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _calibration_sha(model_path):
+    """sha256 of the model's speed calibration artifact, "none" without one (load_calibration's default)."""
+    path = calibration_path(model_path)
+    return dataset_cache.file_sha256(path) if os.path.exists(path) else "none"
+
+
+def _model_key(model_path):
+    """Everything about a model file that its results depend on (see _cache_key)."""
+    from models import model_classes
+    return "|".join([
+        dataset_cache.file_sha256(model_path)[:16],
+        f"c={_calibration_sha(model_path)[:16]}",
+        f"classes={','.join(model_classes(model_path))}",
+        f"p={_preprocess_kind(model_path)}",
+    ])
+
+
+def _cache_key(model_key, dataset_sha, threshold, batch_size, latency_runs):
+    return f"v{RESULTS_VERSION}|{model_key}|{dataset_sha[:16]}|t={threshold}|b={batch_size}|r={latency_runs}"
+
+
+def print_table(rows):
+    header = (f"{'model':<32}{'dataset':<24}{'kind':<11}{'n':>5}{'acc / km/h':>12}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'win/s':>9}{'load ms':>9}{'MB':>7}")
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        if r["kind"] == "classifier":
+            score = f"{r['accuracy']:.2%}" if "accuracy" in r else "-"
+        else:
+            score = f"{r['speed_mean']:.1f}" if "speed_mean" in r else "-"
+        print(f"{r['model'][:31]:<32}{os.path.basename(r['dataset'])[:23]:<24}{r['kind']:<11}{r['windows']:>5}"
+              f"{score:>12}{r.get('latency_p50_ms', 0):>9.2f}{r.get('latency_p95_ms', 0):>9.2f}"
+              f"{r.get('throughput_wps', 0):>9.0f}{r['load_ms']:>9.0f}{r['model_mb']:>7.1f}"
+              f"{'  (cached)' if r.get('cached') else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model x dataset comparison matrix")
+    parser.add_argument("models", nargs="*", help="model files (default: every *.h5 / *.keras in this folder)")
+    parser.add_argument("--datasets", nargs="+", default=[DEFAULT_DATASET], help="label CSV / JSONL files")
+    parser.add_argument("--threshold", type=float, default=0.5, help="classifier confidence threshold")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--latency-runs", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (default: min(models, cores))")
+    parser.add_argument("--force", action="store_true", help="ignore cached results")
+    parser.add_argument("--json", help="write the table to this file")
+    args = parser.parse_args()
+
+    models = args.models or find_models()
+    if not models:
+        print("No model files found.")
+        return 1
+
+    # Bundles are built here once, so workers never race to write the same cache
+    dataset_sha = {}
+    for path in args.datasets:
+        dataset_cache.load(path)
+        dataset_sha[path] = dataset_cache._read_meta(dataset_cache.cache_dir_for(path))["sha256"]
+    # Speed results depend on the calibration artifact too (speed_calibration.py --write),
+    # classifier accuracy on the class order
+    model_key = {m: _model_key(m) for m in models}
+
+    cache = _load_results()
+    todo = {}
+    for m in models:
+        missing = [d for d in args.datasets if args.force
+                   or _cache_key(model_key[m], dataset_sha[d], args.threshold, args.batch_size, args.latency_runs) not in cache]
+        if missing:
+            todo[m] = missing
+
+    workers = args.workers or min(len(todo), os.cpu_count() or 1) or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"{len(models)} models x {len(args.datasets)} datasets, {len(todo)} models to run "
+          f"on {workers} workers ({threads} threads each)\n")
+
+    failed = []
+    if todo:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_worker_init,
+                                 initargs=(threads,), max_tasks_per_child=1) as pool:
+            futures = {
+                pool.submit(run_model, m, ds, args.threshold, args.batch_size, args.latency_runs): m
+                for m, ds in todo.items()
+            }
+            for future in as_completed(futures):
+                m = futures[future]
+                try:
+                    for d, result in future.result().items():
+                        cache[_cache_key(model_key[m], dataset_sha[d], args.threshold, args.batch_size, args.latency_runs)] = result
+                except Exception as e:
+                    failed.append(m)
+                    print(f"{m}: failed ({e})")
+
+        tmp = _results_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp, _results_path())
+
+    rows = []
+    for m in models:
+        for d in args.datasets:
+            result = cache.get(_cache_key(model_key[m], dataset_sha[d], args.threshold, args.batch_size, args.latency_runs))
+            if result is None:
+                continue
+            rows.append({"model": m, "dataset": d, "cached": m not in todo or d not in todo[m], **result})
+    print_table(rows)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
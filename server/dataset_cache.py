@@ -0,0 +1,268 @@
+"""
+Binary cache for labeled swing datasets (exported label CSV and labeling-tool JSONL).
+
+Parsing the stringified 40x6 `data` cells is by far the slowest part of every evaluation run,
+so each source file is converted once into a bundle of .npy files next to it:
+
+    .swing_cache/20260101_171025.csv/
+      windows.npy       (N, 40, 6) float32, raw [aX, aY, aZ, gX, gY, gZ] (short windows zero padded,
+                        long ones center cropped)
+      lengths.npy       (N,) int16 frames per window before padding
+      label_ids.npy     (N,) int16 label_id column (-1 if missing)
+      labels.npy        (N,) unicode label names
+      session_ids.npy   (N,) unicode session ids
+      timestamps.npy    (N,) unicode timestamp column / timestamp_csv_ms
+      sync_params.json  list of N dicts
+      meta.json         source size, mtime_ns and sha256, format version
+
+A bundle is reused when the source's size and mtime match; if only the mtime changed the
+sha256 decides (e.g. after a git checkout), so a touched but identical file is not re-parsed.
+The .npy files are opened with mmap_mode="r".
+
+Usage:
+    python dataset_cache.py build 20260101_171025.csv ../APP/labeling_tool/labels/*.jsonl
+    python dataset_cache.py info 20260101_171025.csv
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from swing_datasets import (
+    FRAME_DT_S, WINDOW_SIZE, SwingWindow, detect_format, load_jsonl, load_label_csv, load_windows,
+)
+
+CACHE_VERSION = 1
+CACHE_DIR_NAME = ".swing_cache"
+
+
+@dataclass
+class CachedDataset:
+    source: str
+    windows: np.ndarray       # (N, 40, 6) float32 memmap
+    lengths: np.ndarray       # (N,)
+    label_ids: np.ndarray     # (N,)
+    labels: np.ndarray        # (N,) str
+    session_ids: np.ndarray   # (N,) str
+    timestamps: np.ndarray    # (N,) str
+    sync_params: List[dict]
+
+    def __len__(self):
+        return len(self.windows)
+
+    def to_windows(self) -> List[SwingWindow]:
+        """SwingWindow list laid back to back on the timeline, like swing_datasets.load_windows."""
+        out = []
+        t = 0.0
+        for i in range(len(self)):
+            n = int(self.lengths[i])
+            t += n * FRAME_DT_S
+            out.append(SwingWindow(
+                data=np.asarray(self.windows[i, :n]),
+                label=str(self.labels[i]) or None,
+                session_id=str(self.session_ids[i]),
+                end_s=t,
+                meta={
+                    "label_id": int(self.label_ids[i]),
+                    "timestamp": str(self.timestamps[i]),
+                    "sync_params": self.sync_params[i],
+                },
+            ))
+        return out
+
+
+def cache_dir_for(path: str) -> str:
+    """Bundle directory of one source file (SWING_CACHE_DIR overrides the .swing_cache/ next to it)."""
+    root = os.environ.get("SWING_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    return os.path.join(root, os.path.basename(path))
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_key(path: str) -> dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _read_meta(bundle: str):
+    try:
+        with open(os.path.join(bundle, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(path: str) -> bool:
+    """True if the bundle matches the source (size + mtime, falling back to sha256)."""
+    bundle = cache_dir_for(path)
+    meta = _read_meta(bundle)
+    if meta is None or meta.get("version") != CACHE_VERSION:
+        return False
+
+    key = _source_key(path)
+    if meta["size"] != key["size"]:
+        return False
+    if meta["mtime_ns"] == key["mtime_ns"]:
+        return True
+    if meta["sha256"] != file_sha256(path):
+        return False
+
+    # Same content, new mtime: remember it so the next check is cheap again
+    meta["mtime_ns"] = key["mtime_ns"]
+    _write_json(os.path.join(bundle, "meta.json"), meta)
+    return True
+
+
+def _write_json(path, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def build(path: str) -> str:
+    """Parse a label CSV / JSONL once and write its bundle. Returns the bundle directory."""
+    fmt = detect_format(path)
+    if fmt == "jsonl":
+        windows = load_jsonl(path)
+    elif fmt == "label_csv":
+        windows = load_label_csv(path)
+    else:
+        raise ValueError(f"Only labeled datasets are cached (got {fmt}): {path}")
+
+    key = _source_key(path)
+    n = len(windows)
+    data = np.zeros((n, WINDOW_SIZE, 6), dtype=np.float32)
+    lengths = np.zeros(n, dtype=np.int16)
+    for i, w in enumerate(windows):
+        # Same rule as main.fit_window: longer windows keep their middle 40 frames
+        start = max((len(w.data) - WINDOW_SIZE) // 2, 0)
+        m = min(len(w.data), WINDOW_SIZE)
+        data[i, :m] = w.data[start:start + m]
+        lengths[i] = m
+
+    def label_id(w):
+        try:
+            return int(w.meta.get("label_id"))
+        except (TypeError, ValueError):
+            return -1
+
+    arrays = {
+        "windows": data,
+        "lengths": lengths,
+        "label_ids": np.array([label_id(w) for w in windows], dtype=np.int16),
+        "labels": np.array([w.label or "" for w in windows], dtype=str),
+        "session_ids": np.array([w.session_id for w in windows], dtype=str),
+        "timestamps": np.array(["" if w.meta.get("timestamp") is None else str(w.meta["timestamp"])
+                                for w in windows], dtype=str),
+    }
+
+    # Build next to the final location, then swap in, so readers never see half a bundle
+    bundle = cache_dir_for(path)
+    tmp = f"{bundle}.building-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp, name + ".npy"), arr)
+    _write_json(os.path.join(tmp, "sync_params.json"), [w.meta.get("sync_params") or {} for w in windows])
+    _write_json(os.path.join(tmp, "meta.json"), {
+        "version": CACHE_VERSION,
+        "source": os.path.abspath(path),
+        "format": fmt,
+        "rows": n,
+        "sha256": file_sha256(path),
+        **key,
+    })
+    # Move the old bundle aside (a rename, not a delete), swap the new one in, then delete
+    # the old one: the bundle path is missing only between two renames
+    old = f"{bundle}.old-{os.getpid()}"
+    shutil.rmtree(old, ignore_errors=True)
+    try:
+        os.replace(bundle, old)
+    except FileNotFoundError:
+        old = None
+    os.replace(tmp, bundle)
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+    return bundle
+
+
+def load(path: str, rebuild: bool = False) -> CachedDataset:
+    """Load a labeled dataset through the cache, (re)building the bundle when needed."""
+    if rebuild or not is_fresh(path):
+        build(path)
+    try:
+        return _open_bundle(path)
+    except FileNotFoundError:
+        # Another process was swapping in a rebuilt bundle at that moment
+        if not is_fresh(path):
+            build(path)
+        return _open_bundle(path)
+
+
+def _open_bundle(path: str) -> CachedDataset:
+    bundle = cache_dir_for(path)
+
+    def arr(name, mmap=True):
+        return np.load(os.path.join(bundle, name + ".npy"), mmap_mode="r" if mmap else None)
+
+    with open(os.path.join(bundle, "sync_params.json"), "r", encoding="utf-8") as f:
+        sync_params = json.load(f)
+    return CachedDataset(
+        source=path,
+        windows=arr("windows"),
+        lengths=arr("lengths"),
+        label_ids=arr("label_ids"),
+        labels=arr("labels", mmap=False),
+        session_ids=arr("session_ids", mmap=False),
+        timestamps=arr("timestamps", mmap=False),
+        sync_params=sync_params,
+    )
+
+
+def load_windows_cached(path: str) -> List[SwingWindow]:
+    """Drop-in for swing_datasets.load_windows: labeled files go through the cache, raw recordings do not."""
+    if detect_format(path) == "android_csv":
+        return load_windows(path)
+    return load(path).to_windows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build / inspect the binary dataset cache")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="convert label CSV / JSONL files (skips fresh bundles)")
+    p_build.add_argument("sources", nargs="+")
+    p_build.add_argument("--force", action="store_true", help="rebuild even if the bundle is fresh")
+    p_info = sub.add_parser("info", help="show bundle status")
+    p_info.add_argument("sources", nargs="+")
+    args = parser.parse_args()
+
+    for path in args.sources:
+        if args.cmd == "build":
+            if not args.force and is_fresh(path):
+                print(f"{path}: fresh ({cache_dir_for(path)})")
+                continue
+            bundle = build(path)
+            print(f"{path}: built {_read_meta(bundle)['rows']} windows -> {bundle}")
+        else:
+            meta = _read_meta(cache_dir_for(path))
+            if meta is None:
+                print(f"{path}: no bundle")
+            else:
+                state = "fresh" if is_fresh(path) else "stale"
+                print(f"{path}: {state}, {meta['rows']} windows, sha256 {meta['sha256'][:12]}")
+
+
+if __name__ == "__main__":
+    main()
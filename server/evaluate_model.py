@@ -0,0 +1,224 @@
+"""
+Batched evaluation of the swing classifier on labeled sessions.
+
+The whole dataset is loaded once (from the dataset_cache.py bundle) into a single (N, 40, 6) array and run through the model in
+chunks (SwingClassifier.predict_batch), then scored with numpy:
+- confusion matrix (true class x predicted class, plus the "Other" column for low confidence)
+- per-class precision / recall / F1
+- confidence-threshold sweep (coverage vs. accuracy)
+
+Usage:
+    python evaluate_model.py                                       # 20260101_171025.csv, server model
+    python evaluate_model.py labels/*.jsonl --threshold 0.8 --json report.json
+    python evaluate_model.py --model badminton_model_v3.h5 --no-normalize
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault("SWING_ARCHIVE_DIR", "")  # offline tool: do not create an archive on import
+
+import dataset_cache
+from swing_datasets import WINDOW_SIZE
+
+DEFAULT_DATASET = "20260101_171025.csv"
+SWEEP_THRESHOLDS = np.round(np.arange(0.30, 1.00, 0.05), 2)
+
+
+def pad_windows(x: np.ndarray, lengths: np.ndarray, pad_value=0.0) -> np.ndarray:
+    """(N, 40, 6) cached windows -> float32 copy with the frames past each window's length set to pad_value."""
+    x = np.array(x, dtype=np.float32)
+    short = np.flatnonzero(lengths < WINDOW_SIZE)
+    if short.size:
+        sub = x[short]
+        sub[np.arange(WINDOW_SIZE)[None, :] >= lengths[short, None]] = pad_value
+        x[short] = sub
+    return x
+
+
+def decide(probs: np.ndarray, threshold: float) -> np.ndarray:
+    """Predicted class index per window, -1 (Other) when the top probability is below threshold."""
+    pred = probs.argmax(axis=1)
+    pred[probs.max(axis=1) < threshold] = -1
+    return pred
+
+
+def confusion_matrix(y_true: np.ndarray, y_pred: np.ndarray, n_classes: int) -> np.ndarray:
+    """(n_classes, n_classes + 1) counts; the last column is Other."""
+    cols = np.where(y_pred < 0, n_classes, y_pred)
+    flat = np.bincount(y_true * (n_classes + 1) + cols, minlength=n_classes * (n_classes + 1))
+    return flat.reshape(n_classes, n_classes + 1)
+
+
+def per_class_metrics(cm: np.ndarray) -> dict:
+    n = cm.shape[0]
+    tp = np.diag(cm[:, :n]).astype(float)
+    predicted = cm[:, :n].sum(axis=0)
+    actual = cm.sum(axis=1)
+    precision = np.divide(tp, predicted, out=np.zeros(n), where=predicted > 0)
+    recall = np.divide(tp, actual, out=np.zeros(n), where=actual > 0)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros(n), where=denom > 0)
+    return {"precision": precision, "recall": recall, "f1": f1, "support": actual}
+
+
+def threshold_sweep(probs: np.ndarray, y_true: np.ndarray, thresholds=SWEEP_THRESHOLDS) -> dict:
+    """
+    For every threshold at once (T x N boolean masks):
+    coverage = share of windows shown to the player, accuracy = correct and shown / all,
+    precision = correct / shown.
+    """
+    conf = probs.max(axis=1)
+    correct = probs.argmax(axis=1) == y_true
+    accepted = conf[None, :] >= np.asarray(thresholds)[:, None]
+    shown = accepted.sum(axis=1)
+    hits = (accepted & correct[None, :]).sum(axis=1)
+    n = max(len(y_true), 1)
+    return {
+        "threshold": np.asarray(thresholds),
+        "coverage": shown / n,
+        "accuracy": hits / n,
+        "precision": np.divide(hits, shown, out=np.zeros(len(shown)), where=shown > 0),
+    }
+
+
+def load_labeled(sources, classes):
+    """
+    Windows, lengths and class indices of every labeled window whose label the model knows.
+    Read from the binary dataset cache (dataset_cache.py), so only the first run parses text.
+    """
+    class_idx = {name: i for i, name in enumerate(classes)}
+    xs, lengths, labels, skipped = [], [], [], {}
+    for path in sources:
+        ds = dataset_cache.load(path)
+        known = np.isin(ds.labels, classes)
+        for name, count in zip(*np.unique(ds.labels[~known], return_counts=True)):
+            skipped[str(name)] = skipped.get(str(name), 0) + int(count)
+        xs.append(ds.windows[known])
+        lengths.append(ds.lengths[known])
+        labels.append(np.array([class_idx[name] for name in ds.labels[known]], dtype=np.int64))
+    if not xs:
+        return np.zeros((0, WINDOW_SIZE, 6), np.float32), np.zeros(0, np.int16), np.zeros(0, np.int64), skipped
+    return np.concatenate(xs), np.concatenate(lengths), np.concatenate(labels), skipped
+
+
+def evaluate(classifier, windows, lengths, y_true, threshold, batch_size=256, normalize=True):
+    timings = {}
+    t0 = time.perf_counter()
+    x = pad_windows(windows, lengths, pad_value=classifier.mean if normalize else 0.0)
+    timings["stack_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    probs = classifier.predict_batch(x, batch_size=batch_size, normalize=normalize)
+    timings["inference_s"] = time.perf_counter() - t0
+
+    y_pred = decide(probs, threshold)
+    cm = confusion_matrix(y_true, y_pred, len(classifier.classes))
+    return {
+        "probs": probs,
+        "y_pred": y_pred,
+        "confusion": cm,
+        "accuracy": float(np.mean(y_pred == y_true)) if len(y_true) else 0.0,
+        "per_class": per_class_metrics(cm),
+        "sweep": threshold_sweep(probs, y_true),
+        "timings": timings,
+    }
+
+
+def print_report(result, classes, threshold):
+    cm = result["confusion"]
+    cols = classes + ["Other"]
+    width = max(len(c) for c in cols) + 2
+
+    print(f"\nAccuracy @ {threshold:.2f}: {result['accuracy']:.2%} ({cm.sum()} windows)")
+    print("\nConfusion matrix (rows = true, cols = predicted)")
+    print(" " * width + "".join(f"{c:>{width}}" for c in cols))
+    for i, name in enumerate(classes):
+        print(f"{name:<{width}}" + "".join(f"{v:>{width}d}" for v in cm[i]))
+
+    pc = result["per_class"]
+    print(f"\n{'class':<{width}}{'precision':>11}{'recall':>9}{'f1':>7}{'support':>9}")
+    for i, name in enumerate(classes):
+        print(f"{name:<{width}}{pc['precision'][i]:>11.3f}{pc['recall'][i]:>9.3f}"
+              f"{pc['f1'][i]:>7.3f}{int(pc['support'][i]):>9d}")
+
+    sw = result["sweep"]
+    print(f"\n{'threshold':>9}{'coverage':>10}{'accuracy':>10}{'precision':>11}")
+    for t, cov, acc, prec in zip(sw["threshold"], sw["coverage"], sw["accuracy"], sw["precision"]):
+        print(f"{t:>9.2f}{cov:>10.2%}{acc:>10.2%}{prec:>11.2%}")
+
+
+def to_json(result, classes, threshold, sources, model):
+    pc, sw = result["per_class"], result["sweep"]
+    return {
+        "model": model,
+        "sources": list(sources),
+        "windows": int(result["confusion"].sum()),
+        "threshold": threshold,
+        "accuracy": result["accuracy"],
+        "classes": classes,
+        "confusion": result["confusion"].tolist(),
+        "per_class": {
+            name: {k: float(pc[k][i]) for k in ("precision", "recall", "f1", "support")}
+            for i, name in enumerate(classes)
+        },
+        "sweep": [
+            {k: float(sw[k][i]) for k in ("threshold", "coverage", "accuracy", "precision")}
+            for i in range(len(sw["threshold"]))
+        ],
+        "timings": result["timings"],
+    }
+
+
+def main(argv=None):
+    # Imported here so the scoring helpers above can be used without loading the server models
+    from main import SwingClassifier, CLASSIFIER_MODEL
+
+    parser = argparse.ArgumentParser(description="Batched classifier evaluation on labeled sessions")
+    parser.add_argument("sources", nargs="*", default=[DEFAULT_DATASET], help="label CSV / JSONL files")
+    parser.add_argument("--model", default=CLASSIFIER_MODEL)
+    parser.add_argument("--threshold", type=float, default=SwingClassifier.confidence_threshold,
+                        help="below this confidence the prediction is Other (server default)")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--no-normalize", action="store_true",
+                        help="feed raw windows (models trained without z-score, e.g. v3)")
+    parser.add_argument("--classes", help="comma separated model output order to score against "
+                                          "(default: the model's order, models.MODEL_CLASSES)")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    classifier = SwingClassifier(args.model)
+    if classifier.model is None:
+        print(f"Model failed to load: {args.model}")
+        return 1
+    classes = args.classes.split(",") if args.classes else list(classifier.classes)
+
+    t0 = time.perf_counter()
+    windows, lengths, y_true, skipped = load_labeled(args.sources, classes)
+    load_s = time.perf_counter() - t0
+    if skipped:
+        print("Skipped labels not in the model: " + ", ".join(f"{k}={v}" for k, v in skipped.items()))
+    if len(windows) == 0:
+        print("No labeled windows.")
+        return 1
+
+    result = evaluate(classifier, windows, lengths, y_true, args.threshold, args.batch_size, not args.no_normalize)
+    result["timings"]["load_s"] = load_s
+    print_report(result, classes, args.threshold)
+
+    t = result["timings"]
+    print(f"\nTime: load {t['load_s']:.2f}s, stack {t['stack_s'] * 1000:.0f}ms, "
+          f"inference {t['inference_s']:.2f}s ({len(windows) / max(t['inference_s'], 1e-9):.0f} windows/s)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(to_json(result, classes, args.threshold, args.sources, args.model), f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Golden-output snapshots for model parity checks.
+
+`record` runs SwingClassifier and SpeedRegressor over a fixed corpus of windows and stores the
+inputs and outputs in one compressed .npz:
+
+    windows   (N, 40, 6) float32   raw model input (corpus is stored, so inputs never drift)
+    labels    (N,) str             ground truth for dataset windows, "" for synthetic ones
+    probs     (N, 4) float32       classifier probabilities
+    speed     (N,) float32         speed model output in km/h (calibrated, not rounded)
+    meta      JSON string          model files + sha256, lean / h5, library versions, date
+
+`compare` re-runs the current models on the stored windows in one batched call per model and
+checks the outputs against the snapshot within tolerance, so any backend or model swap
+(lean model, TFLite, NumPy engine, quantization, ...) is validated in seconds.
+
+Usage:
+    python golden_snapshot.py record                              # -> golden_outputs.npz
+    python golden_snapshot.py compare                             # exit 1 when outside tolerance
+    USE_LEAN_MODEL=0 python golden_snapshot.py compare            # original .h5 vs snapshot
+    python golden_snapshot.py compare --classifier-model badminton_model_v3.h5 --atol-probs 1e-3
+"""
+import argparse
+import json
+import os
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+os.environ.setdefault("SWING_ARCHIVE_DIR", "")  # offline tool: do not create an archive on import
+
+import dataset_cache
+from swing_datasets import WINDOW_SIZE
+
+DEFAULT_SNAPSHOT = "golden_outputs.npz"
+DEFAULT_DATASET = "20260101_171025.csv"
+
+
+@dataclass
+class ParityReport:
+    n: int
+    probs_max_diff: float
+    argmax_agreement: float
+    speed_max_diff: float
+    ok: bool
+
+    def lines(self, atol_probs, atol_speed):
+        mark = lambda good: "OK  " if good else "FAIL"
+        return [
+            f"{mark(self.probs_max_diff <= atol_probs)} classifier  max |diff| {self.probs_max_diff:.2e} "
+            f"(atol {atol_probs:g}), argmax agreement {self.argmax_agreement:.2%}",
+            f"{mark(self.speed_max_diff <= atol_speed)} speed       max |diff| {self.speed_max_diff:.3f} km/h "
+            f"(atol {atol_speed:g})",
+        ]
+
+
+def build_corpus(dataset=DEFAULT_DATASET, per_label=32, synthetic=64, seed=0):
+    """
+    Fixed corpus: `per_label` evenly spaced windows of each label from the dataset
+    plus `synthetic` seeded random windows in the sensor range.
+    """
+    from main import SwingClassifier
+    from evaluate_model import pad_windows
+
+    windows, labels = [], []
+    if dataset and os.path.exists(dataset):
+        ds = dataset_cache.load(dataset)
+        for label in sorted(set(ds.labels.tolist())):
+            idx = np.flatnonzero(ds.labels == label)
+            pick = idx[np.linspace(0, len(idx) - 1, min(per_label, len(idx))).astype(int)]
+            windows.append(pad_windows(ds.windows[pick], ds.lengths[pick], pad_value=SwingClassifier.mean))
+            labels.extend([label] * len(pick))
+
+    if synthetic:
+        rng = np.random.default_rng(seed)
+        windows.append(rng.normal(SwingClassifier.mean, SwingClassifier.std,
+                                  size=(synthetic, WINDOW_SIZE, 6)).astype(np.float32))
+        labels.extend([""] * synthetic)
+
+    return np.concatenate(windows).astype(np.float32), np.array(labels, dtype=str)
+
+
+def run_models(classifier, speed_model, windows, batch_size=256):
+    """One batched call per model."""
+    return (classifier.predict_batch(windows, batch_size=batch_size).astype(np.float32),
+            speed_model.predict_batch(windows, batch_size=batch_size))
+
+
+def load_models(classifier_model=None, speed_model=None):
+    from main import SwingClassifier, SpeedRegressor, CLASSIFIER_MODEL, SPEED_MODEL
+    return (SwingClassifier(classifier_model or CLASSIFIER_MODEL),
+            SpeedRegressor(speed_model or SPEED_MODEL))
+
+
+def _describe(classifier, speed_model, classifier_path, speed_path):
+    import keras
+    import tensorflow as tf
+    from main import lean_model_paths
+
+    used = lean_model_paths(classifier_path)[0] if classifier.lean is not None else classifier_path
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "classifier": os.path.basename(used),
+        "classifier_sha256": dataset_cache.file_sha256(used),
+        "speed": os.path.basename(speed_path),
+        "speed_sha256": dataset_cache.file_sha256(speed_path),
+        "speed_calibration": speed_model.calibration.describe(),
+        "tensorflow": tf.__version__,
+        "keras": keras.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def record(path, classifier_path, speed_path, dataset, per_label, synthetic):
+    from main import CLASSIFIER_MODEL, SPEED_MODEL
+    classifier_path = classifier_path or CLASSIFIER_MODEL
+    speed_path = speed_path or SPEED_MODEL
+
+    classifier, speed_model = load_models(classifier_path, speed_path)
+    windows, labels = build_corpus(dataset, per_label, synthetic)
+    probs, speed = run_models(classifier, speed_model, windows)
+    meta = _describe(classifier, speed_model, classifier_path, speed_path)
+    np.savez_compressed(path, windows=windows, labels=labels, probs=probs, speed=speed,
+                        meta=np.array(json.dumps(meta)))
+    return len(windows), meta
+
+
+def load_snapshot(path):
+    with np.load(path, allow_pickle=False) as z:
+        snap = {name: z[name] for name in z.files}
+    snap["meta"] = json.loads(str(snap["meta"]))
+    return snap
+
+
+def compare(snapshot, probs, speed, atol_probs=1e-4, atol_speed=0.1) -> ParityReport:
+    probs_diff = float(np.max(np.abs(probs - snapshot["probs"]))) if len(probs) else 0.0
+    speed_diff = float(np.max(np.abs(speed - snapshot["speed"]))) if len(speed) else 0.0
+    agreement = float(np.mean(probs.argmax(axis=1) == snapshot["probs"].argmax(axis=1))) if len(probs) else 1.0
+    return ParityReport(
+        n=len(probs),
+        probs_max_diff=probs_diff,
+        argmax_agreement=agreement,
+        speed_max_diff=speed_diff,
+        ok=probs_diff <= atol_probs and speed_diff <= atol_speed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record / compare golden model outputs")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("record", "compare"):
+        p = sub.add_parser(name)
+        p.add_argument("--snapshot", default=DEFAULT_SNAPSHOT)
+        p.add_argument("--classifier-model", help="default: CLASSIFIER_MODEL (lean model if present)")
+        p.add_argument("--speed-model", help="default: SPEED_MODEL")
+    p_rec = sub.choices["record"]
+    p_rec.add_argument("--dataset", default=DEFAULT_DATASET)
+    p_rec.add_argument("--per-label", type=int, default=32, help="dataset windows per label")
+    p_rec.add_argument("--synthetic", type=int, default=64, help="seeded random windows")
+    p_cmp = sub.choices["compare"]
+    p_cmp.add_argument("--atol-probs", type=float, default=1e-4)
+    p_cmp.add_argument("--atol-speed", type=float, default=0.1, help="km/h")
+    args = parser.parse_args()
+
+    if args.cmd == "record":
+        n, meta = record(args.snapshot, args.classifier_model, args.speed_model,
+                         args.dataset, args.per_label, args.synthetic)
+        print(f"Recorded {n} windows -> {args.snapshot} ({os.path.getsize(args.snapshot) / 1024:.0f} KB)")
+        print(f"  classifier {meta['classifier']}, speed {meta['speed']} ({meta['speed_calibration']})")
+        return 0
+
+    snapshot = load_snapshot(args.snapshot)
+    classifier, speed_model = load_models(args.classifier_model, args.speed_model)
+    probs, speed = run_models(classifier, speed_model, snapshot["windows"])
+    report = compare(snapshot, probs, speed, args.atol_probs, args.atol_speed)
+
+    meta = snapshot["meta"]
+    print(f"Snapshot {args.snapshot}: {report.n} windows, recorded {meta['created']} with "
+          f"{meta['classifier']} / {meta['speed']} (TF {meta['tensorflow']})")
+    for line in report.lines(args.atol_probs, args.atol_speed):
+        print("  " + line)
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
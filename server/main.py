@@ -1,13 +1,21 @@
+import asyncio
 import logging
 import random
 import json
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Response, WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
 from pydantic import BaseModel
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.models import load_model
+
+# 模型封裝在 models.py (import 時不載入模型)，這個檔案在下面建立伺服器用的實例
+from models import (  # noqa: F401  (re-exported: tools import these from main)
+    WINDOW_SIZE, CLASSIFIER_MODEL, SPEED_MODEL, MODEL_CLASSES, LOG_CLASSES,
+    frames_to_array, fit_window, lean_model_paths, model_classes, SwingClassifier, SpeedRegressor,
+)
 
 # --- 配置日誌 (Logging) ---
 # 設定程式的記錄層級，INFO 代表一般訊息，ERROR 代表錯誤
@@ -36,230 +44,181 @@ class SwingRequest(BaseModel):
     client_id: str         # 手機的 ID (誰傳來的)
     data: List[IMUFrame]   # 一連串的 IMU 資料點 (組合成一個動作)
 
-# --- AI 模型封裝 (Model Wrappers) ---
-# 這裡模擬載入訓練好的 AI 模型
-# 在真實專案中，這裡會使用 PyTorch (torch.load) 來載入 .pth 檔案
+# --- 程式啟動初始化 ---
+# 這裡一次把兩個模型載入到記憶體 (RAM) 中
+# 這樣之後每次有人傳資料來，就不用重新讀檔，速度會快很多
+try:
+    classifier = SwingClassifier()
+    speed_model = SpeedRegressor()
+except Exception as e:
+    # 如果載入失敗 (例如檔案找不到)，就印出錯誤並停止程式
+    logger.error(f"Failed to load models: {e}")
+    raise e
 
-class SwingClassifier:
+# --- Swing Archive ---
+# 每一筆分類過的視窗 (原始 40x6 + 機率 + client 資訊) 都寫進 columnar archive
+# 之後重新訓練或查詢某位球員的資料時，直接 memmap 讀取，不用再解析 CSV
+# 設定環境變數 SWING_ARCHIVE_DIR="" 可以關閉
+from swing_archive import SwingArchive, CLASSES as ARCHIVE_CLASSES
+from wire_codecs import negotiate
+
+ARCHIVE_DIR = os.environ.get("SWING_ARCHIVE_DIR", "swing_archive")
+swing_archive = SwingArchive(ARCHIVE_DIR) if ARCHIVE_DIR else None
+
+# --- 連線管理 (Admission Control / Graceful Shutdown) ---
+# MAX_SESSIONS: 同時連線上限，超過就回傳 busy 請 APP 稍後重連
+# RETRY_AFTER_S + 隨機 RETRY_JITTER_S：避免重新部署後所有手機在同一秒湧入 (thundering herd)
+# DRAIN_TIMEOUT_S: 關機時最多等多久，讓已排入推論的視窗做完並回傳
+MAX_SESSIONS = int(os.environ.get("MAX_SESSIONS", "32"))
+RETRY_AFTER_S = float(os.environ.get("RETRY_AFTER_S", "5"))
+RETRY_JITTER_S = float(os.environ.get("RETRY_JITTER_S", "5"))
+DRAIN_TIMEOUT_S = float(os.environ.get("DRAIN_TIMEOUT_S", "10"))
+
+# 推論集中在單一背景執行緒：event loop 不會被 model.predict 卡住，
+# 多支手機的視窗會在這裡排隊，關機時也能知道還有幾個視窗沒做完
+inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+class ConnectionGate:
     """
-    動作分類模型 (Classifier) - 使用 TensorFlow .h5 模型
+    追蹤目前的連線與推論中的視窗
+    - ready: 模型暖機完成後才接受連線
+    - draining: 關機中，不再接受新連線與新視窗
     """
-    def __init__(self):
-        try:
-            self.model = load_model("badminton_model_v4.h5")
-            logger.info("Loaded Classifier Model: badminton_model_v4.h5")
-        except Exception as e:
-            logger.error(f"Failed to load H5 model: {e}")
-            self.model = None
-
-        # 模型訓練時的類別順序
-        # 實際測試發現 Keras 是按照字母順序排列的: Drive, Drop, Smash, Toss
-        # User list was: 1: Smash, 2: Drive, 3: Toss, 4: Drop (logical ID, not model output index)
-        self.classes = ["Drive", "Drop", "Smash", "Toss"]
-        
-        # Normalization Constants (Mean / Std) from Training
-        # Order: AccX, AccY, AccZ, GyroX, GyroY, GyroZ
-        self.mean = np.array([-0.345281, 0.411333, 0.409420, -63.697625, 41.135611, -47.828091])
-        self.std = np.array([2.211481, 2.170975, 2.896732, 305.752180, 521.037064, 329.970234])
-
-    def log_to_csv(self, client_id, raw_data_list, normalized_np, prediction_probs, final_class):
-        import csv
-        import os
-        from datetime import datetime
-        
-        filename = "server_prediction_log.csv"
-        file_exists = os.path.isfile(filename)
-        
-        with open(filename, mode='a', newline='') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                # Header: ClientID, Timestamp, RawStats..., NormStats..., Prediction..., FinalClass, FullData...
-                writer.writerow(['ClientID', 'Time', 
-                                 'RawMeanAcc', 'RawMaxAcc', 'RawMeanGyro', 'RawMaxGyro',
-                                 'NormMean', 'NormMax',
-                                 'P_Drive', 'P_Drop', 'P_Smash', 'P_Toss', 'FinalClass'])
-
-            # Calculate stats
-            raw_np = np.array(raw_data_list)
-            if len(raw_np) > 0:
-                raw_mean_acc = np.mean(raw_np[:, 0:3])
-                raw_max_acc = np.max(np.abs(raw_np[:, 0:3]))
-                raw_mean_gyro = np.mean(raw_np[:, 3:6])
-                raw_max_gyro = np.max(np.abs(raw_np[:, 3:6]))
-                
-                norm_mean = np.mean(normalized_np)
-                norm_max = np.max(np.abs(normalized_np))
-            else:
-                raw_mean_acc = 0
-                raw_max_acc = 0
-                raw_mean_gyro = 0
-                raw_max_gyro = 0
-                norm_mean = 0
-                norm_max = 0
-
-            # Write row
-            writer.writerow([
-                client_id, datetime.now().strftime("%H:%M:%S"),
-                f"{raw_mean_acc:.2f}", f"{raw_max_acc:.2f}", f"{raw_mean_gyro:.2f}", f"{raw_max_gyro:.2f}",
-                f"{norm_mean:.2f}", f"{norm_max:.2f}",
-                *[f"{p:.3f}" for p in prediction_probs],
-                final_class
-            ])
-
-    def predict(self, frames: List[IMUFrame], client_id: Optional[str] = "unknown"):
-        if self.model is None:
-            # Fallback to mock if model failed to load
-            return "Other", 0.0
-
-        # 資料前處理：轉成 (1, 40, 6, 1) 的 numpy array
-        # 1. 取出 acc, gyro
-        data = []
-        for f in frames:
-            # 順序需對應訓練時的 ['aX', 'aY', 'aZ', 'gX', 'gY', 'gZ']
-            row = [f.acc[0], f.acc[1], f.acc[2], f.gyro[0], f.gyro[1], f.gyro[2]]
-            data.append(row)
-        
-        # 2.5 Normalization
-        # Formula: (Raw - Mean) / Std
-        data_np = np.array(data)
-        if len(data_np) > 0:
-            data_np = (data_np - self.mean) / self.std
-
-        # 3. Pad or Truncate to 40 frames
-        # 如果不足 40 筆，補 0；如果超過，取中間或後面
-        target_len = 40
-        
-        if len(data_np) < target_len:
-            # 補 0
-            pad = np.zeros((target_len - len(data_np), 6))
-            data_np = np.vstack([data_np, pad])
-        elif len(data_np) > target_len:
-            # 取中間 40 點 (通常動作在中間)
-            start = (len(data_np) - target_len) // 2
-            data_np = data_np[start:start+target_len]
-            
-        # 3. Reshape to (1, 40, 6, 1)
-        input_data = data_np.reshape(1, 40, 6, 1)
-
-        # 4. Predict
-        prediction = self.model.predict(input_data)
-        # prediction shape: (1, 4) -> [[p1, p2, p3, p4]]
-        
-        # Debug: Print raw probabilities
-        probs = prediction[0]
-        logger.info(f"Model Probs: Drive={probs[0]:.3f}, Drop={probs[1]:.3f}, Smash={probs[2]:.3f}, Toss={probs[3]:.3f}")
-
-        
-        predicted_idx = np.argmax(prediction)
-        confidence = float(np.max(prediction))
-        
-        # 判斷信心度是否足夠
-        if confidence < 0.5:
-            return "Other", confidence
-        
-        predicted_class = self.classes[predicted_idx]
-        
-        # Log to CSV for debugging
+    def __init__(self, max_sessions: int):
+        self.max_sessions = max_sessions
+        self.ready = False
+        self.draining = False
+        self.sessions = set()
+        self.inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def admit(self) -> Optional[str]:
+        """可以接受新連線時回傳 None，否則回傳拒絕原因"""
+        if self.draining:
+            return "Server restarting"
+        if not self.ready:
+            return "Server warming up"
+        if len(self.sessions) >= self.max_sessions:
+            return "Server busy"
+        return None
+
+    def busy_message(self, reason: str) -> str:
+        return json.dumps({
+            "type": "busy",
+            "retry_after": round(RETRY_AFTER_S + random.uniform(0, RETRY_JITTER_S), 1),
+            "display": False,
+            "message": reason,
+        })
+
+    def begin_window(self):
+        self.inflight += 1
+        self._idle.clear()
+
+    def end_window(self):
+        self.inflight -= 1
+        if self.inflight == 0:
+            self._idle.set()
+
+    async def drain(self, timeout: float):
+        """停止接受連線 -> 等排隊中的視窗做完 -> 通知並關閉所有連線"""
+        if not self.draining:
+            logger.info(f"Draining: {len(self.sessions)} sessions, {self.inflight} windows in flight")
+        self.draining = True
+
         try:
-            self.log_to_csv(client_id, data, data_np, probs, predicted_class)
-        except Exception as e:
-            logger.error(f"CSV Logging failed: {e}")
-            
-        return predicted_class, confidence
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Drain timeout: {self.inflight} windows still in flight")
+
+        for ws in list(self.sessions):
+            try:
+                await ws.send_text(self.busy_message("Server restarting"))
+                await ws.close(code=1012)  # 1012 = Service Restart
+            except Exception:
+                pass
+        self.sessions.clear()
 
-from regression_helpers import sum_over_time, physics_transform
+gate = ConnectionGate(MAX_SESSIONS)
 
-class SpeedRegressor:
+def warm_up():
     """
-    球速預測模型 (Regressor) - using model_speed_cnn_att.keras
-    Features: Uses raw IMU data (40x6) and internal physics_transform layer.
+    用全 0 的視窗各跑一次推論，讓 TensorFlow 先建好計算圖
+    不經過 classifier.predict，避免暖機資料寫進 CSV log / archive
     """
-    def __init__(self):
+    t0 = time.perf_counter()
+    if classifier.model is not None:
+        classifier.model.predict(np.zeros((1, *classifier.input_shape)), verbose=0)
+    if speed_model.model is not None:
+        speed_model.model.predict(np.zeros((1, WINDOW_SIZE, 6)), verbose=0)
+    logger.info(f"Warm-up done in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+@app.on_event("startup")
+async def on_startup():
+    # uvicorn 會等 startup 結束才開始 listen，所以暖機完成前不會有連線進來
+    await asyncio.get_running_loop().run_in_executor(inference_executor, warm_up)
+    gate.ready = True
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await gate.drain(DRAIN_TIMEOUT_S)
+    inference_executor.shutdown(wait=True)
+    if swing_archive is not None:
+        swing_archive.close()
+
+def classify_window(client_id: str, data: np.ndarray, last_ts: float) -> dict:
+    """
+    對一個視窗 ((N, 6) 原始資料) 做分類 (+ 殺球球速)，回傳要送給手機的 response
+    在 inference_executor 的背景執行緒中執行
+    """
+    # 1. 執行 AI 推論 (Inference)
+    # 呼叫分類器，猜它是什麼動作
+    action_type, confidence, probs = classifier.predict_array(data, client_id=client_id, return_probs=True)
+
+    # 2. 準備回傳結果 (Response)
+    # 先填好基本資料
+    response = {
+        "timestamp": last_ts,  # 使用最後一筆資料的時間戳記
+        "type": action_type,         # 動作類型 (Smash, Drive...)
+        "confidence": round(confidence, 2), # 信心度
+        "speed": None,    # 預設沒有球速
+        "display": False, # 預設不顯示 (除非信心足夠)
+        "message": ""     # 給使用者看的訊息
+    }
+
+    # 只要不是 "Other" (代表信心度已 > 0.8 且分類成功)，就顯示
+    if action_type != "Other":
+        response["display"] = True # 告訴 APP：請顯示這個結果
+
+        # 只有殺球 (Smash) 才去計算球速
+        if action_type == "Smash":
+            speed = speed_model.predict_array(data)
+            response["speed"] = speed
+            response["message"] = f"Smash! {speed} km/h"
+            logger.info(f"SMASH: {speed} km/h")
+        else:
+            # 其他球路只顯示名稱
+            response["message"] = f"{action_type}"
+            logger.info(f"Detected: {action_type} ({confidence:.2f})")
+    else:
+        # 信心不足 (< 0.8) 或被分到 Other
+        response["display"] = False
+        response["message"] = f"Low confidence ({confidence:.2f})"
+
+    # 3. 存進 archive (失敗不影響回傳結果)
+    if swing_archive is not None:
         try:
-            # Load with custom objects required for the new .keras model
-            self.model = load_model(
-                "model_speed_cnn_att.keras", 
-                custom_objects={
-                    "sum_over_time": sum_over_time, 
-                    "physics_transform": physics_transform
-                },
-                compile=False
+            # archive 的機率 / 類別欄位固定用 ARCHIVE_CLASSES 順序，不隨模型的輸出順序改變
+            pred_idx = ARCHIVE_CLASSES.index(action_type) if action_type in ARCHIVE_CLASSES else -1
+            probs = np.asarray(probs)[[classifier.classes.index(name) for name in ARCHIVE_CLASSES]]
+            swing_archive.append(
+                client_id, fit_window(data), probs, pred_idx, confidence,
+                speed=response["speed"], frame_ts=last_ts, n_frames=len(data)
             )
-            logger.info("Loaded Speed Model: model_speed_cnn_att.keras")
-            
-            # Log input shape to help debug
-            self.input_shape = self.model.input_shape
-            logger.info(f"Speed Model Input Shape: {self.input_shape}")
-        except Exception as e:
-            logger.error(f"Failed to load Speed model: {e}")
-            self.model = None
-
-    def predict(self, frames: List[IMUFrame], client_id: Optional[str] = "unknown"):
-        """
-        輸入：一連串的 IMU 資料 (Raw Data, No Normalization)
-        輸出：預測的球速 (float)
-        """
-        if self.model is None:
-            return 0.0
-
-        # 1. 轉成 Raw Data List
-        data = []
-        for f in frames:
-            # [aX, aY, aZ, gX, gY, gZ]
-            row = [f.acc[0], f.acc[1], f.acc[2], f.gyro[0], f.gyro[1], f.gyro[2]]
-            data.append(row)
-        
-        data_np = np.array(data)
-        
-        # 2. Pad or Truncate to 40 frames
-        target_len = 40
-        if len(data_np) < target_len:
-            pad = np.zeros((target_len - len(data_np), 6))
-            if len(data_np) > 0:
-                data_np = np.vstack([data_np, pad])
-            else:
-                data_np = pad
-        elif len(data_np) > target_len:
-            # Take the middle segment
-            start = (len(data_np) - target_len) // 2
-            data_np = data_np[start:start+target_len]
-
-        # 3. Reshape for the model
-        # The new model likely expects (Batch, 40, 6) matching the physics_transform input
-        # We explicitly reshape to (1, 40, 6)
-        input_data = data_np.reshape(1, 40, 6)
-        
-        try:
-            # 4. Predict
-            logger.info(f"SpeedModel Input Shape: {input_data.shape}")
-            prediction = self.model.predict(input_data, verbose=0)
-            logger.info(f"SpeedModel Raw Output: {prediction}")
-
-            # prediction should be a single float value
-            speed = float(prediction[0][0])
-
-            # Apply 1.5x scaling as requested
-            speed = speed * 1.5
-            
-            # Ensure positive
-            if speed < 0: speed = 0
-            
-            return round(speed, 1)
-            
         except Exception as e:
-            logger.error(f"Speed prediction failed: {e}")
-            return 0.0
+            logger.error(f"Archive append failed: {e}")
 
-# --- 程式啟動初始化 ---
-# 這裡一次把兩個模型載入到記憶體 (RAM) 中
-# 這樣之後每次有人傳資料來，就不用重新讀檔，速度會快很多
-try:
-    classifier = SwingClassifier()
-    speed_model = SpeedRegressor()
-except Exception as e:
-    # 如果載入失敗 (例如檔案找不到)，就印出錯誤並停止程式
-    logger.error(f"Failed to load models: {e}")
-    raise e
+    return response
 
 # --- WebSocket 路由 (Endpoint) ---
 # 定義一個網址：wss://你的網址/ws/predict
@@ -267,83 +226,74 @@ except Exception as e:
 
 @app.websocket("/ws/predict")
 async def websocket_endpoint(websocket: WebSocket):
-    # 當有手機連上來時，先接受連線
-    await websocket.accept()
-    logger.info("Client connected") # 紀錄：有人連線了
-    
+    # 每條連線自己選格式 (wire_codecs.py)：json (預設，APP 用的) / msgpack / binary
+    # 用 Sec-WebSocket-Protocol 或 ?codec=... 指定，沒指定就是原本的 JSON 文字
+    offered = websocket.scope.get("subprotocols") or []
+    codec = negotiate(offered, websocket.query_params.get("codec"))
+
+    # 當有手機連上來時，先接受連線 (只回應 client 有提出的 subprotocol)
+    await websocket.accept(subprotocol=codec.subprotocol if codec.subprotocol in offered else None)
+
+    # 暖機中 / 關機中 / 連線已滿：回傳 busy + retry_after 後關閉 (1013 = Try Again Later)
+    reason = gate.admit()
+    if reason is not None:
+        logger.info(f"Rejected client: {reason}")
+        await websocket.send_text(gate.busy_message(reason))
+        await websocket.close(code=1013)
+        return
+
+    gate.sessions.add(websocket)
+    logger.info(f"Client connected ({len(gate.sessions)}/{gate.max_sessions}, codec={codec.name})") # 紀錄：有人連線了
+    loop = asyncio.get_running_loop()
+
     try:
         # 使用無窮迴圈 (while True) 來持續接收資料
         # 只要連線沒斷，就會一直跑要在這裡
         while True:
-            # 1. 等待並接收手機傳來的文字資料 (receive_text)
+            # 1. 等待並接收手機傳來的資料 (文字或二進位 frame 都收)
             # await 代表「等待」，在等待期間伺服器可以去處理別人的請求 (非同步)
-            data = await websocket.receive_text()
-            
-            # 使用 json 模組把文字轉成 Python 字典 (Dictionary)
-            payload = json.loads(data)
-            
-            # 從字典中取出資料
-            # .get("key", default) 的寫法是：如果找不到這個 key，就給預設值
-            client_id = payload.get("client_id", "unknown")
-            raw_frames = payload.get("data", [])
-            
-            # 如果資料是空的，就跳過這次迴圈，繼續等下一筆
-            if not raw_frames:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            # 依協商好的格式解碼成 (client_id, ts, (N, 6) array)
+            # ping 或空的視窗會回傳 None，就跳過這次迴圈，繼續等下一筆
+            raw = message.get("text")
+            request = codec.decode(raw if raw is not None else message.get("bytes"))
+            if request is None:
                 continue
 
-            logger.info(f"Received {len(raw_frames)} frames from {client_id}")
+            # 關機中：不再推論新的視窗，但每個視窗仍回一個 busy (client 是一窗一回覆)
+            # gate.drain() 之後會再通知 APP 並關閉連線
+            if gate.draining:
+                await websocket.send_text(gate.busy_message("Server restarting"))
+                continue
 
-            # 將原始字典資料轉換成我們定義好的 IMUFrame 物件
-            # 這樣操作起來比較方便 (可以使用 frames[0].acc 這樣存取)
-            frames = [
-                IMUFrame(ts=f["ts"], acc=f["acc"], gyro=f["gyro"]) 
-                for f in raw_frames
-            ]
+            client_id, data = request.client_id, request.data
+            logger.info(f"Received {len(data)} frames from {client_id}")
 
             # Debug: Check data range
-            acc_vals = np.array([f.acc for f in frames])
-            gyro_vals = np.array([f.gyro for f in frames])
-            logger.info(f"Input Stats - Frames: {len(frames)}")
+            acc_vals, gyro_vals = data[:, 0:3], data[:, 3:6]
+            logger.info(f"Input Stats - Frames: {len(data)}")
             logger.info(f"ACC  Range: {acc_vals.min():.2f} ~ {acc_vals.max():.2f} | Mean: {acc_vals.mean():.2f}")
             logger.info(f"GYRO Range: {gyro_vals.min():.2f} ~ {gyro_vals.max():.2f} | Mean: {gyro_vals.mean():.2f}")
 
-            # 2. 執行 AI 推論 (Inference)
-            # 呼叫分類器，猜它是什麼動作
-            action_type, confidence = classifier.predict(frames, client_id=client_id)
-            
-            # 3. 準備回傳結果 (Response)
-            # 先填好基本資料
-            response = {
-                "timestamp": frames[-1].ts,  # 使用最後一筆資料的時間戳記
-                "type": action_type,         # 動作類型 (Smash, Drive...)
-                "confidence": round(confidence, 2), # 信心度
-                "speed": None,    # 預設沒有球速
-                "display": False, # 預設不顯示 (除非信心足夠)
-                "message": ""     # 給使用者看的訊息
-            }
-
-            # 只要不是 "Other" (代表信心度已 > 0.8 且分類成功)，就顯示
-            if action_type != "Other":
-                response["display"] = True # 告訴 APP：請顯示這個結果
-                
-                # 只有殺球 (Smash) 才去計算球速
-                if action_type == "Smash":
-                    speed = speed_model.predict(frames)
-                    response["speed"] = speed
-                    response["message"] = f"Smash! {speed} km/h"
-                    logger.info(f"SMASH: {speed} km/h")
+            # 2. 推論交給背景執行緒 (排隊中的視窗會被 gate 計數，關機時會等它們做完)
+            # 結果送出後才結束計數：drain() 要等回覆真的送到手機，才會送 busy 並關閉連線
+            gate.begin_window()
+            try:
+                response = await loop.run_in_executor(
+                    inference_executor, classify_window, client_id, data, float(request.ts[-1])
+                )
+
+                # 3. 將結果用同一個格式回傳給手機
+                encoded = codec.encode(response)
+                if codec.binary:
+                    await websocket.send_bytes(encoded)
                 else:
-                    # 其他球路只顯示名稱
-                    response["message"] = f"{action_type}"
-                    logger.info(f"Detected: {action_type} ({confidence:.2f})")
-            else:
-                # 信心不足 (< 0.8) 或被分到 Other
-                response["display"] = False
-                response["message"] = f"Low confidence ({confidence:.2f})"
-
-            # 4. 將結果回傳給手機
-            # json.dumps 把字典轉回 JSON 文字字串
-            await websocket.send_text(json.dumps(response))
+                    await websocket.send_text(encoded)
+            finally:
+                gate.end_window()
             
     except WebSocketDisconnect:
         # 手機斷線了 (例如使用者關掉 APP)
@@ -351,19 +301,39 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         # 發生未預期的錯誤
         logger.error(f"Error: {e}")
-        await websocket.close() # 關閉連線
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close() # 關閉連線
+    finally:
+        gate.sessions.discard(websocket)
 
 # --- 健康檢查 API ---
 # 可以用瀏覽器打開 http://localhost:8000/ 確認伺服器有沒有活著
+# 暖機中或關機中回傳 503，讓負載平衡器先不要把連線導過來
 @app.get("/")
 @app.head("/")
-def health_check():
-    return {"status": "ok", "version": "v4.0-TF"}
+def health_check(response: Response):
+    if gate.draining:
+        status = "draining"
+    elif not gate.ready:
+        status = "warming_up"
+    else:
+        status = "ok"
+    if status != "ok":
+        response.status_code = 503
+    return {"status": status, "version": "v4.0-TF", "sessions": len(gate.sessions), "max_sessions": gate.max_sessions}
 
 # --- 程式進入點 ---
 if __name__ == "__main__":
     import uvicorn
+
+    class DrainingServer(uvicorn.Server):
+        """收到 SIGTERM / Ctrl+C 時，先 drain (等視窗做完、通知 APP) 再交給 uvicorn 關閉 socket"""
+        async def shutdown(self, sockets=None):
+            await gate.drain(DRAIN_TIMEOUT_S)
+            await super().shutdown(sockets=sockets)
+
     # 啟動伺服器
     # host="0.0.0.0" 代表監聽所有網路介面 (讓區域網路內的其他裝置可以連線)
-    # port=8000 是連接埠
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # port 預設 8000，部署平台 (Render) 會用 PORT 環境變數指定
+    config = uvicorn.Config(app, host="0.0.0.0", port=int(os.environ.get("PORT", "8000")))
+    DrainingServer(config).run()
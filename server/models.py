@@ -0,0 +1,354 @@
+"""
+Model wrappers shared by the server and the offline tools: window helpers, the classifier's
+output order per model file and normalization constants, SwingClassifier and SpeedRegressor.
+
+Importing this module has no side effects (no model is loaded, no FastAPI app, no archive),
+so tools that load their own model, e.g. the compare_models.py workers, can use it without
+pulling in the server's production models. main.py creates the server's instances.
+"""
+import json
+import logging
+import os
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
+from tensorflow.keras.models import load_model
+
+from regression_helpers import sum_over_time, physics_transform
+from speed_calibration import load_calibration
+
+if TYPE_CHECKING:
+    from main import IMUFrame
+
+# 和 main.py 共用同一個 logger (設定在 main.py)
+logger = logging.getLogger("BadmintonServer")
+
+WINDOW_SIZE = 40
+
+def frames_to_array(frames: List["IMUFrame"]) -> np.ndarray:
+    """IMUFrame list -> (N, 6) array, order [aX, aY, aZ, gX, gY, gZ]"""
+    return np.array([
+        [f.acc[0], f.acc[1], f.acc[2], f.gyro[0], f.gyro[1], f.gyro[2]]
+        for f in frames
+    ]).reshape(-1, 6)
+
+def fit_window(data_np: np.ndarray, target_len: int = WINDOW_SIZE, pad_value=0.0) -> np.ndarray:
+    """
+    Pad or Truncate to target_len frames
+    如果不足 40 筆，補 pad_value (預設 0)；如果超過，取中間 40 點 (通常動作在中間)
+    """
+    data_np = np.asarray(data_np).reshape(-1, 6)
+    if len(data_np) < target_len:
+        pad = np.broadcast_to(np.asarray(pad_value, dtype=float), (target_len - len(data_np), 6))
+        data_np = np.vstack([data_np, pad])
+    elif len(data_np) > target_len:
+        start = (len(data_np) - target_len) // 2
+        data_np = data_np[start:start+target_len]
+    return data_np
+
+# --- AI 模型封裝 (Model Wrappers) ---
+# 這裡模擬載入訓練好的 AI 模型
+# 在真實專案中，這裡會使用 PyTorch (torch.load) 來載入 .pth 檔案
+
+CLASSIFIER_MODEL = os.environ.get("CLASSIFIER_MODEL", "badminton_model_v4.h5")
+
+def lean_model_paths(model_path: str):
+    """optimize_model.py 的輸出位置: badminton_model_v4.h5 -> badminton_model_v4.lean.keras / .lean.json"""
+    base = os.path.splitext(model_path)[0] + ".lean"
+    return base + ".keras", base + ".json"
+
+# 每個模型檔的輸出順序 (index -> 類別)，沒列出的模型用 SwingClassifier.classes (字母順序)
+# v4 是照標註的 label_id 順序訓練的 (1 Smash, 2 Drive, 3 Toss, 4 Drop)：
+# evaluate_model.py 在 20260101_171025.csv 上，用這個順序 98.4% 正確，用字母順序只有 0.9%
+# (v3 相反：字母順序 84.4%，label_id 順序 2.3%)
+MODEL_CLASSES = {
+    "badminton_model_v4.h5": ["Smash", "Drive", "Toss", "Drop"],
+}
+
+# server_prediction_log.csv 的機率欄位固定用這個順序，不隨模型改變
+LOG_CLASSES = ["Drive", "Drop", "Smash", "Toss"]
+
+def model_classes(model_path: str) -> List[str]:
+    """模型輸出的類別順序；lean 模型 (xxx.lean.keras) 依 sidecar 記錄的原始模型查表"""
+    name = os.path.basename(model_path)
+    if name.endswith(".lean.keras"):
+        try:
+            with open(model_path[:-len(".keras")] + ".json", "r", encoding="utf-8") as f:
+                name = json.load(f)["source"]
+        except (OSError, ValueError, KeyError):
+            pass
+    return list(MODEL_CLASSES.get(name, SwingClassifier.classes))
+
+class SwingClassifier:
+    """
+    動作分類模型 (Classifier) - 使用 TensorFlow .h5 模型
+    若有 optimize_model.py 產生的 lean 模型 (正規化已放進模型、BN 已折疊、Dropout 已移除) 就優先使用，
+    設定 USE_LEAN_MODEL=0 可強制使用原始 .h5
+    """
+
+    # 模型輸出的類別順序 (預設值，v2 / v3 是 Keras 字母順序: Drive, Drop, Smash, Toss)
+    # 每個模型檔實際的順序見 MODEL_CLASSES / model_classes()
+    classes = ["Drive", "Drop", "Smash", "Toss"]
+
+    # Normalization Constants (Mean / Std) from Training
+    # Order: AccX, AccY, AccZ, GyroX, GyroY, GyroZ
+    mean = np.array([-0.345281, 0.411333, 0.409420, -63.697625, 41.135611, -47.828091])
+    std = np.array([2.211481, 2.170975, 2.896732, 305.752180, 521.037064, 329.970234])
+
+    # 最高機率低於這個值就回傳 "Other"
+    confidence_threshold = 0.5
+
+    def __init__(self, model_path: str = CLASSIFIER_MODEL):
+        self.lean = None  # lean 模型的 metadata (sidecar JSON)
+        self.input_shape = (WINDOW_SIZE, 6, 1)
+        self.classes = model_classes(model_path)
+
+        lean_path, meta_path = lean_model_paths(model_path)
+        use_lean = os.environ.get("USE_LEAN_MODEL", "1") != "0"
+        try:
+            if use_lean and os.path.exists(lean_path) and os.path.exists(meta_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    self.lean = json.load(f)
+                self.model = load_model(lean_path, compile=False)
+                self.input_shape = tuple(self.lean["input_shape"])
+                if self.lean["classes"] != self.classes:
+                    # 舊版 optimize_model.py 寫的 sidecar 一律是字母順序，以 MODEL_CLASSES 為準
+                    logger.warning(f"{meta_path}: class order {self.lean['classes']} does not match "
+                                   f"{self.classes}, using the latter")
+                logger.info(f"Loaded Classifier Model: {lean_path} (lean, raw input)")
+            else:
+                self.model = load_model(model_path)
+                logger.info(f"Loaded Classifier Model: {model_path}")
+        except Exception as e:
+            logger.error(f"Failed to load H5 model: {e}")
+            self.lean = None
+            self.model = None
+
+    def log_to_csv(self, client_id, raw_data_list, normalized_np, prediction_probs, final_class):
+        import csv
+        import os
+        from datetime import datetime
+        
+        filename = "server_prediction_log.csv"
+        file_exists = os.path.isfile(filename)
+        
+        with open(filename, mode='a', newline='') as f:
+            writer = csv.writer(f)
+            if not file_exists:
+                # Header: ClientID, Timestamp, RawStats..., NormStats..., Prediction..., FinalClass, FullData...
+                writer.writerow(['ClientID', 'Time', 
+                                 'RawMeanAcc', 'RawMaxAcc', 'RawMeanGyro', 'RawMaxGyro',
+                                 'NormMean', 'NormMax',
+                                 *[f"P_{name}" for name in LOG_CLASSES], 'FinalClass'])
+
+            # Calculate stats
+            raw_np = np.array(raw_data_list)
+            if len(raw_np) > 0:
+                raw_mean_acc = np.mean(raw_np[:, 0:3])
+                raw_max_acc = np.max(np.abs(raw_np[:, 0:3]))
+                raw_mean_gyro = np.mean(raw_np[:, 3:6])
+                raw_max_gyro = np.max(np.abs(raw_np[:, 3:6]))
+                
+                norm_mean = np.mean(normalized_np)
+                norm_max = np.max(np.abs(normalized_np))
+            else:
+                raw_mean_acc = 0
+                raw_max_acc = 0
+                raw_mean_gyro = 0
+                raw_max_gyro = 0
+                norm_mean = 0
+                norm_max = 0
+
+            # Write row
+            writer.writerow([
+                client_id, datetime.now().strftime("%H:%M:%S"),
+                f"{raw_mean_acc:.2f}", f"{raw_max_acc:.2f}", f"{raw_mean_gyro:.2f}", f"{raw_max_gyro:.2f}",
+                f"{norm_mean:.2f}", f"{norm_max:.2f}",
+                *[f"{prediction_probs[self.classes.index(name)]:.3f}" for name in LOG_CLASSES],
+                final_class
+            ])
+
+    def preprocess(self, data: np.ndarray):
+        """
+        資料前處理：(N, 6) 原始資料 -> 模型輸入 (1, 40, 6, 1)
+        回傳 (模型輸入, 正規化後的 (40, 6) 資料)；lean 模型的正規化在模型裡，第二個值是 None
+        """
+        # 1. 順序需對應訓練時的 ['aX', 'aY', 'aZ', 'gX', 'gY', 'gZ']
+        data = np.asarray(data, dtype=float).reshape(-1, 6)
+
+        if self.lean is not None:
+            # Lean 模型：正規化在模型裡，這裡只補齊/裁切後直接交給模型
+            # 不足 40 筆時補 mean (正規化後剛好是 0，和原本的補 0 等價)
+            raw_np = fit_window(data, self.lean["window_size"], pad_value=self.mean)
+            return raw_np.reshape(1, *self.input_shape), None  # 正規化後的資料只有寫 log 時才需要
+
+        # 2.5 Normalization
+        # Formula: (Raw - Mean) / Std
+        data_np = data
+        if len(data_np) > 0:
+            data_np = (data_np - self.mean) / self.std
+
+        # 3. Pad or Truncate to 40 frames
+        data_np = fit_window(data_np)
+
+        # 3. Reshape to (1, 40, 6, 1)
+        return data_np.reshape(1, 40, 6, 1), data_np
+
+    def predict(self, frames: List["IMUFrame"], client_id: Optional[str] = "unknown", return_probs: bool = False):
+        """
+        回傳 (類別, 信心度)；return_probs=True 時多回傳 4 類機率 (給 swing archive 使用)
+        """
+        return self.predict_array(frames_to_array(frames), client_id=client_id, return_probs=return_probs)
+
+    def predict_array(self, data: np.ndarray, client_id: Optional[str] = "unknown", return_probs: bool = False):
+        """
+        同 predict，但直接吃 (N, 6) 的原始資料 [aX, aY, aZ, gX, gY, gZ]
+        (binary / msgpack codec 解出來就是 array，不用再轉成 IMUFrame)
+        """
+        if self.model is None:
+            # Fallback to mock if model failed to load
+            if return_probs:
+                return "Other", 0.0, np.zeros(len(self.classes))
+            return "Other", 0.0
+
+        data = np.asarray(data, dtype=float).reshape(-1, 6)
+        input_data, data_np = self.preprocess(data)
+
+        # 4. Predict
+        prediction = self.model.predict(input_data)
+        # prediction shape: (1, 4) -> [[p1, p2, p3, p4]]
+        
+        # Debug: Print raw probabilities
+        probs = prediction[0]
+        logger.info("Model Probs: " + ", ".join(f"{name}={p:.3f}" for name, p in zip(self.classes, probs)))
+
+        
+        predicted_idx = np.argmax(prediction)
+        confidence = float(np.max(prediction))
+        
+        # 判斷信心度是否足夠
+        if confidence < self.confidence_threshold:
+            if return_probs:
+                return "Other", confidence, probs
+            return "Other", confidence
+        
+        predicted_class = self.classes[predicted_idx]
+        
+        # Log to CSV for debugging
+        try:
+            if data_np is None:
+                data_np = (input_data.reshape(-1, 6) - self.mean) / self.std
+            self.log_to_csv(client_id, data, data_np, probs, predicted_class)
+        except Exception as e:
+            logger.error(f"CSV Logging failed: {e}")
+
+        if return_probs:
+            return predicted_class, confidence, probs
+        return predicted_class, confidence
+
+    def predict_batch(self, windows: np.ndarray, batch_size: int = 256, normalize: bool = True) -> np.ndarray:
+        """
+        離線批次推論 (evaluate_model.py 使用，不寫 CSV log)
+        windows: (N, 40, 6) 原始資料 (已補齊/裁切) -> (N, 4) 機率
+        每 batch_size 筆送一次模型，大資料集也不會一次配置全部的中間張量
+        normalize=False 給訓練時沒有正規化的舊模型 (v3)
+        """
+        windows = np.asarray(windows, dtype=np.float32)
+        if self.model is None:
+            return np.zeros((len(windows), len(self.classes)), dtype=np.float32)
+        if self.lean is None and normalize:
+            windows = (windows - self.mean.astype(np.float32)) / self.std.astype(np.float32)
+
+        x = windows.reshape(-1, *self.input_shape)
+        chunks = [np.asarray(self.model.predict_on_batch(x[i:i + batch_size]))
+                  for i in range(0, len(x), batch_size)]
+        if not chunks:
+            return np.zeros((0, len(self.classes)), dtype=np.float32)
+        return np.concatenate(chunks)
+
+SPEED_MODEL = os.environ.get("SPEED_MODEL", "model_speed_cnn_att.keras")
+
+class SpeedRegressor:
+    """
+    球速預測模型 (Regressor) - using model_speed_cnn_att.keras
+    Features: Uses raw IMU data (40x6) and internal physics_transform layer.
+    模型輸出轉成 km/h 的方式來自 speed_calibration.py 產生的 <model>.calibration.json，
+    沒有 (或模型檔已更換) 時沿用原本的 x1.5
+    """
+
+    # 沒有校正檔時，模型輸出乘上的倍率 (km/h)
+    scale = 1.5
+
+    def __init__(self, model_path: str = SPEED_MODEL):
+        try:
+            # Load with custom objects required for the new .keras model
+            self.model = load_model(
+                model_path,
+                custom_objects={
+                    "sum_over_time": sum_over_time, 
+                    "physics_transform": physics_transform
+                },
+                compile=False
+            )
+            logger.info(f"Loaded Speed Model: {model_path}")
+            
+            # Log input shape to help debug
+            self.input_shape = self.model.input_shape
+            logger.info(f"Speed Model Input Shape: {self.input_shape}")
+        except Exception as e:
+            logger.error(f"Failed to load Speed model: {e}")
+            self.model = None
+
+        self.calibration = load_calibration(model_path, default_scale=self.scale, logger=logger)
+        logger.info(f"Speed Calibration: {self.calibration.describe()} ({self.calibration.meta.get('source')})")
+
+    def predict(self, frames: List["IMUFrame"], client_id: Optional[str] = "unknown"):
+        """
+        輸入：一連串的 IMU 資料 (Raw Data, No Normalization)
+        輸出：預測的球速 (float)
+        """
+        return self.predict_array(frames_to_array(frames), client_id=client_id)
+
+    def predict_array(self, data_np: np.ndarray, client_id: Optional[str] = "unknown"):
+        """同 predict，輸入為 (N, 6) 的原始資料 [aX, aY, aZ, gX, gY, gZ]"""
+        if self.model is None:
+            return 0.0
+
+        # 2. Pad or Truncate to 40 frames
+        data_np = fit_window(data_np)
+
+        # 3. Reshape for the model
+        # The new model likely expects (Batch, 40, 6) matching the physics_transform input
+        # We explicitly reshape to (1, 40, 6)
+        input_data = data_np.reshape(1, 40, 6)
+        
+        try:
+            # 4. Predict
+            logger.info(f"SpeedModel Input Shape: {input_data.shape}")
+            prediction = self.model.predict(input_data, verbose=0)
+            logger.info(f"SpeedModel Raw Output: {prediction}")
+
+            # prediction should be a single float value
+            # 轉成 km/h (校正檔或 x1.5)，並確保不為負
+            speed = float(self.calibration.apply(prediction[0][0]))
+
+            return round(speed, 1)
+            
+        except Exception as e:
+            logger.error(f"Speed prediction failed: {e}")
+            return 0.0
+
+    def predict_batch(self, windows: np.ndarray, batch_size: int = 256) -> np.ndarray:
+        """
+        離線批次推論 (golden_snapshot.py 等工具使用)
+        windows: (N, 40, 6) 原始資料 (已補齊/裁切) -> (N,) km/h (已套用校正，未四捨五入)
+        """
+        windows = np.asarray(windows, dtype=np.float32)
+        if self.model is None:
+            return np.zeros(len(windows), dtype=np.float32)
+        x = windows.reshape(-1, WINDOW_SIZE, 6)
+        chunks = [np.asarray(self.model.predict_on_batch(x[i:i + batch_size]))[:, 0]
+                  for i in range(0, len(x), batch_size)]
+        if not chunks:
+            return np.zeros(0, dtype=np.float32)
+        return self.calibration.apply(np.concatenate(chunks)).astype(np.float32)
@@ -0,0 +1,223 @@
+"""
+Offline graph optimizer for the swing classifier.
+
+Produces a lean inference artifact that takes the *raw* (40, 6, 1) window:
+- z-score normalization (SwingClassifier.mean / std) is moved into the graph
+- every BatchNormalization that directly follows a Conv/Dense is folded into that layer's kernel and bias
+- Dropout layers are removed
+
+Next to the artifact a JSON sidecar records the window length, input shape, class order and
+normalization constants, so the server only has to pad/crop and hand over a single array.
+
+Why normalization is not folded into the first Conv2D here:
+the classifier convolves over a (40, 6, 1) "image", so the 6 sensor axes are the conv's *spatial*
+width and the per-axis mean/std differs along it; a shared 3x3 kernel cannot absorb that, and the
+zero 'same' padding would also change meaning. It is folded into the first kernel only when the
+normalized axis is the conv's input-channel axis and the conv uses 'valid' padding; otherwise it
+becomes one constant affine layer at the front of the graph.
+
+Usage:
+    python optimize_model.py                                   # badminton_model_v4.h5 -> badminton_model_v4.lean.keras
+    python optimize_model.py --model badminton_model_v4.h5 --check 20260101_171025.csv
+"""
+import argparse
+import json
+import os
+import sys
+
+os.environ.setdefault("SWING_ARCHIVE_DIR", "")  # offline tool: do not create an archive on import
+
+import numpy as np
+import keras
+
+from main import SwingClassifier, WINDOW_SIZE, CLASSIFIER_MODEL, lean_model_paths, model_classes
+
+FUSABLE = (keras.layers.Conv1D, keras.layers.Conv2D, keras.layers.Dense)
+
+
+def _source_layer(tensor):
+    return tensor._keras_history.operation
+
+
+def _fused_kernel_bias(layer, bn):
+    """Conv/Dense followed by inference-mode BN -> single kernel and bias."""
+    weights = layer.get_weights()
+    kernel = weights[0]
+    bias = weights[1] if layer.use_bias else np.zeros(kernel.shape[-1], dtype=kernel.dtype)
+
+    params = dict(zip([w.path.split("/")[-1] for w in bn.weights], bn.get_weights()))
+    gamma = params.get("gamma", np.ones_like(params["moving_mean"]))
+    beta = params.get("beta", np.zeros_like(params["moving_mean"]))
+    scale = gamma / np.sqrt(params["moving_variance"] + bn.epsilon)
+
+    return kernel * scale, (bias - params["moving_mean"]) * scale + beta
+
+
+def _fold_normalization(layer, kernel, bias, mean, std):
+    """
+    Fold (x - mean) / std into the first layer's kernel and bias.
+    Only valid when mean/std run along the layer's input-channel axis and nothing is padded.
+    """
+    kernel = kernel / std.reshape((1,) * (kernel.ndim - 2) + (-1, 1))
+    bias = bias - np.tensordot(mean, kernel.sum(axis=tuple(range(kernel.ndim - 2))), axes=(0, 0))
+    return kernel, bias
+
+
+def _is_linear(layer):
+    """True if the layer has no activation of its own (BN after it can be folded into its kernel)."""
+    activation = getattr(layer, "activation", None)
+    return activation is None or activation is keras.activations.linear
+
+
+def build_lean_model(model, mean, std):
+    """
+    Rebuild the functional graph layer by layer with BN folded and Dropout removed.
+    Returns (lean_model, report).
+    """
+    layers = model.layers
+    report = {"fused_batchnorm": [], "unfused_batchnorm": [], "removed_dropout": [], "normalization": "in_graph"}
+
+    # BN layers whose only input is a linear Conv/Dense used by nothing else
+    # (with e.g. relu before the BN, scaling the kernel would not commute with the activation)
+    fuse_into = {}
+    for layer in layers:
+        if isinstance(layer, keras.layers.BatchNormalization) and layer.axis in (-1, len(layer.input.shape) - 1):
+            src = _source_layer(layer.input)
+            if not (isinstance(src, FUSABLE) and len(src._outbound_nodes) == 1):
+                continue
+            if _is_linear(src):
+                fuse_into[src.name] = layer
+            else:
+                report["unfused_batchnorm"].append(f"{layer.name} (after {src.name}: {src.activation.__name__})")
+
+    # Normalization axis -> can it be folded into the first layer's kernel?
+    input_shape = tuple(model.input_shape[1:])
+    first = [l for l in layers if not isinstance(l, keras.layers.InputLayer)][0]
+    fold_first = (
+        isinstance(first, FUSABLE)
+        and _source_layer(first.input) is layers[0]
+        and input_shape[-1] == len(mean)
+        and getattr(first, "padding", "valid") == "valid"
+    )
+
+    new_input = keras.Input(shape=input_shape, name="raw_window")
+    if fold_first:
+        report["normalization"] = "folded_into:" + first.name
+        x = new_input
+    else:
+        # Per sensor-axis constants broadcast over the window: axis 2 of (40, 6, 1), axis -1 of (40, 6)
+        norm_axis = input_shape.index(len(mean)) + 1
+        x = keras.layers.Normalization(axis=norm_axis, mean=mean, variance=np.square(std),
+                                       name="zscore")(new_input)
+
+    tensors = {id(model.inputs[0]): x}
+    for layer in layers:
+        if isinstance(layer, keras.layers.InputLayer):
+            continue
+
+        node = layer._inbound_nodes[0]
+        inputs = [tensors[id(t)] for t in node.input_tensors]
+        call_input = inputs if len(inputs) > 1 else inputs[0]
+        outputs = node.output_tensors
+
+        if isinstance(layer, keras.layers.Dropout):
+            report["removed_dropout"].append(layer.name)
+            out = call_input
+        elif isinstance(layer, keras.layers.BatchNormalization) and any(bn is layer for bn in fuse_into.values()):
+            out = call_input  # already folded into the preceding layer
+        else:
+            config = layer.get_config()
+            weights = layer.get_weights()
+            bn = fuse_into.get(layer.name)
+            if bn is not None or (fold_first and layer is first):
+                config["use_bias"] = True
+                if bn is not None:
+                    kernel, bias = _fused_kernel_bias(layer, bn)
+                    report["fused_batchnorm"].append(f"{bn.name} -> {layer.name}")
+                else:
+                    kernel = weights[0]
+                    bias = weights[1] if layer.use_bias else np.zeros(kernel.shape[-1], dtype=kernel.dtype)
+                if fold_first and layer is first:
+                    kernel, bias = _fold_normalization(layer, kernel, bias, mean, std)
+                weights = [kernel, bias]
+
+            new_layer = layer.__class__.from_config(config)
+            out = new_layer(call_input)
+            if weights:
+                new_layer.set_weights(weights)
+
+        tensors[id(outputs[0])] = out
+
+    lean = keras.Model(new_input, tensors[id(model.outputs[0])], name=model.name + "_lean")
+    return lean, report
+
+
+def reference_inputs(n=256, seed=0, dataset=None):
+    """Raw windows for the parity check: a dataset if given, otherwise random windows in sensor range."""
+    if dataset:
+        from dataset_cache import load_windows_cached as load_windows
+        from main import fit_window
+        windows = [fit_window(w.data) for w in load_windows(dataset)]
+        return np.stack(windows).astype(np.float32)
+    rng = np.random.default_rng(seed)
+    return rng.normal(SwingClassifier.mean, SwingClassifier.std, size=(n, WINDOW_SIZE, 6)).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold normalization / BN and strip Dropout from the classifier")
+    parser.add_argument("--model", default=CLASSIFIER_MODEL)
+    parser.add_argument("--out", help="output .keras path (default: <model>.lean.keras)")
+    parser.add_argument("--check", metavar="DATASET", help="verify parity on this dataset (default: random windows)")
+    parser.add_argument("--atol", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    mean = np.asarray(SwingClassifier.mean, dtype=np.float32)
+    std = np.asarray(SwingClassifier.std, dtype=np.float32)
+
+    model = keras.models.load_model(args.model, compile=False)
+    lean, report = build_lean_model(model, mean, std)
+
+    # Parity: original(normalized) vs lean(raw)
+    raw = reference_inputs(dataset=args.check)
+    shape = (-1,) + tuple(model.input_shape[1:])
+    expected = model.predict(((raw - mean) / std).reshape(shape), batch_size=256, verbose=0)
+    actual = lean.predict(raw.reshape(shape), batch_size=256, verbose=0)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    same_argmax = float(np.mean(expected.argmax(axis=1) == actual.argmax(axis=1)))
+
+    print(f"Normalization   : {report['normalization']}")
+    print(f"Fused BN        : {', '.join(report['fused_batchnorm']) or '-'}")
+    print(f"Removed Dropout : {', '.join(report['removed_dropout']) or '-'}")
+    print(f"Unfused BN      : {', '.join(report['unfused_batchnorm']) or '-'}")
+    print(f"Layers          : {len(model.layers)} -> {len(lean.layers)}")
+    print(f"Parity          : max |diff| = {max_diff:.2e}, argmax agreement = {same_argmax:.2%} ({len(raw)} windows)")
+    if max_diff > args.atol:
+        print(f"Parity check failed (atol={args.atol}), artifact not written.")
+        return 1
+
+    out_path, meta_path = lean_model_paths(args.model)
+    if args.out:
+        out_path = args.out
+        meta_path = os.path.splitext(args.out)[0] + ".json"
+    lean.save(out_path)
+
+    metadata = {
+        "source": os.path.basename(args.model),
+        "input": "raw",
+        "window_size": WINDOW_SIZE,
+        "input_shape": list(model.input_shape[1:]),
+        "channels": ["aX", "aY", "aZ", "gX", "gY", "gZ"],
+        "classes": model_classes(args.model),
+        "mean": mean.tolist(),
+        "std": std.tolist(),
+        "parity_max_abs_diff": max_diff,
+        **report,
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    print(f"Wrote {out_path} + {meta_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Replay recorded sessions through a running /ws/predict server.
+
+Sources can be labeling-tool JSONL, exported label CSV (20260101_171025.csv)
+or raw Android CSVManager recordings (cut into windows with the app's trigger logic).
+
+Usage:
+    python replay_session.py 20260101_171025.csv --mode fast
+    python replay_session.py labels/*.jsonl --mode realtime --json run.json
+    python replay_session.py 20260101_171025.csv --baseline run.json   # faster / slower / less accurate?
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import numpy as np
+import websockets
+
+from dataset_cache import load_windows_cached as load_windows
+
+DEFAULT_URL = "ws://localhost:8000/ws/predict"
+
+
+async def _replay_connection(url, windows, mode, inflight, client_id, results, reply_timeout):
+    """
+    One WebSocket connection.
+    realtime: each window is sent when its last frame would have arrived at 50Hz.
+    fast:     send as soon as fewer than `inflight` requests are outstanding.
+    A window without a reply within reply_timeout seconds of being sent is reported as
+    missing; replies are matched FIFO, so the rest of the connection is given up too.
+    """
+    pending = asyncio.Queue()
+    slots = asyncio.Semaphore(inflight)
+
+    async with websockets.connect(url, max_size=None) as ws:
+
+        async def sender():
+            t_start = time.perf_counter()
+            t_first = windows[0].end_s if windows else 0.0
+            for w in windows:
+                if mode == "realtime":
+                    delay = (w.end_s - t_first) - (time.perf_counter() - t_start)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                else:
+                    await slots.acquire()
+
+                message = json.dumps({"type": "window", "client_id": client_id, "data": w.to_frames()})
+                pending.put_nowait((time.perf_counter(), w))
+                await ws.send(message)
+
+        async def receiver():
+            # The server answers every non-empty window in order, so responses match FIFO
+            for i in range(len(windows)):
+                t_sent, w = await pending.get()
+                try:
+                    remaining = t_sent + reply_timeout - time.perf_counter()
+                    reply = json.loads(await asyncio.wait_for(ws.recv(), max(remaining, 0)))
+                except (asyncio.TimeoutError, websockets.ConnectionClosed) as e:
+                    reason = "no reply" if isinstance(e, asyncio.TimeoutError) else f"connection closed ({e})"
+                    print(f"{client_id}: {reason} for window {i + 1}/{len(windows)}, "
+                          f"{len(windows) - i} window(s) missing")
+                    results.extend({"missing": True, "label": m.label} for m in windows[i:])
+                    return
+                results.append({
+                    "latency_ms": (time.perf_counter() - t_sent) * 1000,
+                    "label": w.label,
+                    "type": reply.get("type"),
+                    "confidence": reply.get("confidence"),
+                })
+                if mode != "realtime":
+                    slots.release()
+
+        send_task = asyncio.ensure_future(sender())
+        recv_task = asyncio.ensure_future(receiver())
+        done, _ = await asyncio.wait({send_task, recv_task}, return_when=asyncio.FIRST_COMPLETED)
+        if send_task in done and send_task.exception() is not None:
+            recv_task.cancel()
+            raise send_task.exception()
+        await recv_task
+        send_task.cancel() # a receiver that gave up may leave the sender waiting for a slot
+
+
+async def replay(url, windows, mode="fast", connections=1, inflight=1, client_id="replay", reply_timeout=30.0):
+    """Distribute windows round-robin over `connections` sockets and collect per-window results."""
+    results = []
+    shards = [windows[i::connections] for i in range(connections)]
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[
+        _replay_connection(url, shard, mode, inflight, f"{client_id}-{i}", results, reply_timeout)
+        for i, shard in enumerate(shards) if shard
+    ])
+    wall_s = time.perf_counter() - t0
+    return results, wall_s
+
+
+def summarize(results, wall_s):
+    missing = sum(1 for r in results if r.get("missing"))
+    results = [r for r in results if not r.get("missing")]
+    latency = np.array([r["latency_ms"] for r in results]) if results else np.zeros(1)
+    labeled = [r for r in results if r["label"]]
+    correct = sum(1 for r in labeled if r["type"] == r["label"])
+
+    return {
+        "windows": len(results),
+        "missing": missing,
+        "wall_s": round(wall_s, 3),
+        "throughput_wps": round(len(results) / wall_s, 2) if wall_s > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(float(latency.mean()), 2),
+            "p50": round(float(np.percentile(latency, 50)), 2),
+            "p95": round(float(np.percentile(latency, 95)), 2),
+            "p99": round(float(np.percentile(latency, 99)), 2),
+            "max": round(float(latency.max()), 2),
+        },
+        "labeled": len(labeled),
+        "accuracy": round(correct / len(labeled), 4) if labeled else None,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """
+    Compare against a previous --json report.
+    Returns a list of regressions (empty if the run is within tolerance).
+    """
+    regressions = []
+    for key in ("p50", "p95"):
+        old, new = baseline["latency_ms"][key], report["latency_ms"][key]
+        change = (new - old) / old if old else 0.0
+        print(f"  latency {key}: {old:.2f} -> {new:.2f} ms ({change:+.1%})")
+        if change > tolerance:
+            regressions.append(f"slower: latency {key} {change:+.1%}")
+
+    old, new = baseline["throughput_wps"], report["throughput_wps"]
+    change = (new - old) / old if old else 0.0
+    print(f"  throughput: {old:.2f} -> {new:.2f} windows/s ({change:+.1%})")
+    if change < -tolerance:
+        regressions.append(f"slower: throughput {change:+.1%}")
+
+    if baseline.get("accuracy") is not None and report.get("accuracy") is not None:
+        old, new = baseline["accuracy"], report["accuracy"]
+        print(f"  accuracy: {old:.2%} -> {new:.2%}")
+        if new < old:
+            regressions.append(f"less accurate: {old:.2%} -> {new:.2%}")
+
+    if report.get("missing", 0) > baseline.get("missing", 0):
+        regressions.append(f"missing replies: {baseline.get('missing', 0)} -> {report['missing']}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded sessions through /ws/predict")
+    parser.add_argument("sources", nargs="+", help="JSONL / label CSV / Android CSV files")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--mode", choices=["realtime", "fast"], default="fast",
+                        help="realtime = 50Hz pacing, fast = as fast as the server answers")
+    parser.add_argument("--connections", type=int, default=1, help="parallel client sockets")
+    parser.add_argument("--inflight", type=int, default=1, help="outstanding requests per socket in fast mode")
+    parser.add_argument("--limit", type=int, default=0, help="only replay the first N windows")
+    parser.add_argument("--reply-timeout", type=float, default=30.0,
+                        help="seconds to wait for each reply before reporting it missing")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="previous --json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    windows = []
+    for path in args.sources:
+        loaded = load_windows(path)
+        print(f"{path}: {len(loaded)} windows")
+        windows.extend(loaded)
+    if args.limit:
+        windows = windows[:args.limit]
+    if not windows:
+        print("Nothing to replay.")
+        return 1
+
+    print(f"Replaying {len(windows)} windows -> {args.url} ({args.mode}, {args.connections} connection(s))")
+    results, wall_s = asyncio.run(replay(args.url, windows, args.mode, args.connections,
+                                             args.inflight, reply_timeout=args.reply_timeout))
+    report = summarize(results, wall_s)
+    report["mode"] = args.mode
+    report["connections"] = args.connections
+
+    lat = report["latency_ms"]
+    print(f"\nWindows    : {report['windows']} in {report['wall_s']:.2f}s ({report['throughput_wps']:.1f} windows/s)")
+    print(f"Latency ms : mean={lat['mean']:.1f} p50={lat['p50']:.1f} p95={lat['p95']:.1f} "
+          f"p99={lat['p99']:.1f} max={lat['max']:.1f}")
+    if report["missing"]:
+        print(f"Missing    : {report['missing']} window(s) without a reply")
+    if report["accuracy"] is not None:
+        print(f"Accuracy   : {report['accuracy']:.2%} ({report['labeled']} labeled windows)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline}:")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("REGRESSION: " + "; ".join(regressions))
+            return 1
+        print("OK: no regression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
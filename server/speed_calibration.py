@@ -0,0 +1,306 @@
+"""
+Calibration of the speed regressor's raw output to km/h.
+
+The server used to apply `raw * 1.5` and clamp at 0. This module fits that mapping against
+reference speeds instead and stores it as a versioned JSON artifact next to the model:
+
+    model_speed_cnn_att.keras.calibration.json
+    {
+      "format": 1, "revision": 3,              revision increases every time the file is rewritten
+      "model": "model_speed_cnn_att.keras",
+      "model_sha256": "...",                   the server ignores the file if the model changed
+      "method": "isotonic",                    scale | linear | isotonic
+      "params": {"x": [...], "y": [...]},      scale: {"scale"}, linear: {"slope", "intercept"}
+      "fit": {"n": 152, "mae_before": ..., "mae": ..., "cv_mae": ..., "reference": "..."}
+    }
+
+The pipeline (python speed_calibration.py) runs every speed model over all labeled Smash windows
+in one batched pass, fits scale / linear / isotonic calibrations with k-fold MAE, reports MAE and
+latency per model file and, with --write, saves the chosen calibration.
+
+Reference speeds come from a CSV with columns session_id, timestamp, speed_kmh (matching the
+labeled dataset's session_id / timestamp). Without measured speeds, --reference gyro uses the
+hand mapping from test_speed_logic.py (0.05 * max|gyroY| + 70 km/h) as a stand-in target.
+
+Usage:
+    python speed_calibration.py --reference radar_speeds.csv --write
+    python speed_calibration.py --reference gyro --method isotonic
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from dataset_cache import file_sha256
+
+FORMAT_VERSION = 1
+METHODS = ("scale", "linear", "isotonic")
+DEFAULT_SCALE = 1.5  # the factor the server used before calibration artifacts existed
+
+
+def calibration_path(model_path: str) -> str:
+    """model_speed_cnn_att.keras -> model_speed_cnn_att.keras.calibration.json
+    (the full file name is kept: speed_estimation_model.h5 and .keras are different artifacts)"""
+    return model_path + ".calibration.json"
+
+
+class Calibration:
+    """Raw model output -> km/h (vectorized), always clamped at 0."""
+
+    def __init__(self, method="scale", params=None, meta=None):
+        if method not in METHODS:
+            raise ValueError(f"Unknown calibration method: {method}")
+        self.method = method
+        self.params = params or {"scale": DEFAULT_SCALE}
+        self.meta = meta or {}
+
+    def apply(self, raw) -> np.ndarray:
+        raw = np.asarray(raw, dtype=np.float64)
+        if self.method == "scale":
+            speed = raw * self.params["scale"]
+        elif self.method == "linear":
+            speed = raw * self.params["slope"] + self.params["intercept"]
+        else:
+            speed = np.interp(raw, self.params["x"], self.params["y"])
+        return np.maximum(speed, 0.0)
+
+    def describe(self) -> str:
+        if self.method == "scale":
+            return f"scale x{self.params['scale']:.3f}"
+        if self.method == "linear":
+            return f"linear {self.params['slope']:.3f} * raw + {self.params['intercept']:.2f}"
+        return f"isotonic ({len(self.params['x'])} knots)"
+
+    def to_json(self) -> dict:
+        return {"method": self.method, "params": self.params, **self.meta}
+
+
+def load_calibration(model_path: str, default_scale: float = DEFAULT_SCALE, logger=None) -> Calibration:
+    """
+    Calibration artifact of a model file, or the plain `raw * default_scale` mapping
+    when there is none or it was fitted for a different model file.
+    """
+    path = calibration_path(model_path)
+    fallback = Calibration("scale", {"scale": default_scale}, {"source": "default"})
+    if not os.path.exists(path):
+        return fallback
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != FORMAT_VERSION:
+            raise ValueError(f"unsupported format {data.get('format')}")
+        if os.path.exists(model_path) and data.get("model_sha256") != file_sha256(model_path):
+            raise ValueError("model file changed since calibration")
+        meta = {k: v for k, v in data.items() if k not in ("method", "params")}
+        meta["source"] = path
+        return Calibration(data["method"], data["params"], meta)
+    except (OSError, ValueError, KeyError) as e:
+        if logger is not None:
+            logger.warning(f"Ignoring speed calibration {path}: {e}")
+        return fallback
+
+
+# ---- Fitting ----
+
+def fit_scale(raw, ref) -> Calibration:
+    """Least squares through the origin: ref ~ scale * raw."""
+    denom = float(np.dot(raw, raw))
+    return Calibration("scale", {"scale": float(np.dot(raw, ref) / denom) if denom > 0 else DEFAULT_SCALE})
+
+
+def fit_linear(raw, ref) -> Calibration:
+    if len(raw) < 2 or np.ptp(raw) == 0:
+        return fit_scale(raw, ref)
+    slope, intercept = np.polyfit(raw, ref, 1)
+    return Calibration("linear", {"slope": float(slope), "intercept": float(intercept)})
+
+
+def fit_isotonic(raw, ref) -> Calibration:
+    """Monotone non-decreasing fit (pool adjacent violators), stored as interpolation knots."""
+    order = np.argsort(raw, kind="stable")
+    x, y = np.asarray(raw, dtype=float)[order], np.asarray(ref, dtype=float)[order]
+
+    # blocks: [sum_y, weight, x_lo, x_hi]
+    blocks = []
+    for xi, yi in zip(x, y):
+        blocks.append([yi, 1.0, xi, xi])
+        while len(blocks) > 1 and blocks[-2][0] / blocks[-2][1] > blocks[-1][0] / blocks[-1][1]:
+            s, w, _, hi = blocks.pop()
+            blocks[-1][0] += s
+            blocks[-1][1] += w
+            blocks[-1][3] = hi
+
+    knots_x, knots_y = [], []
+    for s, w, lo, hi in blocks:
+        for xk in ((lo,) if lo == hi else (lo, hi)):
+            knots_x.append(float(xk))
+            knots_y.append(float(s / w))
+    return Calibration("isotonic", {"x": knots_x, "y": knots_y})
+
+
+FITTERS = {"scale": fit_scale, "linear": fit_linear, "isotonic": fit_isotonic}
+
+
+def cross_validated_mae(raw, ref, method, folds=5, seed=0) -> float:
+    n = len(raw)
+    folds = max(2, min(folds, n))
+    idx = np.random.default_rng(seed).permutation(n)
+    errors = np.empty(n)
+    for k in range(folds):
+        test = idx[k::folds]
+        train = np.setdiff1d(idx, test, assume_unique=True)
+        cal = FITTERS[method](raw[train], ref[train])
+        errors[test] = np.abs(cal.apply(raw[test]) - ref[test])
+    return float(errors.mean())
+
+
+# ---- Reference speeds ----
+
+def gyro_proxy_speed(windows) -> np.ndarray:
+    """test_speed_logic.py's hand mapping: 0.05 * max|gyroY| + 70 km/h (500-2000 dps -> 95-170)."""
+    return 0.05 * np.abs(windows[:, :, 4]).max(axis=1) + 70.0
+
+
+def load_reference_csv(path):
+    """{(session_id, timestamp): speed_kmh}"""
+    ref = {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                ref[(str(row["session_id"]), str(row["timestamp"]))] = float(row["speed_kmh"])
+            except (KeyError, ValueError):
+                continue
+    return ref
+
+
+def load_smashes(datasets, reference):
+    """Smash windows (N, 40, 6) and their reference speeds (only windows that have one)."""
+    import dataset_cache
+    from evaluate_model import pad_windows
+
+    xs, refs = [], []
+    table = None if reference == "gyro" else load_reference_csv(reference)
+    for path in datasets:
+        ds = dataset_cache.load(path)
+        sel = np.flatnonzero(ds.labels == "Smash")
+        x = pad_windows(ds.windows[sel], ds.lengths[sel])
+        if table is None:
+            ref = gyro_proxy_speed(x)
+        else:
+            ref = np.array([table.get((str(ds.session_ids[i]), str(ds.timestamps[i])), np.nan) for i in sel])
+            keep = ~np.isnan(ref)
+            x, ref = x[keep], ref[keep]
+        xs.append(x)
+        refs.append(ref)
+    if not xs:
+        return np.zeros((0, 40, 6), np.float32), np.zeros(0)
+    return np.concatenate(xs), np.concatenate(refs)
+
+
+# ---- Pipeline ----
+
+def run_raw(model, x, batch_size):
+    return np.concatenate([np.asarray(model.predict_on_batch(x[i:i + batch_size]))[:, 0]
+                           for i in range(0, len(x), batch_size)])
+
+
+def write_artifact(model_path, calibration, fit_report):
+    path = calibration_path(model_path)
+    revision = 1
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                revision = int(json.load(f).get("revision", 0)) + 1
+        except (OSError, ValueError):
+            pass
+    artifact = {
+        "format": FORMAT_VERSION,
+        "revision": revision,
+        "model": os.path.basename(model_path),
+        "model_sha256": file_sha256(model_path),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "method": calibration.method,
+        "params": calibration.params,
+        "fit": fit_report,
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, indent=2)
+    os.replace(tmp, path)
+    return path, revision
+
+
+def main():
+    os.environ.setdefault("SWING_ARCHIVE_DIR", "")  # offline tool: do not create an archive on import
+
+    parser = argparse.ArgumentParser(description="Fit and evaluate speed calibrations")
+    parser.add_argument("models", nargs="*",
+                        default=["model_speed_cnn_att.keras", "speed_estimation_model.h5", "speed_estimation_model.keras"])
+    parser.add_argument("--datasets", nargs="+", default=["20260101_171025.csv"])
+    parser.add_argument("--reference", required=True,
+                        help="CSV with session_id, timestamp, speed_kmh, or 'gyro' for the gyroY proxy")
+    parser.add_argument("--method", choices=METHODS + ("best",), default="best",
+                        help="calibration to keep (best = lowest cross-validated MAE)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--write", action="store_true", help="save <model>.calibration.json for each model")
+    args = parser.parse_args()
+
+    import keras
+    from compare_models import measure_latency
+    from regression_helpers import sum_over_time, physics_transform
+
+    x, ref = load_smashes(args.datasets, args.reference)
+    if len(x) < 2:
+        print("Not enough Smash windows with a reference speed.")
+        return 1
+    reference_name = "gyro proxy (0.05 * max|gyroY| + 70)" if args.reference == "gyro" else os.path.basename(args.reference)
+    print(f"{len(x)} Smash windows, reference: {reference_name}\n")
+
+    header = (f"{'model':<30}{'current MAE':>12}" + "".join(f"{m + ' MAE':>14}" for m in METHODS)
+              + f"{'p50 ms':>9}{'win/s':>9}  kept")
+    print(header)
+    print("-" * len(header))
+
+    for model_path in args.models:
+        model = keras.models.load_model(model_path, compile=False, custom_objects={
+            "sum_over_time": sum_over_time, "physics_transform": physics_transform,
+        })
+        t0 = time.perf_counter()
+        raw = run_raw(model, x, args.batch_size)
+        batch_s = time.perf_counter() - t0
+        latency = measure_latency(model, x, args.batch_size, runs=50)
+
+        current = load_calibration(model_path)
+        mae_before = float(np.mean(np.abs(current.apply(raw) - ref)))
+        cv = {m: cross_validated_mae(raw, ref, m, args.folds) for m in METHODS}
+        method = min(cv, key=cv.get) if args.method == "best" else args.method
+        calibration = FITTERS[method](raw, ref)
+        mae = float(np.mean(np.abs(calibration.apply(raw) - ref)))
+
+        print(f"{os.path.basename(model_path)[:29]:<30}{mae_before:>12.2f}"
+              + "".join(f"{cv[m]:>14.2f}" for m in METHODS)
+              + f"{latency['latency_p50_ms']:>9.2f}{latency['throughput_wps']:>9.0f}  {calibration.describe()}")
+
+        if args.write:
+            path, revision = write_artifact(model_path, calibration, {
+                "n": int(len(x)),
+                "reference": reference_name,
+                "datasets": [os.path.basename(d) for d in args.datasets],
+                "mae_before": mae_before,
+                "mae": mae,
+                "cv_mae": cv[method],
+                "cv_mae_all": cv,
+                "batch_s": batch_s,
+            })
+            print(f"  -> {path} (revision {revision})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""
+Append-only columnar archive of classified swings.
+
+Layout (one directory per chunk, one raw little-endian file per column):
+
+    swing_archive/
+      clients.json                 client_id -> int code
+      chunk_000000/
+        windows.f32                (N, 40, 6) raw model window (aX, aY, aZ, gX, gY, gZ)
+        probs.f32                  (N, 4) classifier probabilities in CLASSES order (Drive, Drop, Smash, Toss)
+        ts.f64                     (N,) server receive time (unix seconds)
+        frame_ts.f64               (N,) client timestamp of the last frame
+        client.i32                 (N,) client code (see clients.json)
+        pred.i16                   (N,) predicted class index into CLASSES, -1 = Other
+        confidence.f32             (N,)
+        speed.f32                  (N,) km/h, NaN when not a smash
+        n_frames.i16               (N,) frames the client actually sent
+        index.json                 row count, time range and per-client counts / time ranges
+
+Every column file can be opened with np.memmap, so exports and per-player queries
+stream from disk instead of parsing server_prediction_log.csv.
+
+Usage:
+    python swing_archive.py stats
+    python swing_archive.py export dataset.npz --client Device_001 --since 2026-01-01
+"""
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+WINDOW_SIZE = 40
+N_CHANNELS = 6
+N_CLASSES = 4
+# Fixed class order of the probs / pred columns, whatever output order the classifier model has
+CLASSES = ["Drive", "Drop", "Smash", "Toss"]
+
+# name -> (dtype, per-row shape)
+COLUMNS = {
+    "windows": (np.dtype("<f4"), (WINDOW_SIZE, N_CHANNELS)),
+    "probs": (np.dtype("<f4"), (N_CLASSES,)),
+    "ts": (np.dtype("<f8"), ()),
+    "frame_ts": (np.dtype("<f8"), ()),
+    "client": (np.dtype("<i4"), ()),
+    "pred": (np.dtype("<i2"), ()),
+    "confidence": (np.dtype("<f4"), ()),
+    "speed": (np.dtype("<f4"), ()),
+    "n_frames": (np.dtype("<i2"), ()),
+}
+
+_SUFFIX = {"<f4": "f32", "<f8": "f64", "<i4": "i32", "<i2": "i16"}
+
+
+def _column_file(name):
+    dtype, _ = COLUMNS[name]
+    return f"{name}.{_SUFFIX[dtype.str]}"
+
+
+def _row_bytes(name):
+    dtype, shape = COLUMNS[name]
+    return dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+
+
+class ArchiveChunk:
+    """Read-only, memory-mapped view of one chunk."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        # A live chunk's index may be ahead of a column still being written: only map complete rows
+        complete = min(
+            (os.path.getsize(os.path.join(path, _column_file(name)))
+             if os.path.exists(os.path.join(path, _column_file(name))) else 0) // _row_bytes(name)
+            for name in COLUMNS
+        )
+        self.rows = min(self.index["rows"], complete)
+
+    def column(self, name) -> np.ndarray:
+        dtype, shape = COLUMNS[name]
+        if self.rows == 0:
+            return np.zeros((0,) + shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, _column_file(name)), dtype=dtype,
+                         mode="r", shape=(self.rows,) + shape)
+
+    def overlaps(self, client_code=None, t_from=None, t_to=None) -> bool:
+        """Chunk-level pruning with the small index (no column data is touched)."""
+        if self.rows == 0:
+            return False
+        if client_code is not None:
+            entry = self.index["clients"].get(str(client_code))
+            if entry is None:
+                return False
+            t_min, t_max = entry["t_min"], entry["t_max"]
+        else:
+            t_min, t_max = self.index["t_min"], self.index["t_max"]
+        if t_from is not None and t_max < t_from:
+            return False
+        if t_to is not None and t_min > t_to:
+            return False
+        return True
+
+    def select(self, client_code=None, t_from=None, t_to=None) -> np.ndarray:
+        """Row indices matching the filter (vectorized over the memmapped columns)."""
+        mask = np.ones(self.rows, dtype=bool)
+        if client_code is not None:
+            mask &= self.column("client") == client_code
+        if t_from is not None or t_to is not None:
+            ts = self.column("ts")
+            if t_from is not None:
+                mask &= ts >= t_from
+            if t_to is not None:
+                mask &= ts <= t_to
+        return np.flatnonzero(mask)
+
+
+class SwingArchive:
+    """
+    Writer + query entry point.
+    Appends are O(1): one small write per column file, the chunk index is flushed
+    every `index_every` rows and on close (it is rebuilt from the columns if stale).
+
+    read_only=True opens an archive another process may be writing (e.g. the server):
+    nothing is created, repaired or truncated, and queries see the rows covered by the
+    last flushed chunk index.
+    """
+
+    def __init__(self, root="swing_archive", chunk_rows=65536, index_every=64, read_only=False):
+        self.root = root
+        self.chunk_rows = chunk_rows
+        self.index_every = index_every
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(root, exist_ok=True)
+        elif not os.path.isdir(root):
+            raise FileNotFoundError(f"Swing archive not found: {root}")
+
+        self._clients = {}
+        clients_path = os.path.join(root, "clients.json")
+        if os.path.exists(clients_path):
+            with open(clients_path, "r", encoding="utf-8") as f:
+                self._clients = json.load(f)
+
+        self._files = {}
+        self._chunk_id = -1
+        self._rows = 0
+        self._index = None
+        self._dirty = 0
+
+        if read_only:
+            return
+        chunks = self.chunk_paths()
+        if chunks:
+            self._open_chunk(len(chunks) - 1)
+        else:
+            self._open_chunk(0)
+
+    # ---- Writing ----
+
+    def chunk_paths(self):
+        return sorted(
+            os.path.join(self.root, d) for d in os.listdir(self.root)
+            if d.startswith("chunk_") and os.path.isdir(os.path.join(self.root, d))
+        )
+
+    def _open_chunk(self, chunk_id):
+        self._close_files()
+        self._chunk_id = chunk_id
+        path = os.path.join(self.root, f"chunk_{chunk_id:06d}")
+        os.makedirs(path, exist_ok=True)
+
+        # Repair torn writes: every column is cut back to the shortest complete row count
+        rows = None
+        for name in COLUMNS:
+            fpath = os.path.join(path, _column_file(name))
+            size = os.path.getsize(fpath) if os.path.exists(fpath) else 0
+            n = size // _row_bytes(name)
+            rows = n if rows is None else min(rows, n)
+        for name in COLUMNS:
+            fpath = os.path.join(path, _column_file(name))
+            f = open(fpath, "ab")
+            f.truncate(rows * _row_bytes(name))
+            self._files[name] = f
+
+        self._rows = rows
+        self._index = self._load_or_rebuild_index(path, rows)
+
+    def _load_or_rebuild_index(self, path, rows):
+        index_path = os.path.join(path, "index.json")
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("rows") == rows:
+                return index
+
+        index = {"rows": 0, "t_min": None, "t_max": None, "clients": {}}
+        if rows:
+            ts = np.fromfile(os.path.join(path, _column_file("ts")), dtype=COLUMNS["ts"][0], count=rows)
+            client = np.fromfile(os.path.join(path, _column_file("client")), dtype=COLUMNS["client"][0], count=rows)
+            index["rows"] = rows
+            index["t_min"], index["t_max"] = float(ts.min()), float(ts.max())
+            for code in np.unique(client):
+                sel = ts[client == code]
+                index["clients"][str(int(code))] = {
+                    "count": int(sel.size), "t_min": float(sel.min()), "t_max": float(sel.max())
+                }
+        self._write_json(index_path, index)
+        return index
+
+    def _client_code(self, client_id):
+        code = self._clients.get(client_id)
+        if code is None:
+            code = len(self._clients)
+            self._clients[client_id] = code
+            self._write_json(os.path.join(self.root, "clients.json"), self._clients)
+        return code
+
+    def append(self, client_id, window, probs, pred_idx, confidence, speed=None,
+               frame_ts=0.0, n_frames=WINDOW_SIZE, ts=None):
+        """Append one classified window (window: (40, 6) raw, probs: (4,))."""
+        if self.read_only:
+            raise RuntimeError("Swing archive opened read-only")
+        if self._rows >= self.chunk_rows:
+            self.flush_index()
+            self._open_chunk(self._chunk_id + 1)
+
+        ts = datetime.now().timestamp() if ts is None else ts
+        code = self._client_code(client_id)
+        values = {
+            "windows": window,
+            "probs": probs,
+            "ts": ts,
+            "frame_ts": frame_ts,
+            "client": code,
+            "pred": pred_idx,
+            "confidence": confidence,
+            "speed": np.nan if speed is None else speed,
+            "n_frames": n_frames,
+        }
+        for name, value in values.items():
+            dtype, shape = COLUMNS[name]
+            f = self._files[name]
+            f.write(np.asarray(value, dtype=dtype).reshape(shape).tobytes())
+            f.flush()
+
+        self._rows += 1
+        self._update_index(code, ts)
+
+    def _update_index(self, code, ts):
+        index = self._index
+        index["rows"] = self._rows
+        index["t_min"] = ts if index["t_min"] is None else min(index["t_min"], ts)
+        index["t_max"] = ts if index["t_max"] is None else max(index["t_max"], ts)
+        entry = index["clients"].setdefault(str(code), {"count": 0, "t_min": ts, "t_max": ts})
+        entry["count"] += 1
+        entry["t_min"] = min(entry["t_min"], ts)
+        entry["t_max"] = max(entry["t_max"], ts)
+
+        self._dirty += 1
+        if self._dirty >= self.index_every:
+            self.flush_index()
+
+    def flush_index(self):
+        if self._index is None or self._dirty == 0:
+            return
+        path = os.path.join(self.root, f"chunk_{self._chunk_id:06d}", "index.json")
+        self._write_json(path, self._index)
+        self._dirty = 0
+
+    @staticmethod
+    def _write_json(path, obj):
+        # Write-then-rename so a crash never leaves a half-written index
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(obj, f)
+        os.replace(tmp, path)
+
+    def _close_files(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def close(self):
+        self.flush_index()
+        self._close_files()
+
+    # ---- Reading ----
+
+    def client_code(self, client_id):
+        return self._clients.get(client_id)
+
+    def chunks(self):
+        self.flush_index()
+        # A chunk the writer just created may not have its index yet
+        return [ArchiveChunk(p) for p in self.chunk_paths()
+                if os.path.exists(os.path.join(p, "index.json"))]
+
+    def iter_rows(self, client_id=None, t_from=None, t_to=None, columns=("windows", "probs", "pred", "ts")):
+        """
+        Yield {column: array} per matching chunk, streamed from the memmaps.
+        Chunks outside the client / time filter are skipped using index.json only.
+        """
+        code = None
+        if client_id is not None:
+            code = self.client_code(client_id)
+            if code is None:
+                return
+
+        for chunk in self.chunks():
+            if not chunk.overlaps(code, t_from, t_to):
+                continue
+            rows = chunk.select(code, t_from, t_to)
+            if rows.size == 0:
+                continue
+            yield {name: chunk.column(name)[rows] for name in columns}
+
+    def count(self, client_id=None, t_from=None, t_to=None):
+        return sum(len(batch["ts"]) for batch in self.iter_rows(client_id, t_from, t_to, columns=("ts",)))
+
+    def export(self, out_path, client_id=None, t_from=None, t_to=None):
+        """Write matching rows to a single .npz (windows, probs, pred, ts, client)."""
+        parts = list(self.iter_rows(client_id, t_from, t_to,
+                                    columns=("windows", "probs", "pred", "confidence", "ts", "client")))
+        if not parts:
+            return 0
+        merged = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+        codes = {v: k for k, v in self._clients.items()}
+        merged["client_ids"] = np.array([codes[int(c)] for c in np.unique(merged["client"])])
+        np.savez(out_path, **merged)
+        return len(merged["ts"])
+
+
+def _parse_time(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Swing archive tools")
+    parser.add_argument("--root", default=os.environ.get("SWING_ARCHIVE_DIR") or "swing_archive")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("stats", help="rows per chunk and per client")
+
+    p_export = sub.add_parser("export", help="export rows to .npz")
+    p_export.add_argument("out")
+    p_export.add_argument("--client")
+    p_export.add_argument("--since", help="unix seconds or ISO date")
+    p_export.add_argument("--until", help="unix seconds or ISO date")
+    args = parser.parse_args()
+
+    # Read-only: the server may be appending to this archive right now
+    archive = SwingArchive(args.root, read_only=True)
+    try:
+        if args.cmd == "stats":
+            codes = {v: k for k, v in archive._clients.items()}
+            for chunk in archive.chunks():
+                print(f"{os.path.basename(chunk.path)}: {chunk.rows} rows")
+                for code, entry in chunk.index["clients"].items():
+                    print(f"  {codes.get(int(code), code)}: {entry['count']}")
+        elif args.cmd == "export":
+            n = archive.export(args.out, args.client, _parse_time(args.since), _parse_time(args.until))
+            print(f"Exported {n} swings -> {args.out}")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Loaders for recorded swing sessions.
+
+Three on-disk formats show up in this project:
+
+1. Labeling-tool JSONL (APP/labeling_tool/labels/*.jsonl)
+   one JSON record per label: session_id, label, label_id, timestamp_csv_ms, sync_params, data
+2. Exported label CSV (e.g. 20260101_171025.csv)
+   columns: session_id, label, label_id, timestamp, sync_params, data
+3. Raw Android CSVManager recordings
+   columns: timestamp, receivedAt, accelX, accelY, accelZ, gyroX, gyroY, gyroZ
+   (continuous 50Hz stream, no labels)
+
+Every loader returns a list of SwingWindow in the same channel order the models use:
+[aX, aY, aZ, gX, gY, gZ].
+"""
+import ast
+import csv
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+# 'data' cells hold a whole 40x6 window as text, larger than csv's default field limit
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+SAMPLE_RATE_HZ = 50
+FRAME_DT_S = 1.0 / SAMPLE_RATE_HZ
+WINDOW_SIZE = 40
+
+ANDROID_COLUMNS = ['accelX', 'accelY', 'accelZ', 'gyroX', 'gyroY', 'gyroZ']
+ANDROID_TS_FORMAT = '%Y/%m/%d %H:%M:%S.%f'
+
+
+@dataclass
+class SwingWindow:
+    data: np.ndarray                  # (W, 6) raw IMU window
+    label: Optional[str] = None       # ground-truth label name, None if unlabeled
+    session_id: str = ""
+    end_s: float = 0.0                # time of the last frame on the replay timeline (s)
+    meta: dict = field(default_factory=dict)
+
+    def to_frames(self) -> List[dict]:
+        """Build the `data` list of a /ws/predict request (same schema as websocket_service.dart)."""
+        n = len(self.data)
+        t0 = self.end_s - (n - 1) * FRAME_DT_S
+        return [
+            {"ts": round(t0 + i * FRAME_DT_S, 3), "acc": row[0:3], "gyro": row[3:6]}
+            for i, row in enumerate(self.data.tolist())
+        ]
+
+
+def detect_format(path: str) -> str:
+    """Return 'jsonl', 'label_csv' or 'android_csv'."""
+    if path.lower().endswith(".jsonl"):
+        return "jsonl"
+
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        header = next(csv.reader(f), [])
+
+    if "data" in header and "label" in header:
+        return "label_csv"
+    if all(col in header for col in ANDROID_COLUMNS):
+        return "android_csv"
+    raise ValueError(f"Unrecognised session format: {path}")
+
+
+def load_jsonl(path: str) -> List[SwingWindow]:
+    """Labeled windows written by LabelManager.save_label."""
+    windows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            windows.append(SwingWindow(
+                data=np.asarray(record["data"], dtype=np.float32),
+                label=record.get("label"),
+                session_id=str(record.get("session_id", "")),
+                meta={
+                    "label_id": record.get("label_id"),
+                    "timestamp": record.get("timestamp_csv_ms"),
+                    "sync_params": record.get("sync_params", {}),
+                },
+            ))
+    return windows
+
+
+def load_label_csv(path: str) -> List[SwingWindow]:
+    """Labeled windows exported to CSV (the `data` cell is a JSON-compatible nested list)."""
+    windows = []
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            sync_params = row.get("sync_params") or "{}"
+            try:
+                sync_params = ast.literal_eval(sync_params)
+            except (ValueError, SyntaxError):
+                sync_params = {}
+            windows.append(SwingWindow(
+                data=np.asarray(json.loads(row["data"]), dtype=np.float32),
+                label=row.get("label") or None,
+                session_id=str(row.get("session_id", "")),
+                meta={
+                    "label_id": row.get("label_id"),
+                    "timestamp": row.get("timestamp"),
+                    "sync_params": sync_params,
+                },
+            ))
+    return windows
+
+
+def load_android_stream(path: str):
+    """
+    Raw CSVManager recording -> (t_s, samples)
+    t_s: (N,) seconds since the first sample, samples: (N, 6) float32
+    """
+    ts, rows = [], []
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                t = datetime.strptime(row["timestamp"], ANDROID_TS_FORMAT).timestamp()
+                rows.append([float(row[c]) for c in ANDROID_COLUMNS])
+                ts.append(t)
+            except (KeyError, TypeError, ValueError):
+                continue  # skip truncated / corrupted lines
+
+    if not ts:
+        return np.zeros(0), np.zeros((0, 6), dtype=np.float32)
+
+    t_s = np.asarray(ts, dtype=np.float64)
+    samples = np.asarray(rows, dtype=np.float32)
+    order = np.argsort(t_s, kind="stable")
+    t_s, samples = t_s[order], samples[order]
+    return t_s - t_s[0], samples
+
+
+class TriggerWindower:
+    """
+    Python port of the app's DataBufferManager trigger state machine.
+    When |acc| > threshold_g, wait post_trigger frames and then emit the last window_size frames.
+    Cooldown is measured on the sample timestamps instead of the wall clock so replays are deterministic.
+    """
+
+    def __init__(self, window_size=WINDOW_SIZE, post_trigger=20, threshold_g=2.0, cooldown_s=1.0):
+        self.window_size = window_size
+        self.post_trigger = min(post_trigger, window_size - 1)
+        self.threshold_g = threshold_g
+        self.cooldown_s = cooldown_s
+
+    def split(self, t_s: np.ndarray, samples: np.ndarray) -> List[tuple]:
+        """Return a list of (start_idx, end_idx) slices, end exclusive."""
+        mag2 = np.einsum("ij,ij->i", samples[:, 0:3], samples[:, 0:3])
+        above = np.flatnonzero(mag2 > self.threshold_g ** 2)
+
+        slices = []
+        last_trigger_t = None
+        busy_until = -1
+        for idx in above:
+            if idx < self.window_size - 1 or idx <= busy_until:
+                continue
+            if last_trigger_t is not None and t_s[idx] - last_trigger_t < self.cooldown_s:
+                continue
+            end = idx + self.post_trigger + 1
+            if end > len(samples):
+                break
+            slices.append((end - self.window_size, end))
+            last_trigger_t = t_s[idx]
+            busy_until = end - 1
+        return slices
+
+
+def load_android_csv(path: str, windower: Optional[TriggerWindower] = None) -> List[SwingWindow]:
+    """Cut a raw recording into the windows the app would have sent."""
+    windower = windower or TriggerWindower()
+    t_s, samples = load_android_stream(path)
+    session_id = os.path.splitext(os.path.basename(path))[0]
+    return [
+        SwingWindow(data=samples[a:b], label=None, session_id=session_id, end_s=float(t_s[b - 1]))
+        for a, b in windower.split(t_s, samples)
+    ]
+
+
+def load_windows(path: str) -> List[SwingWindow]:
+    """Load any supported session file."""
+    fmt = detect_format(path)
+    if fmt == "jsonl":
+        windows = load_jsonl(path)
+    elif fmt == "label_csv":
+        windows = load_label_csv(path)
+    else:
+        return load_android_csv(path)
+
+    # Pre-cut windows are laid back to back on the timeline (one window every W frames)
+    t = 0.0
+    for w in windows:
+        t += len(w.data) * FRAME_DT_S
+        w.end_s = t
+    return windows
@@ -0,0 +1,98 @@
+"""
+Shared fixtures for the server test suite.
+
+The server modules load their model files relative to the working directory and create a swing
+archive on import, so the suite runs from server/ with the archive and CSV prediction log disabled.
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_baselines.json")
+
+os.environ["SWING_ARCHIVE_DIR"] = ""
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("perf")
+    group.addoption("--perf-margin", type=float, default=float(os.environ.get("PERF_MARGIN", "0.30")),
+                    help="allowed slowdown over the stored baseline (0.30 = 30%%, env PERF_MARGIN)")
+    group.addoption("--update-baselines", action="store_true",
+                    help="store the measured values as the new baselines instead of failing")
+
+
+@pytest.fixture(scope="session")
+def server():
+    """The imported main module (models loaded once per session), with CSV logging switched off."""
+    cwd = os.getcwd()
+    os.chdir(SERVER_DIR)
+    try:
+        import main
+    finally:
+        os.chdir(cwd)
+    main.classifier.log_to_csv = lambda *args, **kwargs: None
+    return main
+
+
+@pytest.fixture(scope="session")
+def windows(server):
+    """Deterministic raw (N, 40, 6) windows in the sensor range (no dataset files needed)."""
+    rng = np.random.default_rng(1234)
+    return rng.normal(server.SwingClassifier.mean, server.SwingClassifier.std, size=(32, 40, 6))
+
+
+class PerfBudget:
+    """
+    Baselines and hard budgets per metric (tests/perf_baselines.json):
+        {"metric": {"baseline": 1.23, "budget": 5.0, "unit": "ms"}}
+    New metrics get a budget of 4x their first measurement; tighten it by hand if needed.
+    A metric fails when it is above its budget or more than `margin` slower than its baseline.
+    """
+
+    def __init__(self, path, margin, update):
+        self.path = path
+        self.margin = margin
+        self.update = update
+        self.measured = {}
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def check(self, name, value):
+        self.measured[name] = value
+        if self.update:
+            return
+        entry = self.entries.get(name)
+        if entry is None:
+            pytest.fail(f"No baseline for {name} (measured {value:.4g}); run with --update-baselines")
+        unit = entry.get("unit", "ms")
+        assert value <= entry["budget"], f"{name}: {value:.4g} {unit} is over the budget of {entry['budget']} {unit}"
+        limit = entry["baseline"] * (1 + self.margin)
+        assert value <= limit, (f"{name}: {value:.4g} {unit} regressed more than {self.margin:.0%} "
+                                f"over the baseline {entry['baseline']:.4g} {unit}")
+
+    def save(self):
+        for name, value in self.measured.items():
+            unit = "us" if name.endswith("_us") else "ms"
+            entry = self.entries.setdefault(name, {"unit": unit, "budget": round(value * 4, 4)})
+            entry["baseline"] = round(value, 4)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+            f.write("\n")
+
+
+@pytest.fixture(scope="session")
+def perf_budget(request):
+    budget = PerfBudget(BASELINES_PATH, request.config.getoption("--perf-margin"),
+                        request.config.getoption("--update-baselines"))
+    yield budget
+    if budget.update:
+        budget.save()
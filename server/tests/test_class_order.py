@@ -0,0 +1,45 @@
+"""The classifier's output order must name the swings the golden snapshot was labeled with."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+import golden_snapshot
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT = os.path.join(SERVER_DIR, golden_snapshot.DEFAULT_SNAPSHOT)
+LABELING_TOOL_DIR = os.path.join(SERVER_DIR, "..", "APP", "labeling_tool")
+
+pytestmark = pytest.mark.skipif(not os.path.exists(SNAPSHOT), reason="no golden snapshot recorded")
+
+
+@pytest.fixture(scope="module")
+def labeled():
+    """Golden windows that carry a ground-truth label (raw (N, 40, 6), names)."""
+    snapshot = golden_snapshot.load_snapshot(SNAPSHOT)
+    known = snapshot["labels"] != ""
+    return snapshot["windows"][known], snapshot["labels"][known], snapshot["probs"][known]
+
+
+def test_classes_match_golden_labels(server, labeled):
+    _, labels, probs = labeled
+    predicted = np.array(server.classifier.classes)[probs.argmax(axis=1)]
+    assert np.mean(predicted == labels) >= 0.95
+
+
+def test_auto_labeler_maps_known_windows(server, labeled):
+    if LABELING_TOOL_DIR not in sys.path:
+        sys.path.append(LABELING_TOOL_DIR)
+    from core import auto_labeler
+    from core.constants import LabelType
+
+    windows, labels, _ = labeled
+    expected = np.array([{LabelType.to_str(l): int(l) for l in LabelType}[name] for name in labels])
+    result, _ = auto_labeler.classify_windows(server.classifier, windows)
+
+    # One confidently classified window per swing type must get exactly its LabelType
+    for name in ("Smash", "Drive", "Toss", "Drop"):
+        i = int(np.flatnonzero(labels == name)[0])
+        assert LabelType(result[i]) == LabelType(expected[i]), name
+    assert np.mean(result == expected) >= 0.9
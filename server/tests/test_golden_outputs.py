@@ -0,0 +1,17 @@
+"""Model outputs must match the recorded golden snapshot (golden_snapshot.py)."""
+import os
+
+import pytest
+
+import golden_snapshot
+
+SNAPSHOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), golden_snapshot.DEFAULT_SNAPSHOT)
+
+
+@pytest.mark.skipif(not os.path.exists(SNAPSHOT), reason="no golden snapshot recorded")
+def test_outputs_match_snapshot(server):
+    snapshot = golden_snapshot.load_snapshot(SNAPSHOT)
+    probs, speed = golden_snapshot.run_models(server.classifier, server.speed_model, snapshot["windows"])
+    report = golden_snapshot.compare(snapshot, probs, speed)
+    assert report.ok, "\n".join(report.lines(1e-4, 0.1))
+    assert report.argmax_agreement == 1.0
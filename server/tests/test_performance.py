@@ -0,0 +1,78 @@
+"""
+Latency budgets for the inference path.
+
+Every metric is the best of repeated runs on local, deterministic inputs (the minimum is far more
+stable than the mean or median on a shared machine) and is checked by perf_budget against
+tests/perf_baselines.json (hard budget + allowed regression margin).
+Re-record the baselines on the target machine with: pytest --update-baselines
+"""
+import json
+import time
+
+import numpy as np
+import pytest
+
+from wire_codecs import CODECS, BinaryCodec
+
+pytestmark = pytest.mark.perf
+
+RUNS = 30
+WARMUP = 3
+
+
+def best_ms(fn, items, runs=RUNS, warmup=WARMUP):
+    for i in range(warmup):
+        fn(items[i % len(items)])
+    samples = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        fn(items[i % len(items)])
+        samples.append((time.perf_counter() - t0) * 1000)
+    return float(np.min(samples))
+
+
+def json_request(window, t0=0.0):
+    frames = [{"ts": round(t0 + i * 0.02, 3), "acc": row[0:3], "gyro": row[3:6]}
+              for i, row in enumerate(np.asarray(window).tolist())]
+    return json.dumps({"type": "window", "client_id": "perf", "data": frames})
+
+
+def test_classifier_window_latency(server, windows, perf_budget):
+    value = best_ms(lambda w: server.classifier.predict_array(w, client_id="perf"), windows)
+    perf_budget.check("classifier_window_ms", value)
+
+
+def test_speed_window_latency(server, windows, perf_budget):
+    value = best_ms(server.speed_model.predict_array, windows)
+    perf_budget.check("speed_window_ms", value)
+
+
+@pytest.mark.parametrize("codec", ["json", "binary"])
+def test_preprocess_per_frame(server, windows, perf_budget, codec):
+    """Decode a 40-frame request and build the model input, per frame (microseconds)."""
+    if codec == "binary":
+        messages = [BinaryCodec.encode_request("perf", np.arange(len(w)) * 0.02, w) for w in windows]
+    else:
+        messages = [json_request(w) for w in windows]
+    decoder = CODECS[codec]
+
+    def preprocess(message):
+        return server.classifier.preprocess(decoder.decode(message).data)
+
+    value = best_ms(preprocess, messages, runs=200) * 1000 / windows.shape[1]
+    perf_budget.check(f"preprocess_{codec}_per_frame_us", value)
+
+
+def test_ws_round_trip(server, windows, perf_budget):
+    from fastapi.testclient import TestClient
+
+    messages = [json_request(w) for w in windows]
+    with TestClient(server.app) as client:  # runs startup: warm-up + gate.ready
+        with client.websocket_connect("/ws/predict") as ws:
+            def round_trip(message):
+                ws.send_text(message)
+                reply = json.loads(ws.receive_text())
+                assert set(reply) == {"timestamp", "type", "confidence", "speed", "display", "message"}
+
+            value = best_ms(round_trip, messages, runs=20)
+    perf_budget.check("ws_round_trip_ms", value)
@@ -0,0 +1,161 @@
+"""
+Wire codecs for /ws/predict, negotiated per connection.
+
+    json    (default) text frames, same schema websocket_service.dart sends today.
+            Parsed / serialized with orjson when it is installed, stdlib json otherwise.
+    msgpack binary frames, same dict schema as json (needs the msgpack package).
+    binary  fixed-layout binary frames:
+              request  = REQUEST_HEADER + client_id (utf-8) + ts float64[n] + imu float32[n, 6]
+              response = RESULT_RECORD (one fixed-size record per window)
+
+A client picks a codec with the WebSocket subprotocol header (Sec-WebSocket-Protocol: swing.msgpack)
+or the query string (/ws/predict?codec=binary). Anything else gets json.
+Control messages such as {"type": "busy"} are always sent as json text frames.
+"""
+import json
+import math
+import struct
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, codec is simply not offered
+    msgpack = None
+
+# Class order of SwingClassifier; -1 = Other
+RESULT_CLASSES = ["Drive", "Drop", "Smash", "Toss"]
+
+# magic, version, n_frames, client_id length
+REQUEST_HEADER = struct.Struct("<2sBHB")
+REQUEST_MAGIC = b"SW"
+
+# magic, version, timestamp, class index, flags (bit0 display, bit1 has speed), confidence, speed
+RESULT_RECORD = struct.Struct("<2sBdbBff")
+RESULT_MAGIC = b"SR"
+VERSION = 1
+
+FLAG_DISPLAY = 0x01
+FLAG_SPEED = 0x02
+
+
+@dataclass
+class WindowRequest:
+    client_id: str
+    ts: np.ndarray    # (N,) frame timestamps
+    data: np.ndarray  # (N, 6) [aX, aY, aZ, gX, gY, gZ]
+
+
+def _frames_to_request(payload) -> Optional[WindowRequest]:
+    """dict payload (json / msgpack) -> WindowRequest, None for pings and empty windows"""
+    frames = payload.get("data") or []
+    if not frames:
+        return None
+    ts = np.array([f["ts"] for f in frames], dtype=np.float64)
+    data = np.array([list(f["acc"][:3]) + list(f["gyro"][:3]) for f in frames], dtype=np.float64)
+    return WindowRequest(str(payload.get("client_id", "unknown")), ts, data)
+
+
+class JsonCodec:
+    name = "json"
+    subprotocol = None  # plain connections (the Flutter app) negotiate nothing
+    binary = False
+
+    def decode(self, message) -> Optional[WindowRequest]:
+        payload = orjson.loads(message) if orjson is not None else json.loads(message)
+        return _frames_to_request(payload)
+
+    def encode(self, response: dict) -> str:
+        if orjson is not None:
+            return orjson.dumps(response).decode()
+        return json.dumps(response)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    subprotocol = "swing.msgpack"
+    binary = True
+
+    def decode(self, message) -> Optional[WindowRequest]:
+        return _frames_to_request(msgpack.unpackb(message))
+
+    def encode(self, response: dict) -> bytes:
+        return msgpack.packb(response)
+
+
+class BinaryCodec:
+    name = "binary"
+    subprotocol = "swing.binary"
+    binary = True
+
+    def decode(self, message) -> Optional[WindowRequest]:
+        magic, version, n, id_len = REQUEST_HEADER.unpack_from(message, 0)
+        if magic != REQUEST_MAGIC or version != VERSION:
+            raise ValueError("Bad binary request header")
+        if n == 0:
+            return None
+        offset = REQUEST_HEADER.size
+        client_id = bytes(message[offset:offset + id_len]).decode("utf-8")
+        offset += id_len
+        ts = np.frombuffer(message, dtype="<f8", count=n, offset=offset)
+        offset += 8 * n
+        data = np.frombuffer(message, dtype="<f4", count=n * 6, offset=offset).reshape(n, 6)
+        return WindowRequest(client_id, ts, data.astype(np.float64))
+
+    def encode(self, response: dict) -> bytes:
+        label = response.get("type")
+        cls = RESULT_CLASSES.index(label) if label in RESULT_CLASSES else -1
+        speed = response.get("speed")
+        flags = (FLAG_DISPLAY if response.get("display") else 0) | (FLAG_SPEED if speed is not None else 0)
+        return RESULT_RECORD.pack(
+            RESULT_MAGIC, VERSION, float(response.get("timestamp") or 0.0), cls, flags,
+            float(response.get("confidence") or 0.0), math.nan if speed is None else float(speed),
+        )
+
+    # ---- client side helpers (replay / benchmarks / tests) ----
+
+    @staticmethod
+    def encode_request(client_id: str, ts, data) -> bytes:
+        cid = client_id.encode("utf-8")[:255]
+        ts = np.asarray(ts, dtype="<f8")
+        data = np.asarray(data, dtype="<f4").reshape(-1, 6)
+        return REQUEST_HEADER.pack(REQUEST_MAGIC, VERSION, len(ts), len(cid)) + cid + ts.tobytes() + data.tobytes()
+
+    @staticmethod
+    def decode_result(message: bytes) -> dict:
+        magic, version, timestamp, cls, flags, confidence, speed = RESULT_RECORD.unpack(message)
+        if magic != RESULT_MAGIC:
+            raise ValueError("Bad binary result record")
+        return {
+            "timestamp": timestamp,
+            "type": RESULT_CLASSES[cls] if cls >= 0 else "Other",
+            "confidence": round(confidence, 2),
+            "speed": round(speed, 1) if flags & FLAG_SPEED else None,
+            "display": bool(flags & FLAG_DISPLAY),
+        }
+
+
+CODECS = {"json": JsonCodec(), "binary": BinaryCodec()}
+if msgpack is not None:
+    CODECS["msgpack"] = MsgpackCodec()
+
+
+def negotiate(subprotocols, query_codec: Optional[str] = None):
+    """
+    Pick the codec for a new connection.
+    Offered subprotocols win (first supported one), then ?codec=..., then json.
+    """
+    for proto in subprotocols or []:
+        for codec in CODECS.values():
+            if codec.subprotocol == proto:
+                return codec
+    if query_codec in CODECS:
+        return CODECS[query_codec]
+    return CODECS["json"]